@@ -0,0 +1,134 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.Arena import ArenaTracker
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def tile(image, grid):
+    """grid x grid copies of the image, every copy flipped differently so the animals do not move together"""
+    rows = []
+    for i in range(grid):
+        row = []
+        for j in range(grid):
+            k = i * grid + j
+            row.append(image if k % 4 == 0 else cv2.flip(image, k % 4 - 2))
+        rows.append(np.hstack(row))
+    return np.vstack(rows)
+
+
+def get_arenas(shape, grid, inset=8):
+    """one rectangle arena per tile, separated by 2 * inset pixels"""
+    h, w = shape[0] // grid, shape[1] // grid
+    return [('rectangle', np.array([j * w + inset, i * h + inset, (j + 1) * w - inset, (i + 1) * h - inset]))
+            for i in range(grid) for j in range(grid)]
+
+
+def adjacent_arenas(gap, size=200, animal=12):
+    """
+    Frame and background of two rectangle arenas side by side, gap pixels apart, with an animal near the wall
+    of each arena facing the other arena
+    """
+    background = np.full((size, 2 * size + gap, 3), 200, np.uint8)
+    frame = background.copy()
+    arenas = [('rectangle', np.array([0, 0, size - 1, size - 1])),
+              ('rectangle', np.array([size + gap, 0, 2 * size + gap - 1, size - 1]))]
+    cy = size // 2
+    cv2.circle(frame, (size - 1 - animal, cy), animal, (20, 20, 20), -1)
+    cv2.circle(frame, (size + gap + animal, cy), animal, (20, 20, 20), -1)
+    return frame, background, arenas
+
+
+def check_adjacent_arenas(gaps):
+    """the animals of neighbouring arenas must not be joined, whatever the gap between the arenas"""
+    for gap in gaps:
+        frame, background, arenas = adjacent_arenas(gap)
+        jpegs = [cv2.imencode('.png', frame)[1]]
+        _, per_arena_res = run_per_arena(jpegs, background, arenas)
+        _, tracker_res = run_arena_tracker(jpegs, background, arenas)
+        print(f"arenas {gap:2d} px apart: per arena {per_arena_res[0].tolist()}, "
+              f"ArenaTracker {tracker_res[0].tolist()}")
+        assert np.array_equal(per_arena_res, tracker_res, equal_nan=True)
+
+
+def run_per_arena(jpegs, background, arenas):
+    """one pipeline per arena, as separate cameras would need: decode, then background subtraction in the arena"""
+    background = BackgroundModel(background, 5)
+    res_list = []
+    t0 = time.perf_counter()
+    for jpeg in jpegs:
+        centers = []
+        for area_type, area_points in arenas:
+            frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+            _, _, _, cX, cY = get_largest_component_and_center(frame, background, thresh_type='manual', thresh=120,
+                                                               diff_type='div', area_type=area_type,
+                                                               area_points=area_points, backend='components')
+            centers.append((cX, cY))
+        res_list.append(centers)
+    return time.perf_counter() - t0, np.array(res_list, np.float64)
+
+
+def run_arena_tracker(jpegs, background, arenas):
+    """one decode and one segmentation pass for all the arenas"""
+    tracker = ArenaTracker(background, arenas, diff_type='div', div_coeff=5, thresh=120)
+    res_list = []
+    t0 = time.perf_counter()
+    for jpeg in jpegs:
+        frame = cv2.imdecode(jpeg, cv2.IMREAD_COLOR)
+        _, _, arena_res_list = tracker.track(frame)
+        res_list.append([(cX, cY) for _, cX, cY in arena_res_list])
+    return time.perf_counter() - t0, np.array(res_list, np.float64)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tracking of several arenas seen by one camera: one pipeline per "
+                                                 "arena against one decode and one pass of ArenaTracker")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--grids', type=int, nargs='+', default=[2, 3],
+                        help='the video is tiled grid x grid times, one arena per tile')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--adjacent-gaps', type=int, nargs='+', default=[1, 3, 6, 20],
+                        help='gaps (pixels) between two neighbouring arenas of the adjacent arena check')
+
+    args = parser.parse_args()
+
+    check_adjacent_arenas(args.adjacent_gaps)
+
+    frames = load_frames(args.input_file, args.frames)
+    background = cv2.imread(args.background)
+
+    for grid in args.grids:
+        tiled_background = tile(background, grid)
+        jpegs = [cv2.imencode('.jpg', tile(frame, grid))[1] for frame in frames]
+        arenas = get_arenas(tiled_background.shape, grid)
+        print(f"{len(arenas)} arenas, frames of {tiled_background.shape}")
+
+        per_arena_time, per_arena_res = run_per_arena(jpegs, tiled_background, arenas)
+        tracker_time, tracker_res = run_arena_tracker(jpegs, tiled_background, arenas)
+        found = ~np.isnan(per_arena_res)
+        assert np.array_equal(found, ~np.isnan(tracker_res))
+        distance = np.abs(per_arena_res[found] - tracker_res[found])
+        print(f"  per arena pipelines: {per_arena_time / len(jpegs) * 1000:6.2f} ms/frame")
+        print(f"  ArenaTracker       : {tracker_time / len(jpegs) * 1000:6.2f} ms/frame, "
+              f"max distance {distance.max() if distance.size else 0:.0f} px")
@@ -0,0 +1,67 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def div_difference(frame, background, div_coeff):
+    """'div' difference as computed by get_largest_component_and_center from a background image"""
+    modified_background = background.astype(np.float32) + div_coeff
+    difference = np.clip((cv2.absdiff(frame, background).astype(np.float32)) * 255 / modified_background, 0, 255)
+    return difference.astype(np.uint8)
+
+
+def time_per_frame(func, frames, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for frame in frames:
+            func(frame)
+        t = (time.perf_counter() - t0) / len(frames)
+        best = t if best is None else min(best, t)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="'div' background difference from the background image and "
+                                                 "from a BackgroundModel")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--div-coeff', type=float, default=5)
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per method, best time is reported')
+
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.input_file)
+    frames = []
+    while len(frames) < args.max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    background = cv2.imread(args.background)
+    model = BackgroundModel(background, args.div_coeff)
+
+    for frame in frames:
+        assert (div_difference(frame, background, args.div_coeff) ==
+                model.get_difference(frame)).all(), "difference mismatch"
+    print(f"{len(frames)} frames of {frames[0].shape}, differences are identical")
+
+    image_ms = time_per_frame(lambda f: div_difference(f, background, args.div_coeff), frames, args.repeat)
+    model_ms = time_per_frame(model.get_difference, frames, args.repeat)
+    print(f"difference: image {image_ms:.2f} ms, model {model_ms:.2f} ms, x{image_ms / model_ms:.1f}")
+
+    kwargs = dict(diff_type='div', div_coeff=args.div_coeff, thresh_type='manual', thresh=120, use_open_close=True)
+    image_ms = time_per_frame(lambda f: get_largest_component_and_center(f, background, **kwargs), frames, args.repeat)
+    model_ms = time_per_frame(lambda f: get_largest_component_and_center(f, model, **kwargs), frames, args.repeat)
+    print(f"tracking: image {image_ms:.2f} ms, model {model_ms:.2f} ms, x{image_ms / model_ms:.1f}")
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.BackgroundUpdater import BackgroundUpdater
+from client_host.SearchWindow import get_bounding_rect
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def track_frames(frames, background, fps, drift, updater=None):
+    """Tracking of frames getting darker by drift over the recording, returns the centers, the thresholded
+    pixels and the time per frame (ms)"""
+    kwargs = dict(diff_type='div', div_coeff=5, thresh_type='manual', thresh=120, use_open_close=True)
+    centers = []
+    thresh_pixels = []
+    duration = 0
+    if updater is not None:
+        updater.start()
+    for i, frame in enumerate(frames):
+        frame = cv2.convertScaleAbs(frame, alpha=1 - drift * i / len(frames))
+        t0 = time.perf_counter()
+        _, thresh_img, contour, cX, cY = get_largest_component_and_center(frame, background, **kwargs)
+        if updater is not None:
+            updater.submit(i / fps, frame, get_bounding_rect(contour) if contour is not None else None)
+        duration += time.perf_counter() - t0
+        centers.append((cX, cY))
+        thresh_pixels.append(cv2.countNonZero(thresh_img))
+        # frames come at the frame rate, the update thread gets the time between them
+        time.sleep(0.001)
+    if updater is not None:
+        updater.stop()
+    return np.array(centers, dtype=float), np.array(thresh_pixels), duration / len(frames) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tracking with a static and with an updated background while "
+                                                 "the lighting drifts")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=15)
+    parser.add_argument('--drift', type=float, default=0.5, help='brightness lost over the recording')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between two background updates')
+    parser.add_argument('--rate', type=float, default=0.2)
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.input_file, args.max_frames)
+    background_image = cv2.imread(args.background)
+    reference, _, _ = track_frames(frames, BackgroundModel(background_image, 5), args.fps, 0)
+
+    background = BackgroundModel(background_image, 5)
+    for name, updater in (('static', None),
+                          ('updated', BackgroundUpdater(background_image, [(background, 1)], args.rate,
+                                                        args.interval))):
+        centers, thresh_pixels, ms = track_frames(frames, background, args.fps, args.drift, updater)
+        distance = np.hypot(*(centers - reference).T)
+        last = slice(len(frames) * 3 // 4, None)
+        print(f"{name:>8}: {ms:.2f} ms per frame, thresholded pixels in the last quarter: "
+              f"{thresh_pixels[last].mean():.0f}, center distance to the recording without drift (pixels): "
+              f"mean {np.nanmean(distance):.1f}, max {np.nanmax(distance):.1f}, "
+              f"not found: {np.isnan(centers[:, 0]).sum()}")
@@ -0,0 +1,177 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from client_host.DataBuffer import DataBuffer, BoundedDataBuffer, WAKEUP_ALL, WAKEUP_READER
+
+
+class LegacyDataBuffer:
+    """DataBuffer before the ring storage: linear scans of a deque and min() over the readers"""
+
+    def __init__(self, name):
+        self.buffer_name = name
+        self.reader_num = 0
+        self.last_reader_index_list = []
+        self.buffer = deque()
+        self.data_buffer_index = 0
+        self.condition = threading.Condition()
+        self.finish_label = False
+
+    def register_reader(self, policy=None):
+        with self.condition:
+            reader_index = self.reader_num
+            self.reader_num += 1
+            self.last_reader_index_list.append(-1)
+        return reader_index
+
+    def add_data(self, data):
+        with self.condition:
+            index = self.data_buffer_index
+            self.data_buffer_index += 1
+            self.buffer.append((index, data))
+            self.condition.notify_all()
+
+    def get_data(self, reader_index):
+        with self.condition:
+            for index, data in self.buffer:
+                if index == self.last_reader_index_list[reader_index] + 1:
+                    self.last_reader_index_list[reader_index] = index
+                    self._remove_data()
+                    return index, data
+            return -1, None
+
+    def get_data_by_index(self, reader_index, target_index):
+        with self.condition:
+            for index, data in self.buffer:
+                if index == target_index:
+                    self.last_reader_index_list[reader_index] = index
+                    self._remove_data()
+                    return index, data
+            return -1, None
+
+    def _remove_data(self):
+        while self.buffer and self.buffer[0][0] <= min(self.last_reader_index_list):
+            self.buffer.popleft()
+
+
+def drain_batches(reader_num, depth):
+    """
+    drain with get_batch, see drain
+    :return: mean time per item (us)
+    """
+    buffer = DataBuffer("benchmark")
+    readers = [buffer.register_reader() for _ in range(reader_num)]
+    for i in range(depth):
+        buffer.add_data(i)
+    t0 = time.perf_counter()
+    for reader in readers:
+        n = 0
+        while n < depth:
+            n += len(buffer.get_batch(reader))
+    return (time.perf_counter() - t0) / (reader_num * depth) * 1e6
+
+
+def drain(buffer_class, reader_num, depth, by_index):
+    """
+    Fill the buffer with `depth` items, then let every reader consume all of them in turn, so the readers
+    that have not started yet hold the whole backlog in the buffer.
+    :return: mean time per get call (us)
+    """
+    buffer = buffer_class("benchmark")
+    readers = [buffer.register_reader() for _ in range(reader_num)]
+    for i in range(depth):
+        buffer.add_data(i)
+    t0 = time.perf_counter()
+    for reader in readers:
+        for i in range(depth):
+            index, data = buffer.get_data_by_index(reader, i) if by_index else buffer.get_data(reader)
+            assert index == i
+    return (time.perf_counter() - t0) / (reader_num * depth) * 1e6
+
+
+def context_switches():
+    try:
+        import resource
+    except ImportError:
+        # not available on Windows
+        return 0
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_nvcsw + usage.ru_nivcsw
+
+
+def pipeline(wakeup, reader_num, frame_num, interval, work, capacity):
+    """
+    Producer adding an item every `interval` seconds, like the receiving thread, to a frame buffer read by
+    reader_num threads. Half of the readers take every item (recorder), the others the newest one
+    (tracking, detection, playback). Every reader spends `work` seconds per item.
+    """
+    if capacity:
+        buffer = BoundedDataBuffer("benchmark", capacity, wakeup=wakeup)
+    else:
+        buffer = DataBuffer("benchmark", wakeup=wakeup)
+    readers = [buffer.register_reader() for _ in range(reader_num)]
+
+    def read(reader, last):
+        get = buffer.get_last_data if last else buffer.get_data
+        while True:
+            index, data = get(reader)
+            if index is None:
+                break
+            time.sleep(work)
+
+    threads = [threading.Thread(target=read, args=(reader, i % 2 == 1)) for i, reader in enumerate(readers)]
+    switches = context_switches()
+    t0 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for i in range(frame_num):
+        buffer.add_data(i)
+        time.sleep(interval)
+    buffer.add_data(None)
+    for thread in threads:
+        thread.join()
+    res = {'time s': time.perf_counter() - t0, 'context switches': context_switches() - switches}
+    res.update(buffer.get_wait_stats())
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DataBuffer lookup benchmark with deep backlogs")
+    parser.add_argument('--readers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--depth', type=int, nargs='+', default=[100, 1000, 5000], help='items in the backlog')
+    parser.add_argument('--frames', type=int, default=1000, help='items added in the wakeup benchmark')
+    parser.add_argument('--interval', type=float, default=0.001, help='seconds between added items')
+    parser.add_argument('--work', type=float, default=0.002, help='seconds a reader spends per item')
+    parser.add_argument('--capacity', type=int, default=10, help='frame buffer capacity, 0 for no limit')
+
+    args = parser.parse_args()
+
+    for by_index in (False, True):
+        print("get_data_by_index" if by_index else "get_data")
+        for depth in args.depth:
+            for reader_num in args.readers:
+                legacy = drain(LegacyDataBuffer, reader_num, depth, by_index)
+                ring = drain(DataBuffer, reader_num, depth, by_index)
+                print(f"depth {depth:6d}, readers {reader_num}: legacy {legacy:8.2f} us/call, "
+                      f"ring {ring:6.2f} us/call, x{legacy / ring:.1f}")
+
+    print("get_batch")
+    for depth in args.depth:
+        for reader_num in args.readers:
+            ring = drain(DataBuffer, reader_num, depth, False)
+            batch = drain_batches(reader_num, depth)
+            print(f"depth {depth:6d}, readers {reader_num}: get_data {ring:6.2f} us/item, "
+                  f"get_batch {batch:6.3f} us/item, x{ring / batch:.1f}")
+
+    print("wakeups")
+    for reader_num in args.readers:
+        for wakeup in (WAKEUP_ALL, WAKEUP_READER):
+            res = pipeline(wakeup, reader_num, args.frames, args.interval, args.work, args.capacity)
+            print(f"readers {reader_num}, {wakeup:>6}: " +
+                  ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                            for key, value in res.items()))
@@ -0,0 +1,95 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.DataBuffer import DataBuffer
+from client_host.TrackModel import DLCLiveModel, DLC_BATCH_REALTIME, DLC_BATCH_OFFLINE
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def full_frame_area(frame):
+    return 'rectangle', np.array([0, 0, frame.shape[1], frame.shape[0]])
+
+
+def run_forward(model, frames, batch_size):
+    """Frames per second of get_pose_batch with batches of batch_size frames"""
+    t0 = time.perf_counter()
+    for i in range(0, len(frames) - batch_size + 1, batch_size):
+        model.get_pose_batch(frames[i:i + batch_size])
+    n = (len(frames) // batch_size) * batch_size
+    return n / (time.perf_counter() - t0)
+
+
+def run_stream(model, frames, fps):
+    """Frames fed at fps into a frame buffer, poses published by the recording thread of the model"""
+    frame_buffer = DataBuffer("frame buffer")
+    output_buffer = DataBuffer("dlc buffer")
+    reader_index = output_buffer.register_reader()
+    latency_list = []
+
+    def consume():
+        while True:
+            index, data = output_buffer.get_data(reader_index)
+            if index is None:
+                break
+            latency_list.append(time.time() - data[1][0][0])
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+    model.start_record(frame_buffer, output_buffer)
+    start_time = time.time()
+    for i, frame in enumerate(frames):
+        time.sleep(max(start_time + i / fps - time.time(), 0))
+        # the frame time is the time it was added, the latency is measured from there
+        frame_buffer.add_data([time.time(), frame])
+    frame_buffer.add_data(None)
+    consumer.join()
+    duration = time.time() - start_time
+    latency = np.array(latency_list) * 1000
+    return {'posed': len(latency_list), 'fps': len(latency_list) / duration,
+            'latency mean ms': latency.mean(), 'latency p95 ms': np.percentile(latency, 95)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DLC-Live inference one frame at a time and in batches")
+    parser.add_argument('model_path', type=str, help='exported DLC model')
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--batch-timeout-ms', type=float, default=10)
+    parser.add_argument('--fps', type=float, default=30, help='frame rate of the frames fed to the recording thread')
+    parser.add_argument('--frames', type=int, default=300)
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.input_file, args.frames)
+    area_type, area_points = full_frame_area(frames[0])
+    for batch_size in args.batch_sizes:
+        for policy in (DLC_BATCH_REALTIME, DLC_BATCH_OFFLINE):
+            model = DLCLiveModel(None, args.model_path, frames[0], area_type, area_points,
+                                 defaultdict(lambda: True),
+                                 batch_size, args.batch_timeout_ms / 1000, policy)
+            if policy == DLC_BATCH_REALTIME:
+                print(f"batch size {batch_size} ({'one forward pass' if model.batch_inference else 'one frame at a time'}"
+                      f"): {run_forward(model, frames, batch_size):.1f} frames/s")
+            res = run_stream(model, frames, args.fps)
+            print(f"  {policy:>8} at {args.fps:g} fps: " + ", ".join(f"{key} {value:.1f}" for key, value in res.items()))
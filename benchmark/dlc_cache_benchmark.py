@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.DLCModelCache import dlc_model_cache
+from client_host.TrackModel import DLCLiveModel
+
+
+def prepare(model_path, frame):
+    """the construction of the model done by every Controller.prepare"""
+    area_points = np.array([0, 0, frame.shape[1], frame.shape[0]])
+    t0 = time.perf_counter()
+    DLCLiveModel(None, model_path, frame, 'rectangle', area_points, defaultdict(lambda: True))
+    return time.perf_counter() - t0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time of repeated prepares of DLC-Live, the model loaded every "
+                                                 "time and kept in the model cache")
+    parser.add_argument('model_path', type=str, help='exported DLC model')
+    parser.add_argument('background', type=str, help='background image, with the camera resolution')
+    parser.add_argument('--prepares', type=int, default=3)
+
+    args = parser.parse_args()
+
+    frame = cv2.imread(args.background)
+    uncached = []
+    for _ in range(args.prepares):
+        dlc_model_cache.evict()
+        uncached.append(prepare(args.model_path, frame))
+    print("model loaded at every prepare: " + ", ".join(f"{t:.2f}" for t in uncached) + " s")
+
+    dlc_model_cache.evict()
+    cached = [prepare(args.model_path, frame) for _ in range(args.prepares)]
+    print("model cache                  : " + ", ".join(f"{t:.2f}" for t in cached) + " s")
+
+    # the model loads while the user configures the rest, prepare waits for what is left of the load
+    dlc_model_cache.evict()
+    thread = dlc_model_cache.warmup(args.model_path, frame)
+    configure_time = np.median(uncached) / 2
+    time.sleep(configure_time)
+    print(f"warmup, prepare {configure_time:.2f} s later: {prepare(args.model_path, frame):.2f} s")
+    thread.join()
+    dlc_model_cache.evict()
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.TrackModel import DLCLiveModel
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run_model(model_path, frames, crop_size):
+    area_points = np.array([0, 0, frames[0].shape[1], frames[0].shape[0]])
+    model = DLCLiveModel(None, model_path, frames[0], 'rectangle', area_points, defaultdict(lambda: True),
+                         crop_size=crop_size)
+    t0 = time.perf_counter()
+    res_list = [model.get_res([0, frame]) for frame in frames]
+    duration = time.perf_counter() - t0
+    centers = np.array([res[0][1:3] for res in res_list], np.float64)
+    return duration, centers, model.crop_stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="DLC-Live on the whole frame and on a crop around the last pose")
+    parser.add_argument('model_path', type=str, help='exported DLC model')
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('--crop-sizes', type=int, nargs='+', default=[160, 240, 320])
+    parser.add_argument('--frames', type=int, default=300)
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.input_file, args.frames)
+    full_time, full_centers, _ = run_model(args.model_path, frames, 0)
+    print(f"whole frame {frames[0].shape[1]}x{frames[0].shape[0]}: {full_time / len(frames) * 1000:6.2f} ms/frame")
+    for crop_size in args.crop_sizes:
+        crop_time, crop_centers, stats = run_model(args.model_path, frames, crop_size)
+        distance = np.linalg.norm(crop_centers - full_centers, axis=1)
+        print(f"crop {crop_size:>4}: {crop_time / len(frames) * 1000:6.2f} ms/frame, "
+              f"{stats['cropped']} cropped, {stats['expanded']} posed again as a whole, "
+              f"center distance to the whole frame: median {np.nanmedian(distance):.1f} px, "
+              f"max {np.nanmax(distance):.1f} px")
@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def load_jpegs(input_file, max_frames, quality):
+    cap = cv2.VideoCapture(input_file)
+    jpegs = []
+    while len(jpegs) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        jpegs.append(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1])
+    cap.release()
+    return jpegs
+
+
+def time_per_item(func, items):
+    t0 = time.perf_counter()
+    out = [func(item) for item in items]
+    return out, (time.perf_counter() - t0) / len(items) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Decoding, tracking and freezing detection of color and of "
+                                                 "grayscale frames")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--quality', type=int, default=90, help='JPEG quality of the frames')
+
+    args = parser.parse_args()
+
+    jpegs = load_jpegs(args.input_file, args.max_frames, args.quality)
+    background_image = cv2.imread(args.background)
+    kwargs = dict(diff_type='div', div_coeff=5, thresh_type='manual', thresh=120, use_open_close=True)
+
+    results = {}
+    for name, flags, background in (
+            ('color', cv2.IMREAD_COLOR, background_image),
+            ('gray', cv2.IMREAD_GRAYSCALE, cv2.cvtColor(background_image, cv2.COLOR_BGR2GRAY))):
+        frames, decode_ms = time_per_item(lambda jpeg: cv2.imdecode(jpeg, flags), jpegs)
+        model = BackgroundModel(background, 5)
+        tracks, track_ms = time_per_item(lambda frame: get_largest_component_and_center(frame, model, **kwargs),
+                                         frames)
+        _, freezing_ms = time_per_item(
+            lambda i: get_largest_component_and_center(frames[i], frames[i - 1], get_edge=False, **kwargs),
+            range(1, len(frames)))
+        results[name] = np.array([track[3:] for track in tracks], dtype=float)
+        print(f"{name:>5}: decode {decode_ms:.2f} ms, tracking {track_ms:.2f} ms, freezing detection "
+              f"{freezing_ms:.2f} ms per frame")
+
+    distance = np.hypot(*(results['gray'] - results['color']).T)
+    print(f"center distance between color and gray (pixels): mean {np.nanmean(distance):.2f}, "
+          f"max {np.nanmax(distance):.2f}, found in one mode only: "
+          f"{(np.isnan(results['gray'][:, 0]) != np.isnan(results['color'][:, 0])).sum()}")
@@ -0,0 +1,104 @@
+import argparse
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.CameraSession import MultiCameraSession
+from client_host.GUI.ConfigManager import ConfigManager
+
+SERVER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'local_server', 'server.py'))
+
+
+def count_frame_sets(buffer, reader_index, res):
+    """Consumer of the frame sets"""
+    set_num = 0
+    while True:
+        index, frame_set = buffer.get_data(reader_index)
+        if index is None:
+            break
+        assert len({frame[1].shape for frame in frame_set[1]}) == 1
+        set_num += 1
+    res['sets'] = set_num
+
+
+def count_tracked(track_file):
+    """frames of the track file with a position"""
+    with open(track_file) as f:
+        return sum(1 for row in csv.DictReader(f) if row['x'] not in ('', 'nan'))
+
+
+def run_session(input_file, camera_num, framerate, base_port, stream_format, background=None):
+    servers = [subprocess.Popen([sys.executable, SERVER, '127.0.0.1', input_file,
+                                 '--control-port', str(base_port + k)], stdout=subprocess.DEVNULL)
+               for k in range(camera_num)]
+    # wait until the servers listen
+    time.sleep(2)
+
+    config_manager = ConfigManager(None)
+    config_manager.get_settings_config()['Camera']['framerate'] = str(framerate)
+    config_manager.get_settings_config()['Camera']['stream_format'] = stream_format
+    camera_configs = [{'rpi_address': '127.0.0.1', 'rpi_port': base_port + k, 'pc_address': '127.0.0.1',
+                       'pc_port': base_port + 100 + k, 'timestamp_port': base_port + 200 + k,
+                       'background': background,
+                       'area': ('rectangle', [0, 0, background.shape[1], background.shape[0]])
+                       if background is not None else None}
+                      for k in range(camera_num)]
+    # the cameras with a background are tracked, with the freezing detection
+    config_manager.get_realtime_detection_config()['Freezing Method'] = background is not None
+    session = MultiCameraSession(config_manager, camera_configs)
+    res = {}
+    with tempfile.TemporaryDirectory() as save_dir:
+        t0 = time.perf_counter()
+        cpu0 = time.process_time()
+        session.start_record(save_dir, 'benchmark')
+        consumer = threading.Thread(target=count_frame_sets,
+                                    args=(session.frame_set_buffer, session.frame_set_buffer.register_reader(), res))
+        consumer.start()
+        consumer.join()
+        res['duration'] = time.perf_counter() - t0
+        res['cpu'] = time.process_time() - cpu0
+        res.update(session.synchronizer.get_stats())
+        # the recorders wait 5 s for the timestamp files, which the local servers do not send
+        session.join()
+        if background is not None:
+            res['tracked'] = [count_tracked(os.path.join(save_dir, f"benchmark_cam{k + 1}_track_out.csv"))
+                              for k in range(camera_num)]
+    session.close()
+    for server in servers:
+        server.wait(timeout=10)
+    return res
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Several local_server/server.py instances recorded and synchronized "
+                                                 "by one MultiCameraSession")
+    parser.add_argument('input_file', type=str, help='video file sent by every server')
+    parser.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--framerate', type=int, default=30, help='frame rate of the video file')
+    parser.add_argument('--stream-format', type=str, nargs='+', default=['raw', 'framed'],
+                        help="'framed' streams carry the capture time of the sender, 'raw' frames get the host "
+                             "time at reception")
+    parser.add_argument('--background', type=str, default=None,
+                        help='background image: every camera is also tracked, with the freezing detection')
+    parser.add_argument('--base-port', type=int, default=15555,
+                        help='command ports from base-port, video ports from base-port + 100, '
+                             'timestamp ports from base-port + 200')
+
+    args = parser.parse_args()
+
+    background = cv2.imread(args.background) if args.background is not None else None
+    for stream_format, camera_num in [(f, n) for f in args.stream_format for n in args.cameras]:
+        res = run_session(args.input_file, camera_num, args.framerate, args.base_port, stream_format, background)
+        print(f"{stream_format:>6}, {camera_num} cameras: {res['sets']} frame sets, "
+              f"dropped {res['dropped_frames']}, max spread {res['max_spread_sec'] * 1000:.1f} ms, "
+              f"{res['sets'] * camera_num / res['duration']:.1f} frames/s, "
+              f"host CPU {res['cpu'] / res['duration'] * 100:.0f}%" +
+              (f", tracked frames per camera {res['tracked']}" if 'tracked' in res else ""))
@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.SearchWindow import PyramidSearch, touches_border
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def load_frames(input_file, max_frames, scale):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if scale != 1:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale)
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def track_frames(frames, background, pyramid_search=None):
+    """Same steps as TrackLiveModel.track_whole_frame, returns the centers, the time per frame (ms) and the
+    number of frames searched again as a whole at full resolution"""
+    kwargs = dict(diff_type='div', div_coeff=5, thresh_type='manual', thresh=120, use_open_close=True)
+    centers = []
+    fallback = 0
+    t0 = time.perf_counter()
+    for frame in frames:
+        res = None
+        if pyramid_search is not None:
+            window = pyramid_search.get_window(frame)
+            if window is not None:
+                res = get_largest_component_and_center(frame, background, window=window, **kwargs)
+                if res[2] is None or touches_border(res[2], window, frame.shape):
+                    res = None
+            if res is None:
+                fallback += 1
+        if res is None:
+            res = get_largest_component_and_center(frame, background, **kwargs)
+        centers.append(res[3:])
+    return np.array(centers, dtype=float), (time.perf_counter() - t0) / len(frames) * 1000, fallback
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tracking at full resolution and with a coarse search of the "
+                                                 "downscaled frame first")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 2], help='frames are resized by these')
+    parser.add_argument('--factors', type=int, nargs='+', default=[2, 4], help='downscale factors')
+
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        frames = load_frames(args.input_file, args.max_frames, scale)
+        background_image = cv2.imread(args.background)
+        if scale != 1:
+            background_image = cv2.resize(background_image, None, fx=scale, fy=scale)
+        background = BackgroundModel(background_image, div_coeff=5)
+
+        full_centers, full_ms, _ = track_frames(frames, background)
+        found = ~np.isnan(full_centers[:, 0])
+        print(f"{len(frames)} frames of {frames[0].shape}: full resolution {full_ms:.2f} ms")
+        for factor in args.factors:
+            pyramid_search = PyramidSearch(background_image, factor, diff_type='div', div_coeff=5, thresh=120)
+            centers, ms, fallback = track_frames(frames, background, pyramid_search)
+            distance = np.hypot(*(centers - full_centers).T)[found]
+            print(f"    factor {factor}: {ms:.2f} ms (x{full_ms / ms:.1f}), searched again at full resolution: "
+                  f"{fallback}, center distance (pixels): mean {distance.mean() if found.any() else np.nan:.2f}, "
+                  f"max {distance.max() if found.any() else np.nan:.2f}, "
+                  f"different detection: {(np.isnan(centers[:, 0]) != ~found).sum()}")
@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.SearchWindow import SearchWindow
+from client_host.Utils import BackgroundModel, get_largest_component_and_center
+
+
+def load_frames(input_file, max_frames, scale):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if scale != 1:
+            frame = cv2.resize(frame, None, fx=scale, fy=scale)
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def track_frames(frames, background, fps, search_window=None):
+    """Same steps as TrackLiveModel.get_res, returns the centers and the time per frame (ms)"""
+    kwargs = dict(diff_type='div', div_coeff=5, thresh_type='manual', thresh=120, use_open_close=True)
+    centers = []
+    t0 = time.perf_counter()
+    for i, frame in enumerate(frames):
+        t = i / fps
+        window = search_window.get_window(t) if search_window is not None else None
+        _, _, contour, cX, cY = get_largest_component_and_center(frame, background, window=window, **kwargs)
+        if window is not None and not search_window.update(t, contour, cX, cY, window):
+            window = None
+            _, _, contour, cX, cY = get_largest_component_and_center(frame, background, **kwargs)
+        if search_window is not None and window is None:
+            search_window.update(t, contour, cX, cY)
+        centers.append((cX, cY))
+    return np.array(centers, dtype=float), (time.perf_counter() - t0) / len(frames) * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Tracking of the whole frame and of a window around the "
+                                                 "predicted center")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--fps', type=float, default=15)
+    parser.add_argument('--scales', type=float, nargs='+', default=[1, 2], help='frames are resized by these')
+    parser.add_argument('--window-size', type=int, default=160)
+    parser.add_argument('--full-search-interval', type=int, default=30)
+
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        frames = load_frames(args.input_file, args.max_frames, scale)
+        background = cv2.imread(args.background)
+        if scale != 1:
+            background = cv2.resize(background, None, fx=scale, fy=scale)
+        background = BackgroundModel(background, div_coeff=5)
+
+        full_centers, full_ms = track_frames(frames, background, args.fps)
+        search_window = SearchWindow(frames[0].shape, int(args.window_size * scale), args.full_search_interval)
+        window_centers, window_ms = track_frames(frames, background, args.fps, search_window)
+        distance = np.hypot(*(window_centers - full_centers).T)
+        found = ~np.isnan(full_centers[:, 0])
+        print(f"{len(frames)} frames of {frames[0].shape}: whole frame {full_ms:.2f} ms, window {window_ms:.2f} ms "
+              f"(x{full_ms / window_ms:.1f}), {search_window.get_stats()}")
+        print(f"    center distance (pixels): max {np.nanmax(distance[found]) if found.any() else np.nan:.1f}, "
+              f"different detection: {(np.isnan(window_centers[:, 0]) != ~found).sum()}")
@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.DataBuffer import BoundedDataBuffer
+from client_host.SharedDataBuffer import SharedDataBuffer
+from client_host.Utils import get_largest_component_and_center
+
+
+def track(buffer, reader_index, background, result_list):
+    """Consumer doing the background subtraction of TrackLiveModel on every frame"""
+    n = 0
+    while True:
+        index, frame = buffer.get_data(reader_index)
+        if index is None:
+            break
+        get_largest_component_and_center(frame[1], background, diff_type='div', div_coeff=5, thresh_type='manual',
+                                         thresh=120, use_open_close=True)
+        n += 1
+    result_list.append(n)
+
+
+def track_process(buffer, reader_index, background, queue):
+    result_list = []
+    track(buffer, reader_index, background, result_list)
+    buffer.close()
+    queue.put(result_list[0])
+
+
+def feed(buffer, frames, frame_num):
+    t0 = time.perf_counter()
+    for i in range(frame_num):
+        buffer.add_data([time.time(), frames[i % len(frames)]])
+    buffer.add_data(None)
+    return t0
+
+
+def run_threads(frames, background, consumer_num, frame_num, slot_num):
+    buffer = BoundedDataBuffer("frame buffer", slot_num)
+    readers = [buffer.register_reader() for _ in range(consumer_num)]
+    result_list = []
+    threads = [threading.Thread(target=track, args=(buffer, reader, background, result_list)) for reader in readers]
+    for thread in threads:
+        thread.start()
+    t0 = feed(buffer, frames, frame_num)
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - t0, result_list
+
+
+def run_processes(frames, background, consumer_num, frame_num, slot_num):
+    context = multiprocessing.get_context('spawn')
+    buffer = SharedDataBuffer("frame buffer", slot_num, frames[0].shape, frames[0].dtype, mp_context=context)
+    readers = [buffer.register_reader() for _ in range(consumer_num)]
+    queue = context.Queue()
+    processes = [context.Process(target=track_process, args=(buffer, reader, background, queue))
+                 for reader in readers]
+    for process in processes:
+        process.start()
+    # wait until the consumers are started, the start up of a spawned process is not timed
+    time.sleep(2)
+    t0 = feed(buffer, frames, frame_num)
+    result_list = [queue.get() for _ in processes]
+    duration = time.perf_counter() - t0
+    for process in processes:
+        process.join()
+    buffer.close()
+    return duration, result_list
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Background subtraction consumers as threads on a DataBuffer "
+                                                 "or as processes on a SharedDataBuffer")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--consumers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--frames', type=int, default=600, help='frames fed into the buffer')
+    parser.add_argument('--slots', type=int, default=30, help='frames held by the buffer')
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.input_file, 100)
+    background = cv2.imread(args.background)
+    print(f"{len(frames)} frames of {frames[0].shape}, fed {args.frames} times")
+
+    for consumer_num in args.consumers:
+        for name, run in (('threads', run_threads), ('processes', run_processes)):
+            duration, result_list = run(frames, background, consumer_num, args.frames, args.slots)
+            assert all(n == args.frames for n in result_list)
+            print(f"{consumer_num} consumers, {name:>9}: {args.frames / duration:7.1f} fps "
+                  f"({consumer_num * args.frames / duration:7.1f} tracked frames/s)")
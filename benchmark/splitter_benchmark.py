@@ -0,0 +1,90 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from client_host.FrameSplitter import JpegFrameSplitter
+
+
+def load_mjpeg_stream(input_file, max_frames=0):
+    """
+    Load a recorded MJPEG stream. Raw streams (.mjpeg/.mjpg, concatenated JPEGs as sent by the RPi) are
+    used as they are, other videos are re-encoded frame by frame the same way local_server/server.py does.
+    """
+    if os.path.splitext(input_file)[1].lower() in ('.mjpeg', '.mjpg', '.jpeg', '.jpg'):
+        with open(input_file, 'rb') as f:
+            return f.read()
+
+    import cv2
+    cap = cv2.VideoCapture(input_file)
+    chunks = []
+    while True:
+        ret, frame = cap.read()
+        if not ret or (0 < max_frames <= len(chunks)):
+            break
+        _, encoded_frame = cv2.imencode('.jpg', frame)
+        chunks.append(encoded_frame.tobytes())
+    cap.release()
+    return b''.join(chunks)
+
+
+def legacy_split(stream, chunk_size):
+    """Frame splitting as done by RpiCamera.receive_video_frames before the JpegFrameSplitter"""
+    frame_num = 0
+    n_bytes = 0
+    buffer = b''
+    for i in range(0, len(stream), chunk_size):
+        buffer += stream[i:i + chunk_size]
+
+        start = buffer.find(b'\xff\xd8')
+        end = buffer.find(b'\xff\xd9')
+        while start != -1 and end != -1:
+            frame_data = buffer[start:end + 2]
+            n_bytes += len(frame_data)
+            frame_num += 1
+            buffer = buffer[end + 2:]
+            start = buffer.find(b'\xff\xd8')
+            end = buffer.find(b'\xff\xd9')
+    return frame_num, n_bytes
+
+
+def splitter_split(stream, chunk_size):
+    frame_num = 0
+    n_bytes = 0
+    view = memoryview(stream)
+    splitter = JpegFrameSplitter(chunk_size=chunk_size)
+    for i in range(0, len(stream), chunk_size):
+        splitter.feed(view[i:i + chunk_size])
+        for _, _, frame_data in splitter.frames():
+            n_bytes += len(frame_data)
+            frame_num += 1
+    return frame_num, n_bytes
+
+
+def run_benchmark(stream, chunk_size, repeat):
+    print(f"stream size: {len(stream) / 1e6:.2f} MB, chunk size: {chunk_size} bytes")
+    for name, func in (('legacy', legacy_split), ('splitter', splitter_split)):
+        best = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            frame_num, n_bytes = func(stream, chunk_size)
+            t = time.perf_counter() - t0
+            best = t if best is None else min(best, t)
+        print(f"{name:>8}: {frame_num} frames, {len(stream) / 1e6 / best:8.1f} MB/s, {frame_num / best:10.1f} fps")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="JPEG frame splitter throughput benchmark")
+    parser.add_argument('input_file', type=str, help='recorded MJPEG stream or video file')
+    parser.add_argument('--chunk-size', type=int, nargs='+', default=[4096, 65536, 640 * 640 * 3],
+                        help='bytes per simulated recv')
+    parser.add_argument('--max-frames', type=int, default=0, help='frames to load from a video file, 0 for all')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per splitter, best time is reported')
+
+    args = parser.parse_args()
+
+    stream = load_mjpeg_stream(args.input_file, args.max_frames)
+    for chunk_size in args.chunk_size:
+        run_benchmark(stream, chunk_size, args.repeat)
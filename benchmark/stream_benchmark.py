@@ -0,0 +1,89 @@
+import argparse
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.Camera import FLOW_CONTROL_ACK, FLOW_CONTROL_TCP, create_video_server
+from client_host.FrameSplitter import create_frame_splitter
+from local_server.server import read_encoded_frames, send_encoded_frames
+
+
+def receive_frames(server, stream_format, flow_control, chunk_size, arrival_list):
+    """Receive loop of RpiCamera.receive_video_frames without decoding"""
+    conn, addr = server.accept()
+    splitter = create_frame_splitter(stream_format, chunk_size=chunk_size)
+    try:
+        while True:
+            n = splitter.recv_into(conn)
+            if flow_control == FLOW_CONTROL_ACK:
+                conn.send(b"")
+            if not n:
+                break
+            now = time.time()
+            for sequence, pts, frame_data in splitter.frames():
+                arrival_list.append((now, pts))
+    finally:
+        conn.close()
+
+
+def run_once(frames, frame_rate, port, stream_format, flow_control, receive_buffer_size, chunk_size, paced):
+    server = create_video_server(port, flow_control, receive_buffer_size)
+    arrival_list = []
+    receiver = threading.Thread(target=receive_frames,
+                                args=(server, stream_format, flow_control, chunk_size, arrival_list))
+    receiver.start()
+
+    start_time = time.time()
+    send_encoded_frames('127.0.0.1', port, frames, frame_rate, stream_format, paced)
+    receiver.join()
+    duration = time.time() - start_time
+    server.close()
+
+    n_bytes = sum(len(frame) for frame in frames)
+    res = {'frames': len(arrival_list), 'fps': len(arrival_list) / duration, 'MB/s': n_bytes / 1e6 / duration}
+    if paced and stream_format == 'framed' and arrival_list:
+        # the sender stamps frame i with pts = i / frame_rate after its start, both ends share the clock
+        latency = np.array([arrival - start_time - pts / 1e6 for arrival, pts in arrival_list]) * 1000
+        res['latency mean ms'] = latency.mean()
+        res['latency p95 ms'] = np.percentile(latency, 95)
+    return res
+
+
+def print_res(name, res):
+    print(f"{name:>24}: " + ", ".join(f"{key} {value:.2f}" if isinstance(value, float) else f"{key} {value}"
+                                       for key, value in res.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Loopback benchmark of the video socket flow control modes")
+    parser.add_argument('input_file', type=str, help='video file, encoded to JPEG like local_server/server.py')
+    parser.add_argument('--port', type=int, default=12397)
+    parser.add_argument('--max-frames', type=int, default=600)
+    parser.add_argument('--receive-buffer-size', type=int, default=4 << 20)
+    parser.add_argument('--chunk-size', type=int, default=640 * 640 * 3, help='bytes per recv')
+
+    args = parser.parse_args()
+
+    cap = cv2.VideoCapture(args.input_file)
+    frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
+    frames = []
+    for frame in read_encoded_frames(cap):
+        frames.append(frame)
+        if len(frames) >= args.max_frames:
+            break
+    cap.release()
+    print(f"{len(frames)} frames, mean size {np.mean([len(f) for f in frames]) / 1000:.1f} kB, {frame_rate} fps")
+
+    for paced in (False, True):
+        print("paced at video frame rate (latency)" if paced else "unpaced (throughput)")
+        for flow_control in (FLOW_CONTROL_ACK, FLOW_CONTROL_TCP):
+            res = run_once(frames, frame_rate, args.port, 'framed', flow_control, args.receive_buffer_size,
+                           args.chunk_size, paced)
+            print_res(flow_control, res)
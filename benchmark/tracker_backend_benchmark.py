@@ -0,0 +1,78 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import cv2
+
+from client_host.Utils import BackgroundModel, get_largest_component_and_center, get_edge_and_center, \
+    get_component_and_center
+
+
+def load_frames(input_file, max_frames):
+    cap = cv2.VideoCapture(input_file)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def time_per_frame(func, items, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            func(item)
+        t = (time.perf_counter() - t0) / len(items)
+        best = t if best is None else min(best, t)
+    return best * 1000
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Center of the largest area with findContours + moments "
+                                                 "and with connectedComponentsWithStats")
+    parser.add_argument('input_file', type=str, help='video file')
+    parser.add_argument('background', type=str, help='background image')
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--no-open-close', action='store_true',
+                        help='skip the opening and closing, the thresholded images then have more small areas')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per backend, best time is reported')
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.input_file, args.max_frames)
+    background = BackgroundModel(cv2.imread(args.background), div_coeff=5)
+    use_open_close = not args.no_open_close
+    kwargs = dict(diff_type='div', div_coeff=5, thresh_type='manual', thresh=120, use_open_close=use_open_close)
+    thresh_images = [get_largest_component_and_center(frame, background, get_edge=False, **kwargs)[1]
+                     for frame in frames]
+    print(f"{len(frames)} frames of {frames[0].shape}")
+
+    distance = []
+    missing = 0
+    for thresh_img in thresh_images:
+        _, x0, y0 = get_edge_and_center(thresh_img, use_open_close)
+        _, x1, y1 = get_component_and_center(thresh_img, use_open_close)
+        if np.isnan(x0) or np.isnan(x1):
+            missing += np.isnan(x0) != np.isnan(x1)
+            continue
+        distance.append(np.hypot(x1 - x0, y1 - y0))
+    distance = np.array(distance)
+    print(f"center distance between the backends (pixels): mean {distance.mean():.2f}, max {distance.max():.2f}, "
+          f"found by one backend only: {missing}")
+
+    for name, find_center in (('contours', get_edge_and_center), ('components', get_component_and_center)):
+        center_ms = time_per_frame(lambda t: find_center(t, use_open_close), thresh_images, args.repeat)
+        track_ms = time_per_frame(lambda f: get_largest_component_and_center(f, background, backend=name, **kwargs),
+                                  frames, args.repeat)
+        print(f"{name:>10}: center {center_ms:.2f} ms, tracking {track_ms:.2f} ms")
+    contour_ms = time_per_frame(lambda t: get_component_and_center(t, use_open_close)[0].get(), thresh_images, args.repeat)
+    print(f"components with the contour traced: {contour_ms:.2f} ms")
@@ -0,0 +1,92 @@
+import cv2
+import numpy as np
+
+from client_host.Utils import BackgroundModel, MORPHOLOGY_MARGIN, get_roi_mask, get_roi_crop, \
+    get_largest_component_and_center, get_component_and_center
+
+
+class ArenaTracker:
+    """
+    Tracking of one animal in each of several arenas seen by the same camera, with one background
+    subtraction pass.
+
+    The difference and threshold are computed once over the bounding box of all the arenas, with everything
+    outside the arenas set to 0. The opening, closing and connected components are then computed on the crop
+    of each arena with only its own pixels, so the animals of arenas sharing a wall are never joined, and the
+    largest component of each arena gives its center, as with the 'components' backend of
+    get_largest_component_and_center on that arena. Arenas should not overlap.
+    """
+
+    def __init__(self, background, arenas, diff_type='div', div_coeff=5, thresh=120, use_open_close=True):
+        """
+        :param background: background image
+        :param arenas: list of (area_type, area_points)
+        """
+        self.background = BackgroundModel(background, div_coeff)
+        self.arenas = arenas
+        self.diff_type = diff_type
+        self.thresh = thresh
+        self.use_open_close = use_open_close
+
+        height, width = background.shape[:2]
+        mask = np.zeros((height, width), np.uint8)
+        for area_type, area_points in arenas:
+            cv2.bitwise_or(mask, get_roi_mask((height, width), area_type, area_points), dst=mask)
+        x, y, w, h = cv2.boundingRect(mask)
+        margin = MORPHOLOGY_MARGIN if use_open_close else 0
+        self.crop = (max(x - margin, 0), max(y - margin, 0), min(x + w + margin, width),
+                     min(y + h + margin, height))
+        x0, y0, x1, y1 = self.crop
+        self.mask = np.ascontiguousarray(mask[y0:y1, x0:x1])
+        self.color_mask = cv2.merge([self.mask] * 3)
+
+        # crop of every arena, the one of get_largest_component_and_center, in the coordinates of self.crop,
+        # with the mask of the arena
+        self.arena_crops = []
+        for area_type, area_points in arenas:
+            ax0, ay0, ax1, ay1 = get_roi_crop((height, width), area_type, area_points, margin) or \
+                (0, 0, width, height)
+            arena_mask = get_roi_mask((height, width), area_type, area_points)[ay0:ay1, ax0:ax1]
+            self.arena_crops.append(((ax0 - x0, ay0 - y0, ax1 - x0, ay1 - y0), np.ascontiguousarray(arena_mask)))
+
+    def track(self, frame):
+        """
+        :return: difference, thresh_img and, for every arena, (contour, cX, cY). contour is a
+                 ComponentContour, None with cX and cY nan when nothing was found in the arena
+        """
+        x0, y0, x1, y1 = self.crop
+        difference, thresh_img, _, _, _ = \
+            get_largest_component_and_center(frame, self.background, thresh_type='manual', thresh=self.thresh,
+                                             diff_type=self.diff_type, get_edge=False, window=self.crop)
+        difference_crop = difference[y0:y1, x0:x1]
+        cv2.bitwise_and(difference_crop, self.mask if difference.ndim == 2 else self.color_mask,
+                        dst=difference_crop)
+        thresh_crop = thresh_img[y0:y1, x0:x1]
+        cv2.bitwise_and(thresh_crop, self.mask, dst=thresh_crop)
+
+        res_list = []
+        for (ax0, ay0, ax1, ay1), arena_mask in self.arena_crops:
+            # the pixels of the other arenas in the crop are left out, the closing could join them
+            arena_thresh = cv2.bitwise_and(thresh_crop[ay0:ay1, ax0:ax1], arena_mask)
+            res_list.append(get_component_and_center(arena_thresh, self.use_open_close,
+                                                     (x0 + ax0, y0 + ay0)))
+        return difference, thresh_img, res_list
+
+
+class ArenaBuffers:
+    """
+    Output buffer of a multi-arena tracker: the [index, [out of arena 1, out of arena 2, ...]] items are split
+    into one buffer per arena, None finishes every buffer.
+    """
+
+    def __init__(self, buffers):
+        self.buffers = buffers
+
+    def add_data(self, data):
+        if data is None:
+            for buffer in self.buffers:
+                buffer.add_data(None)
+            return
+        index, out_list = data
+        for buffer, out in zip(self.buffers, out_list):
+            buffer.add_data([index, out])
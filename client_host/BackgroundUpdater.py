@@ -0,0 +1,110 @@
+import threading
+
+import cv2
+import numpy as np
+
+from client_host.SearchWindow import downscale
+from client_host.Utils import Log_thread_begin, Log_thread_finish
+
+
+class BackgroundUpdater:
+    """
+    Running average of the frames, excluding the tracked animal, updating the background of the tracking
+    to follow slow changes of the lighting over long sessions.
+
+    The tracking thread hands over a copy of a frame every interval seconds with submit. The average and
+    the precomputed planes of the new background are computed on a separate thread, then swapped into the
+    BackgroundModel objects in one assignment (BackgroundModel.update), so the tracking thread never waits.
+    """
+
+    def __init__(self, background, models, rate=0.05, interval=10, margin=20):
+        """
+        :param background: initial background image
+        :param models: list of (BackgroundModel, factor): the models updated with the background downscaled
+                       by factor (see SearchWindow.downscale)
+        :param rate: weight of a new frame in the average
+        :param interval: min seconds between two frames added to the average
+        :param margin: pixels around the animal not added to the average
+        """
+        self.initial_background = background
+        self.models = models
+        self.rate = rate
+        self.interval = interval
+        self.margin = margin
+
+        self.average = None
+        self.pending = None
+        self.last_submit_time = None
+        self.event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.update_count = 0
+
+    def reset(self):
+        """
+        Go back to the initial background
+        """
+        self.average = self.initial_background.astype(np.float32)
+        self.pending = None
+        self.last_submit_time = None
+        self.update_count = 0
+        self._swap(self.initial_background)
+
+    def start(self):
+        self.reset()
+        self.running = True
+        self.thread = threading.Thread(target=self.update_thread)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is None:
+            return
+        self.running = False
+        self.event.set()
+        self.thread.join()
+        self.thread = None
+        print(f"background updated {self.update_count} times")
+
+    def submit(self, t, frame, bbox):
+        """
+        Called by the tracking thread for every frame, only keeps a frame every interval seconds
+        :param t: frame time (sec)
+        :param bbox: (x, y, w, h) of the animal, None if it was not found
+        """
+        if bbox is None or not self.running:
+            # without the animal position the frame may contain it anywhere
+            return
+        if self.last_submit_time is not None and t - self.last_submit_time < self.interval:
+            return
+        with self.lock:
+            if self.pending is not None:
+                return
+            # the frame buffer may reuse the memory of the frame
+            self.pending = (frame.copy(), bbox)
+        self.last_submit_time = t
+        self.event.set()
+
+    def update_thread(self):
+        Log_thread_begin("Background update")
+        while True:
+            self.event.wait()
+            self.event.clear()
+            if not self.running:
+                break
+            with self.lock:
+                pending, self.pending = self.pending, None
+            if pending is None:
+                continue
+            frame, (x, y, w, h) = pending
+            mask = np.full(frame.shape[:2], 255, np.uint8)
+            m = self.margin
+            mask[max(y - m, 0):y + h + m, max(x - m, 0):x + w + m] = 0
+            cv2.accumulateWeighted(frame, self.average, self.rate, mask)
+            self._swap(cv2.convertScaleAbs(self.average))
+            self.update_count += 1
+        Log_thread_finish("Background update")
+
+    def _swap(self, background):
+        for model, factor in self.models:
+            model.update(background if factor == 1 else downscale(background, factor))
@@ -6,14 +6,37 @@ import cv2
 import numpy as np
 import zmq
 
+from client_host.FrameDecoder import FrameDecoder
+from client_host.FrameSplitter import STREAM_RAW, create_frame_splitter
+from client_host.MjpegWriter import RECORD_MP4
+
+# 'ack': send an empty message after every recv (previous behaviour)
+# 'tcp': no application level acks, rely on TCP windowing with an enlarged receive buffer
+FLOW_CONTROL_ACK = 'ack'
+FLOW_CONTROL_TCP = 'tcp'
+
+
+def create_video_server(port, flow_control=FLOW_CONTROL_TCP, receive_buffer_size=4 << 20):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if flow_control == FLOW_CONTROL_TCP and receive_buffer_size > 0:
+        # must be set before listen, the accepted connection inherits it and the window scale is negotiated
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer_size)
+    server.bind(('', int(port)))
+    server.listen(1)
+    return server
+
 
 class RpiCamera(object):
     def __init__(self, controller, address, pc_address, port_rpi, port_video,
-                 resolution_width, resolution_height, framerate):
+                 resolution_width, resolution_height, framerate, port_timestamp=5556):
         self.controller = controller
         self.rpi_connected = False
         self.video_ready = False
         self.port_video = port_video
+        # port receiving the timestamp file of the RPi when the recording stops
+        self.port_timestamp = port_timestamp
+        # host time (time.time()) of the time 0 of the frames of the last recording
+        self.time_origin = None
         self.address = address
         self.pc_address = pc_address
         url = "tcp://%s:%s" % (address, port_rpi)
@@ -21,6 +44,8 @@ class RpiCamera(object):
         self.width = resolution_width
         self.height = resolution_height
         self.framerate = framerate
+        self.stream_format = STREAM_RAW
+        self.flow_control = FLOW_CONTROL_TCP
         self.socket = None
 
         self.context = zmq.Context()
@@ -59,52 +84,66 @@ class RpiCamera(object):
         conn = None
         n_bytes = 0
         frame_num = 0
+        dropped_frame_num = 0
+        last_sequence = None
+        first_pts = None
+        workers, max_in_flight = self.controller.config_manager.get_decode_parameters()
+        keep_jpeg = self.controller.config_manager.get_record_format() != RECORD_MP4
+        gray = self.controller.config_manager.get_color_mode() == 'gray'
+        flags = cv2.IMREAD_GRAYSCALE if gray else cv2.IMREAD_COLOR
+        decoder = FrameDecoder(frame_buffer, workers, max_in_flight, keep_jpeg, flags)
+        decoder.start()
         try:
             conn, addr = server.accept()
-            buffer = b''
+            splitter = create_frame_splitter(self.stream_format, chunk_size=self.height * self.width * 3)
             start_time = time.time()
+            self.time_origin = start_time
 
             while True:
                 if (record_time > 0) and (time.time() - start_time > record_time):
                     self.controller.record_finish()
-                data = conn.recv(self.height * self.width * 3)
-                conn.send(b"")
+                n = splitter.recv_into(conn)
+                if self.flow_control == FLOW_CONTROL_ACK:
+                    conn.send(b"")
                 current_time = time.time() - start_time
-                if not data:
-                    frame_buffer.add_data(None)
+                if not n:
+                    decoder.finish()
                     self.controller.record_finish()
                     print("No data, now break")
                     break
-                buffer += data
 
-                # Find the start and end of the JPEG frame
-                start_marker = b'\xff\xd8'
-                end_marker = b'\xff\xd9'
+                for sequence, pts, frame_data in splitter.frames():
+                    if last_sequence is not None and sequence != last_sequence + 1:
+                        dropped_frame_num += max(sequence - last_sequence - 1, 0)
+                    last_sequence = sequence
 
-                start = buffer.find(start_marker)
-                end = buffer.find(end_marker)
+                    # use the capture time of the RPi encoder when the stream carries it
+                    frame_time = current_time
+                    if pts is not None:
+                        if first_pts is None:
+                            first_pts = pts
+                            # the RPi clock is not the host one, the first frame is taken as received at once
+                            self.time_origin = start_time + current_time
+                        frame_time = (pts - first_pts) / 1000000.0
 
-                while start != -1 and end != -1:
-                    frame_data = buffer[start:end + 2]
                     n_bytes += len(frame_data)
-                    frame = cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), cv2.IMREAD_COLOR)
-                    frame_buffer.add_data([current_time, frame])
+                    decoder.submit(frame_time, frame_data)
                     frame_num += 1
-                    buffer = buffer[end + 2:]
-                    start = buffer.find(start_marker)
-                    end = buffer.find(end_marker)
 
         finally:
+            decoder.finish()
             print(f"receive frame num: {frame_num}")
+            if dropped_frame_num:
+                print(f"dropped frame num: {dropped_frame_num}")
             if conn is not None:
                 conn.close()
 
     def start_record(self, record_time, frame_buffer):
         print("now in start record")
+        self.stream_format = self.controller.config_manager.get_stream_format()
+        self.flow_control, receive_buffer_size = self.controller.config_manager.get_flow_control_parameters()
 
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(('', int(self.port_video)))
-        server.listen(1)
+        server = create_video_server(self.port_video, self.flow_control, receive_buffer_size)
 
         thread = threading.Thread(target=self.receive_video_frames, args=(server, frame_buffer, record_time))
         thread.start()
@@ -112,6 +151,9 @@ class RpiCamera(object):
         try:
             msg = "Start"
             msg += " " + self.pc_address
+            msg += " " + self.stream_format
+            msg += " " + str(self.port_video)
+            msg += " " + str(self.port_timestamp)
             self.socket.send_string(msg)
             print(self.socket.recv())
         finally:
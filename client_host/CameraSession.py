@@ -0,0 +1,206 @@
+import threading
+
+import cv2
+
+from client_host.Camera import RpiCamera
+from client_host.DataBuffer import DataBuffer, create_frame_buffer
+from client_host.FrameSynchronizer import FrameSynchronizer
+from client_host.PostDetect import DetectFreezing, DetectSpeed, DetectAcceleration
+from client_host.Recorder import Recorder
+from client_host.SearchWindow import SearchWindow
+from client_host.TrackModel import TrackLiveModel
+
+
+class CameraPipeline:
+    """
+    Tracking and detections of one camera of a MultiCameraSession, with the settings of config_manager.
+
+    The pipeline is the controller of its tracker, detectors and recorder, as Controller is for the camera of
+    the main window: they read the settings and the detector buffers from it. Tracking uses the background
+    subtraction method with the background of the camera. The freezing, speed and acceleration detections
+    checked on the main window run on the camera, without close loop: the TTL output follows the camera of
+    the main window.
+    """
+
+    def __init__(self, config_manager, camera, background, area=None):
+        """
+        :param background: background image of the camera
+        :param area: (area_type, area_points) tracked, default: the region of interest of the settings
+        """
+        self.config_manager = config_manager
+        self.rpi_camera = camera
+        self.save_dir = ''
+        self.trial_name = ''
+
+        detection_config = config_manager.get_realtime_detection_config()
+        area_type, area_points = area if area is not None else config_manager.get_region_of_interest_area()
+        fps = camera.get_framerate()
+        duration, delay, _ = config_manager.get_settings_close_loop_parameters()
+        if config_manager.get_color_mode() == 'gray' and background.ndim == 3:
+            background = cv2.cvtColor(background, cv2.COLOR_BGR2GRAY)
+
+        window_size, full_search_interval = config_manager.get_search_window_parameters()
+        search_window = SearchWindow(background.shape, window_size, full_search_interval) \
+            if window_size > 0 else None
+        self.track_live = TrackLiveModel(self, background, area_type, area_points,
+                                         config_manager.get_tracking_backend(), search_window,
+                                         config_manager.get_pyramid_factor(),
+                                         *config_manager.get_background_update_parameters())
+        self.detectors = {}
+        if detection_config['Freezing Method']:
+            self.detectors['freezing'] = DetectFreezing(self, fps, delay, duration, (area_type, area_points))
+        if detection_config['Speed Method']:
+            self.detectors['speed'] = DetectSpeed(self, fps, delay, duration)
+        if detection_config['Acceleration Method']:
+            self.detectors['acceleration'] = DetectAcceleration(self, delay, duration)
+        for detector in self.detectors.values():
+            detector.use_close_loop = False
+
+        # read by the Recorder
+        self.track_buffer = None
+        self.position_detector_buffer = None
+        self.freezing_detector_buffer = None
+        self.speed_detector_buffer = None
+        self.acceleration_detector_buffer = None
+        self.custom_detector_buffer = None
+        self.arena_track_buffers = []
+        self.arena_detector_buffers = []
+
+    def start_record(self, frame_buffer, save_dir, trial_name, wakeup):
+        self.save_dir = save_dir
+        self.trial_name = trial_name
+        self.track_buffer = DataBuffer(f"track buffer {trial_name}", wakeup=wakeup)
+        self.track_live.start_record(frame_buffer, self.track_buffer)
+        for name, detector in self.detectors.items():
+            buffer = DataBuffer(f"{name} buffer {trial_name}", wakeup=wakeup)
+            setattr(self, f"{name}_detector_buffer", buffer)
+            detector.start_record(frame_buffer if name == 'freezing' else self.track_buffer, buffer)
+
+    def close(self):
+        self.track_live.close()
+        for detector in self.detectors.values():
+            detector.close()
+
+
+class MultiCameraSession:
+    """
+    Several Raspberry Pi cameras recorded from one host.
+
+    Every camera streams to its own video port and sends its timestamps to its own port, and has its own
+    frame buffer, decoding threads and recorder, and, with a background, its own CameraPipeline of tracking
+    and detections, so the cameras run concurrently. With synchronize, a FrameSynchronizer groups their frames
+    by capture time into frame sets in frame_set_buffer.
+
+    The session is the controller of its RpiCamera objects: they get the settings from config_manager and
+    call record_finish when their stream ends.
+
+    Only used from scripts (Controller.init_camera_session): the GUI, prepare and start_record of the Controller
+    still record the single camera of the main window, the session cameras have no playback window.
+    """
+
+    def __init__(self, config_manager, camera_configs, synchronize=True, tolerance=None):
+        """
+        :param camera_configs: one dict per camera with 'rpi_address', 'rpi_port', 'pc_address', 'pc_port'
+                               (video port of the host) and 'timestamp_port', default 5556 + camera index.
+                               Optional 'background': background image of the camera, the camera is then
+                               tracked, and 'area': (area_type, area_points) tracked, default the region of
+                               interest of the settings. Without background the camera is only recorded
+        :param tolerance: max difference of capture time between the frames of a set (sec), default one
+                          frame period, the cameras are not triggered together and their frames can be up to
+                          a period apart
+        """
+        self.config_manager = config_manager
+        self.synchronize = synchronize
+        width, height, framerate = config_manager.get_camera_config_setting()
+        self.tolerance = tolerance if tolerance is not None else 1.0 / framerate
+
+        self.cameras = []
+        self.pipelines = []
+        try:
+            for k, config in enumerate(camera_configs):
+                camera = RpiCamera(self, config['rpi_address'], config['pc_address'], config['rpi_port'],
+                                   config['pc_port'], width, height, framerate,
+                                   int(config.get('timestamp_port', 5556 + k)))
+                self.cameras.append(camera)
+                self.pipelines.append(CameraPipeline(config_manager, camera, config['background'],
+                                                     config.get('area'))
+                                      if config.get('background') is not None else None)
+        except Exception as e:
+            self.close()
+            raise e
+
+        self.frame_buffers = []
+        self.frame_set_buffer = None
+        self.synchronizer = None
+        self.recorder_threads = []
+        self.recording_label = False
+        self.lock = threading.Lock()
+
+    def set_ttl_params(self, duration, interval):
+        for camera in self.cameras:
+            camera.set_ttl_params(duration, interval)
+
+    def start_record(self, save_dir, trial_name, record_time=0):
+        """
+        The videos are recorded in <trial_name>_cam<k>. Readers of frame_set_buffer must be registered before
+        the first frames arrive.
+        """
+        capacity, capacity_bytes, _ = self.config_manager.get_frame_buffer_parameters()
+        wakeup = self.config_manager.get_buffer_wakeup()
+        self.recorder_threads = []
+        self.frame_buffers = [create_frame_buffer(f"frame buffer {k + 1}", capacity, capacity_bytes, wakeup)
+                              for k in range(len(self.cameras))]
+
+        if self.synchronize:
+            self.frame_set_buffer = DataBuffer("frame set buffer", wakeup=wakeup)
+            # time origins are read once the streams started
+            time_origins = [lambda camera=camera: camera.time_origin for camera in self.cameras]
+            self.synchronizer = FrameSynchronizer(self.frame_buffers, self.frame_set_buffer, self.tolerance,
+                                                  time_origins)
+            self.synchronizer.start()
+
+        for k, (camera, pipeline, frame_buffer) in enumerate(zip(self.cameras, self.pipelines, self.frame_buffers)):
+            camera_trial_name = f"{trial_name}_cam{k + 1}"
+            if pipeline is not None:
+                pipeline.start_record(frame_buffer, save_dir, camera_trial_name, wakeup)
+            # the pipeline records the tracking and detections of the camera, and runs the analysis
+            recorder = Recorder(pipeline if pipeline is not None else self, frame_buffer,
+                                pipeline.track_buffer if pipeline is not None else None, save_dir,
+                                camera_trial_name, fps=camera.get_framerate(), frame_width=camera.get_frame_width(),
+                                frame_height=camera.get_frame_height(), timestamp_port=camera.port_timestamp,
+                                record_results=pipeline is not None)
+            self.recorder_threads.append(recorder.start())
+
+        self.recording_label = True
+        for camera, frame_buffer in zip(self.cameras, self.frame_buffers):
+            camera.start_record(record_time, frame_buffer)
+
+    def join(self):
+        """
+        Wait until the streams ended and every frame was synchronized and recorded
+        """
+        if self.synchronizer is not None:
+            self.synchronizer.join()
+        for thread in self.recorder_threads:
+            thread.join()
+
+    def record_finish(self):
+        # called by the receiving thread of every camera when its stream ends or the record time is reached
+        self.stop_record()
+
+    def stop_record(self):
+        with self.lock:
+            if not self.recording_label:
+                return
+            self.recording_label = False
+        for camera in self.cameras:
+            camera.stop_record()
+
+    def close(self):
+        for pipeline in self.pipelines:
+            if pipeline is not None:
+                pipeline.close()
+        self.pipelines = []
+        for camera in self.cameras:
+            camera.close()
+        self.cameras = []
@@ -2,8 +2,11 @@ from datetime import datetime
 
 from client_host.Camera import RpiCamera
 from client_host.Custom import input_data_type
-from client_host.TrackModel import DLCLiveModel, TrackLiveModel
-from client_host.DataBuffer import DataBuffer
+from client_host.TrackModel import DLCLiveModel, TrackLiveModel, MultiArenaTrackModel
+from client_host.SearchWindow import SearchWindow
+from client_host.CameraSession import MultiCameraSession
+from client_host.DataBuffer import DataBuffer, create_frame_buffer
+from client_host.DLCModelCache import dlc_model_cache
 from client_host.GUI.ConfigManager import ConfigManager
 from client_host.PlayBack import PlayBack
 from client_host.Utils import *
@@ -23,6 +26,8 @@ class Controller(object):
         self.main_gui = main_gui
 
         self.rpi_camera = None
+        # several cameras recorded together from scripts, see CameraSession, not reached from the GUI
+        self.camera_session = None
 
         self.dlc_live = None
         self.track_live = None
@@ -40,6 +45,13 @@ class Controller(object):
         self.acceleration_detector_buffer = None
         self.custom_detector_buffer = None
 
+        # multi-arena tracking: number of arenas (0: one animal), buffers of every arena, detectors and their
+        # buffers of the arenas after the first one, which uses the attributes above
+        self.arena_num = 0
+        self.arena_track_buffers = []
+        self.arena_detectors = []
+        self.arena_detector_buffers = []
+
         self.recording_label = False
 
         self.save_dir = ''
@@ -63,6 +75,8 @@ class Controller(object):
         self.acceleration_detector = None
         self.position_detector = None
         self.custom_detector = None
+        self.arena_num = 0
+        self.arena_detectors = []
 
         detection_config = self.config_manager.get_realtime_detection_config()
         settings_config = self.config_manager.get_settings_config()
@@ -70,6 +84,7 @@ class Controller(object):
         fps = int(self.config_manager.get_settings_config()['Camera']['framerate'])
         area_type, area_points = self.config_manager.get_region_of_interest_area()
         duration, delay, interval = self.config_manager.get_settings_close_loop_parameters()
+        arenas = self.config_manager.get_arenas()
 
         if detection_config['Custom Method']:
             if input_data_type != 'frame' and input_data_type != 'xy' and input_data_type != 'dlc-live key points':
@@ -83,11 +98,27 @@ class Controller(object):
             if settings_config['Tracking']['method'] == 'DLC_live':
                 model_path = settings_config['Tracking']['DLC_live_path']
                 key_points = settings_config['Tracking']['key_points']
-                self.dlc_live = DLCLiveModel(self, model_path, background_photo, area_type, area_points, key_points)
+                self.dlc_live = DLCLiveModel(self, model_path, background_photo, area_type, area_points, key_points,
+                                             *self.config_manager.get_dlc_batch_parameters(),
+                                             crop_size=self.config_manager.get_dlc_crop_size())
             else:
-                self.track_live = TrackLiveModel(self, background_photo, area_type, area_points)
+                if self.config_manager.get_color_mode() == 'gray' and background_photo.ndim == 3:
+                    background_photo = cv2.cvtColor(background_photo, cv2.COLOR_BGR2GRAY)
+            if settings_config['Tracking']['method'] != 'DLC_live' and arenas:
+                self.track_live = MultiArenaTrackModel(self, background_photo, arenas)
+                self.arena_num = len(arenas)
+                # the freezing detection of every arena uses its mask for the 2-D crop and for the frame
+                reserve_roi_masks(2 * self.arena_num)
+            elif settings_config['Tracking']['method'] != 'DLC_live':
+                window_size, full_search_interval = self.config_manager.get_search_window_parameters()
+                search_window = SearchWindow(background_photo.shape, window_size, full_search_interval) \
+                    if window_size > 0 else None
+                self.track_live = TrackLiveModel(self, background_photo, area_type, area_points,
+                                                 self.config_manager.get_tracking_backend(), search_window,
+                                                 self.config_manager.get_pyramid_factor(),
+                                                 *self.config_manager.get_background_update_parameters())
         if detection_config['Freezing Method']:
-            self.freezing_detector = DetectFreezing(self, fps, delay, duration)
+            self.freezing_detector = DetectFreezing(self, fps, delay, duration, arenas[0] if self.arena_num else None)
         if detection_config['Speed Method']:
             self.speed_detector = DetectSpeed(self, fps, delay, duration)
         if detection_config['Acceleration Method']:
@@ -100,6 +131,20 @@ class Controller(object):
             else:
                 self.custom_detector = DetectCustom(self, delay, duration)
 
+        # the other arenas get their own freezing, speed and acceleration detection, the closed loop control
+        # follows the first arena
+        for arena in arenas[1:self.arena_num]:
+            detectors = {}
+            if detection_config['Freezing Method']:
+                detectors['freezing'] = DetectFreezing(self, fps, delay, duration, arena)
+            if detection_config['Speed Method']:
+                detectors['speed'] = DetectSpeed(self, fps, delay, duration)
+            if detection_config['Acceleration Method']:
+                detectors['acceleration'] = DetectAcceleration(self, delay, duration)
+            for detector in detectors.values():
+                detector.use_close_loop = False
+            self.arena_detectors.append(detectors)
+
     def cancel_prepare(self):
         detectors = {
             'dlc_live': self.dlc_live,
@@ -115,6 +160,27 @@ class Controller(object):
             if detector is not None:
                 detector.close()
                 setattr(self, name, None)
+        for detectors in self.arena_detectors:
+            for detector in detectors.values():
+                detector.close()
+        self.arena_detectors = []
+
+    def warmup_dlc_model(self):
+        """
+        Load the DLC-Live model of the settings in the background, prepare then reuses it. The models of other
+        paths are closed.
+        """
+        tracking_config = self.config_manager.get_settings_config()['Tracking']
+        background_photo = self.config_manager.get_background_image()
+        if tracking_config.get('method') != 'DLC_live' or not tracking_config.get('DLC_live_path'):
+            return
+        model_path = tracking_config['DLC_live_path']
+        dlc_model_cache.evict(keep_path=model_path)
+        if background_photo is not None:
+            dlc_model_cache.warmup(model_path, background_photo)
+
+    def close_dlc_models(self):
+        dlc_model_cache.evict()
 
     def camera_capture(self):
         if self.rpi_camera is None:
@@ -141,6 +207,20 @@ class Controller(object):
             self.rpi_camera.close()
             self.rpi_camera = None
 
+    def init_camera_session(self, camera_configs, synchronize=True, tolerance=None):
+        """
+        Several cameras recorded and tracked together, for scripts: the session is not used by prepare and
+        start_record
+        """
+        self.close_camera_session()
+        self.camera_session = MultiCameraSession(self.config_manager, camera_configs, synchronize, tolerance)
+        return self.camera_session
+
+    def close_camera_session(self):
+        if self.camera_session is not None:
+            self.camera_session.close()
+            self.camera_session = None
+
     def start_record(self):
         cv2.destroyAllWindows()
 
@@ -148,40 +228,57 @@ class Controller(object):
 
         self.trial_name = self.trial_name + datetime.now().strftime("_%Y-%m-%d_%H-%M-%S")
 
-        frame_buffer = DataBuffer("frame buffer")
+        capacity, capacity_bytes, _ = self.config_manager.get_frame_buffer_parameters()
+        wakeup = self.config_manager.get_buffer_wakeup()
+        frame_buffer = create_frame_buffer("frame buffer", capacity, capacity_bytes, wakeup)
 
         if self.dlc_live is not None:
-            self.track_buffer = DataBuffer("dlc buffer")
+            self.track_buffer = DataBuffer("dlc buffer", wakeup=wakeup)
             self.dlc_live.start_record(frame_buffer, self.track_buffer)
+        elif self.arena_num:
+            self.arena_track_buffers = [DataBuffer(f"track buffer {k + 1}", wakeup=wakeup)
+                                        for k in range(self.arena_num)]
+            self.track_buffer = self.arena_track_buffers[0]
+            self.track_live.start_record(frame_buffer, self.arena_track_buffers)
         elif self.track_live is not None:
-            self.track_buffer = DataBuffer("track buffer")
+            self.track_buffer = DataBuffer("track buffer", wakeup=wakeup)
             self.track_live.start_record(frame_buffer, self.track_buffer)
 
         if self.position_detector is not None:
-            self.position_detector_buffer = DataBuffer('position buffer')
+            self.position_detector_buffer = DataBuffer('position buffer', wakeup=wakeup)
             self.position_detector.start_record(self.track_buffer, self.position_detector_buffer)
         if self.freezing_detector is not None:
-            self.freezing_detector_buffer = DataBuffer('freezing buffer')
+            self.freezing_detector_buffer = DataBuffer('freezing buffer', wakeup=wakeup)
             self.freezing_detector.start_record(frame_buffer, self.freezing_detector_buffer)
         if self.speed_detector is not None:
-            self.speed_detector_buffer = DataBuffer('speed buffer')
+            self.speed_detector_buffer = DataBuffer('speed buffer', wakeup=wakeup)
             self.speed_detector.start_record(self.track_buffer, self.speed_detector_buffer)
         if self.acceleration_detector is not None:
-            self.acceleration_detector_buffer = DataBuffer('acceleration buffer')
+            self.acceleration_detector_buffer = DataBuffer('acceleration buffer', wakeup=wakeup)
             self.acceleration_detector.start_record(self.track_buffer, self.acceleration_detector_buffer)
         if self.custom_detector is not None:
-            self.custom_detector_buffer = DataBuffer('custom buffer')
+            self.custom_detector_buffer = DataBuffer('custom buffer', wakeup=wakeup)
             if input_data_type == 'frame':
                 self.custom_detector.start_record(frame_buffer, self.custom_detector_buffer)
             else:
                 self.custom_detector.start_record(self.track_buffer, self.custom_detector_buffer)
 
+        self.arena_detector_buffers = []
+        for k, detectors in enumerate(self.arena_detectors):
+            buffers = {}
+            for name, detector in detectors.items():
+                buffers[name] = DataBuffer(f"{name} buffer {k + 2}", wakeup=wakeup)
+                detector.start_record(frame_buffer if name == 'freezing' else self.arena_track_buffers[k + 1],
+                                      buffers[name])
+            self.arena_detector_buffers.append(buffers)
+
         playback = PlayBack(self, frame_buffer)
         playback.start()
 
         recorder = Recorder(self, frame_buffer, self.track_buffer, self.save_dir, self.trial_name,
                             fps=self.rpi_camera.get_framerate(), frame_width=self.rpi_camera.get_frame_width(),
-                            frame_height=self.rpi_camera.get_frame_height())
+                            frame_height=self.rpi_camera.get_frame_height(),
+                            timestamp_port=self.rpi_camera.port_timestamp)
         if self.dlc_live is not None:
             recorder.set_dlc_joint_names(self.dlc_live.all_joints_names)
 
@@ -203,4 +300,6 @@ class Controller(object):
         self.speed_detector_buffer = None
         self.acceleration_detector_buffer = None
         self.custom_detector_buffer = None
+        self.arena_track_buffers = []
+        self.arena_detector_buffers = []
         self.rpi_camera.stop_record()
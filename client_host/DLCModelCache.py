@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+
+from dlclive import DLCLive, Processor
+
+from client_host.Utils import Log_thread_begin, Log_thread_finish
+
+
+class DLCModelCache:
+    """
+    DLC-Live models loaded once and kept for the whole process.
+
+    Loading a model and its first inference (init_inference) take tens of seconds with TensorFlow. The models
+    are kept by model path and shape of the frames, so every prepare with the same model and camera resolution
+    reuses the same session. warmup loads a model on a separate thread, get waits for a load in progress of
+    the same model instead of loading it twice. A model must not be evicted while a recording uses it.
+    """
+
+    def __init__(self):
+        self.models = {}
+        self.key_locks = {}
+        self.lock = threading.Lock()
+        self.load_num = 0
+        self.reuse_num = 0
+
+    @staticmethod
+    def get_key(model_path, shape):
+        return os.path.abspath(model_path), tuple(shape)
+
+    def get(self, model_path, example_photo):
+        """
+        :return: the DLCLive object of the model, loaded and initialized with example_photo if not cached
+        """
+        key = self.get_key(model_path, example_photo.shape)
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            dlc_live = self.models.get(key)
+            if dlc_live is not None:
+                self.reuse_num += 1
+                return dlc_live
+            t0 = time.time()
+            dlc_live = DLCLive(model_path, processor=Processor())
+            dlc_live.init_inference(example_photo)
+            self.models[key] = dlc_live
+            self.load_num += 1
+            print(f"DLC-Live model {model_path} loaded for frames of {example_photo.shape} "
+                  f"in {time.time() - t0:.1f} s")
+            return dlc_live
+
+    def warmup(self, model_path, example_photo):
+        """
+        Load the model on a separate thread, nothing is done if it is cached already
+        """
+        if self.contains(model_path, example_photo.shape):
+            return None
+        thread = threading.Thread(target=self.warmup_thread, args=(model_path, example_photo.copy()), daemon=True)
+        thread.start()
+        return thread
+
+    def warmup_thread(self, model_path, example_photo):
+        Log_thread_begin("DLC-Live warmup")
+        try:
+            self.get(model_path, example_photo)
+        except Exception as e:
+            # prepare loads the model again and reports the error
+            print(f"DLC-Live warmup of {model_path} failed: {e}")
+        Log_thread_finish("DLC-Live warmup")
+
+    def contains(self, model_path, shape):
+        return self.get_key(model_path, shape) in self.models
+
+    def evict(self, model_path=None, keep_path=None):
+        """
+        Close and remove cached models
+
+        :param model_path: only the models of this path, None: every model
+        :param keep_path: the models of this path are kept
+        """
+        with self.lock:
+            keys = list(self.models.keys())
+        for key in keys:
+            path = key[0]
+            if model_path is not None and path != os.path.abspath(model_path):
+                continue
+            if keep_path is not None and path == os.path.abspath(keep_path):
+                continue
+            with self.key_locks[key]:
+                dlc_live = self.models.pop(key, None)
+            if dlc_live is not None:
+                dlc_live.close()
+                print(f"DLC-Live model {path} for frames of {key[1]} closed")
+
+
+# one cache for the whole process, the models outlive the controllers preparing them
+dlc_model_cache = DLCModelCache()
@@ -1,33 +1,274 @@
+import pickle
+import tempfile
 import threading
+import time
 from collections import deque
 
+import numpy as np
+
+# overflow policies of a reader of a BoundedDataBuffer
+BLOCK = 'block'                 # the producer waits until the reader has consumed the oldest item
+DROP_OLDEST = 'drop_oldest'     # the reader skips the oldest item
+SPILL = 'spill'                 # the oldest item is written to a temporary file and read from there
+
+# wakeup modes of a DataBuffer
+WAKEUP_ALL = 'all'              # every change wakes every waiting thread
+WAKEUP_READER = 'reader'        # a waiting reader is only woken when there is data for it
+
+
+class ContentionCountingLock:
+    """
+    RLock counting how often it was acquired and how often the acquiring thread found it held by another one.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.acquire_count = 0
+        self.contended_count = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._lock.acquire(False):
+            self.acquire_count += 1
+            return True
+        if not blocking or not self._lock.acquire(True, timeout):
+            return False
+        self.acquire_count += 1
+        self.contended_count += 1
+        return True
+
+    def release(self):
+        self._lock.release()
+
+    __enter__ = acquire
+
+    def __exit__(self, *args):
+        self._lock.release()
+
+    # used by threading.Condition to fully release a recursively acquired lock while waiting
+    def _release_save(self):
+        return self._lock._release_save()
+
+    def _acquire_restore(self, state):
+        self._lock._acquire_restore(state)
+
+    def _is_owned(self):
+        return self._lock._is_owned()
+
+
+def get_data_size(data):
+    size = 0
+    for item in data if isinstance(data, (list, tuple)) else (data,):
+        if isinstance(item, np.ndarray):
+            size += item.nbytes
+        elif isinstance(item, (bytes, bytearray, memoryview)):
+            size += len(item)
+    return size
+
 
 class DataBuffer:
-    def __init__(self, name):
+    """
+    Buffer between one producer and several readers.
+
+    Items are numbered from 0 in the order they are added. The held items first_index, ...,
+    data_buffer_index - 1 are stored in a ring, item i at ring[i & ring_mask], so an item is found by its
+    index in constant time. An item is removed once every reader has moved past it; the smallest reader
+    position is maintained incrementally from a count of the readers at each position.
+
+    With WAKEUP_READER every reader waits on its own condition and add_data only wakes the readers waiting
+    for the new item, instead of every thread waiting on the buffer. get_wait_stats reports the waits,
+    wakeups and lock contention of both modes.
+
+    get_stats returns a snapshot of the counters of the buffer: items added, depth, bytes held and their
+    peaks, and per reader the items got, the lag behind the newest item, the time spent waiting and the
+    items skipped by get_last_data.
+    """
+
+    def __init__(self, name, initial_size=64, wakeup=WAKEUP_ALL):
+        """
+        :param initial_size: initial ring size, rounded up to a power of two. The ring grows when full.
+        :param wakeup: WAKEUP_ALL or WAKEUP_READER
+        """
         self.buffer_name = name
         self.reader_num = 0
         self.last_reader_index_list = []
-        self.buffer = deque()
+        ring_size = 1
+        while ring_size < initial_size:
+            ring_size <<= 1
+        self.ring = [None] * ring_size
+        # time.monotonic() when each item was added
+        self.time_ring = [0.0] * ring_size
+        self.ring_mask = ring_size - 1
+        self.first_index = 0
         self.data_buffer_index = 0
-        self.condition = threading.Condition()
+        # items up to a reader position are no longer needed by the reader
+        self.reader_position_list = []
+        self.position_count = {}
+        self.min_position = -1
+        self.lock = ContentionCountingLock()
+        self.condition = threading.Condition(self.lock)
         self.finish_label = False
 
-    def register_reader(self):
+        self.wakeup = wakeup
+        self.reader_condition_list = []
+        # data_buffer_index a waiting reader needs to continue, 0 when the reader is not waiting
+        self.reader_wait_index_list = []
+        self.wait_count = 0
+        self.wakeup_count = 0
+        self.spurious_wakeup_count = 0
+
+        self.bytes_held = 0
+        self.peak_bytes = 0
+        self.peak_depth = 0
+        self.out_count_list = []
+        self.skipped_count_list = []
+        self.wait_time_list = []
+
+    def register_reader(self, policy=None):
+        """
+        :param policy: overflow policy, only used by BoundedDataBuffer
+        :return: reader index
+        """
         with self.condition:
             reader_index = self.reader_num
             self.reader_num += 1
             self.last_reader_index_list.append(-1)
+            self.reader_position_list.append(-1)
+            self.position_count[-1] = self.position_count.get(-1, 0) + 1
+            self.min_position = -1
+            self.reader_condition_list.append(threading.Condition(self.lock))
+            self.reader_wait_index_list.append(0)
+            self.out_count_list.append(0)
+            self.skipped_count_list.append(0)
+            self.wait_time_list.append(0.0)
         return reader_index
 
+    def get_stats(self):
+        """
+        :return: snapshot of the counters of the buffer and of every reader
+        """
+        with self.condition:
+            now = time.monotonic()
+            readers = []
+            for reader_index in range(self.reader_num):
+                next_index = max(self.last_reader_index_list[reader_index] + 1, self.first_index)
+                lag = self.data_buffer_index - next_index
+                readers.append({'items_out': self.out_count_list[reader_index],
+                                'lag_items': lag,
+                                'lag_sec': now - self.time_ring[next_index & self.ring_mask] if lag > 0 else 0.0,
+                                'wait_sec': self.wait_time_list[reader_index],
+                                'skipped_by_get_last_data': self.skipped_count_list[reader_index]})
+            stats = {'name': self.buffer_name, 'items_in': self.data_buffer_index,
+                     'depth': self.data_buffer_index - self.first_index, 'peak_depth': self.peak_depth,
+                     'bytes_held': self.bytes_held, 'peak_bytes': self.peak_bytes,
+                     'finished': self.finish_label, 'readers': readers}
+            stats.update(self.get_wait_stats())
+        return stats
+
+    def get_wait_stats(self):
+        """
+        :return: waits of the readers, wakeups, wakeups without new data, lock acquisitions and the
+        acquisitions that had to wait for another thread
+        """
+        with self.condition:
+            return {'waits': self.wait_count, 'wakeups': self.wakeup_count,
+                    'spurious_wakeups': self.spurious_wakeup_count,
+                    'lock_acquires': self.lock.acquire_count, 'lock_contended': self.lock.contended_count}
+
+    def _wait_for_data(self, reader_index, timeout=None):
+        # called with the lock held, while there is no data for the reader
+        self.wait_count += 1
+        index = self.data_buffer_index
+        start_time = time.monotonic()
+        if self.wakeup == WAKEUP_READER:
+            self.reader_wait_index_list[reader_index] = index + 1
+            self.reader_condition_list[reader_index].wait(timeout)
+            self.reader_wait_index_list[reader_index] = 0
+        else:
+            self.condition.wait(timeout)
+        self.wait_time_list[reader_index] += time.monotonic() - start_time
+        self.wakeup_count += 1
+        if self.data_buffer_index == index and not self.finish_label:
+            self.spurious_wakeup_count += 1
+
+    def _notify_readers(self):
+        if self.wakeup != WAKEUP_READER:
+            self.condition.notify_all()
+            return
+        for reader_index, wait_index in enumerate(self.reader_wait_index_list):
+            if wait_index and (self.data_buffer_index >= wait_index or self.finish_label):
+                self.reader_condition_list[reader_index].notify()
+
+    def _append(self, data, size):
+        if self.data_buffer_index - self.first_index > self.ring_mask:
+            self._grow()
+        index = self.data_buffer_index
+        self.ring[index & self.ring_mask] = data
+        self.time_ring[index & self.ring_mask] = time.monotonic()
+        self.data_buffer_index += 1
+
+        self.bytes_held += size
+        self.peak_bytes = max(self.peak_bytes, self.bytes_held)
+        self.peak_depth = max(self.peak_depth, self.data_buffer_index - self.first_index)
+        return index
+
+    def _grow(self):
+        ring = [None] * (2 * len(self.ring))
+        time_ring = [0.0] * len(ring)
+        mask = len(ring) - 1
+        for i in range(self.first_index, self.data_buffer_index):
+            ring[i & mask] = self.ring[i & self.ring_mask]
+            time_ring[i & mask] = self.time_ring[i & self.ring_mask]
+        self.ring = ring
+        self.time_ring = time_ring
+        self.ring_mask = mask
+
+    def _item(self, index):
+        return self.ring[index & self.ring_mask]
+
+    def _set_reader_position(self, reader_index, position):
+        old_position = self.reader_position_list[reader_index]
+        if position == old_position:
+            return
+        self.reader_position_list[reader_index] = position
+        self.position_count[position] = self.position_count.get(position, 0) + 1
+        count = self.position_count[old_position] - 1
+        if count:
+            self.position_count[old_position] = count
+        else:
+            del self.position_count[old_position]
+
+        if position < self.min_position:
+            self.min_position = position
+        elif old_position == self.min_position and not count:
+            # the last reader left the minimum, move up to the next position held by a reader
+            while self.min_position not in self.position_count:
+                self.min_position += 1
+
+    def _move_reader(self, reader_index, index):
+        self.last_reader_index_list[reader_index] = index
+        self._set_reader_position(reader_index, index)
+
+    def _min_reader_position(self):
+        return self.min_position if self.reader_num else self.data_buffer_index
+
     def add_data(self, data):
         with self.condition:
             if data is None:
                 self.finish_label = True
             else:
-                index = self.data_buffer_index
-                self.data_buffer_index += 1
-                self.buffer.append((index, data))
-            self.condition.notify_all()
+                self._append(data, get_data_size(data))
+            self._notify_readers()
+
+    def _take_next(self, reader_index):
+        # items removed before this reader got them (e.g. a reader registered late) are skipped
+        index = max(self.last_reader_index_list[reader_index] + 1, self.first_index)
+        if index >= self.data_buffer_index:
+            return None
+        data = self._item(index)
+        self._move_reader(reader_index, index)
+        self.out_count_list[reader_index] += 1
+        self._remove_data()
+        return index, data
 
     def get_data(self, reader_index):
         """
@@ -36,45 +277,378 @@ class DataBuffer:
         :return:
         """
         with self.condition:
-            while (not self.buffer) or ((self.buffer[-1][0] is not None) and
-                                        (self.buffer[-1][0] <= self.last_reader_index_list[reader_index])):
+            while True:
+                item = self._take_next(reader_index)
+                if item is not None:
+                    return item
                 if self.finish_label:
                     return None, None
-                self.condition.wait()
-            for index, data in self.buffer:
-                if index == self.last_reader_index_list[reader_index] + 1:
-                    self.last_reader_index_list[reader_index] = index
-                    self._remove_data()
-                    return index, data
-            print(f"{reader_index}: Wrong index: {index}")
-            return -1, None
+                self._wait_for_data(reader_index)
+
+    def _take_batch(self, reader_index, max_items):
+        index = max(self.last_reader_index_list[reader_index] + 1, self.first_index)
+        end = self.data_buffer_index
+        if max_items:
+            end = min(end, index + max_items)
+        if index >= end:
+            return []
+        batch = [(i, self._item(i)) for i in range(index, end)]
+        self._move_reader(reader_index, end - 1)
+        self.out_count_list[reader_index] += end - index
+        self._remove_data()
+        return batch
+
+    def get_batch(self, reader_index, max_items=0, timeout=None):
+        """
+        get every available item after the last one the reader got, in one lock acquisition
+        :param reader_index:
+        :param max_items: max number of items, 0 for no limit
+        :param timeout: max time (sec) to wait for an item, None to wait until one is added
+        :return: list of (index, data), [] on timeout, None when the buffer is finished and the reader got
+        every item
+        """
+        end_time = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                batch = self._take_batch(reader_index, max_items)
+                if batch:
+                    return batch
+                if self.finish_label:
+                    return None
+                remaining = None
+                if end_time is not None:
+                    remaining = end_time - time.monotonic()
+                    if remaining <= 0:
+                        return []
+                self._wait_for_data(reader_index, remaining)
+
+    def iter_batches(self, reader_index, max_items=0):
+        """
+        yield the batches of get_batch until the buffer is finished
+        """
+        while True:
+            batch = self.get_batch(reader_index, max_items)
+            if batch is None:
+                return
+            yield batch
 
     def get_last_data(self, reader_index):
         with self.condition:
-            while (not self.buffer) or ((self.buffer[-1][0] is not None) and
-                                        (self.buffer[-1][0] <= self.last_reader_index_list[reader_index])):
+            while self.first_index == self.data_buffer_index or \
+                    self.data_buffer_index - 1 <= self.last_reader_index_list[reader_index]:
                 if self.finish_label:
                     return None, None
-                self.condition.wait()
-            index, data = self.buffer[-1]
-            self.last_reader_index_list[reader_index] = index
+                self._wait_for_data(reader_index)
+            index = self.data_buffer_index - 1
+            data = self._item(index)
+            self.skipped_count_list[reader_index] += \
+                index - max(self.last_reader_index_list[reader_index] + 1, self.first_index)
+            self._move_reader(reader_index, index)
+            self.out_count_list[reader_index] += 1
             self._remove_data()
         return index, data
 
     def get_data_by_index(self, reader_index, target_index):
         with self.condition:
-            while not self.buffer:
+            while self.first_index == self.data_buffer_index:
                 if self.finish_label:
                     return None, None
-                self.condition.wait()
-            for index, data in self.buffer:
-                if index == target_index:
-                    self.last_reader_index_list[reader_index] = index
-                    self._remove_data()
-                    return index, data
-            else:
+                self._wait_for_data(reader_index)
+            if not self.first_index <= target_index < self.data_buffer_index:
                 return -1, None
+            data = self._item(target_index)
+            self._move_reader(reader_index, target_index)
+            self.out_count_list[reader_index] += 1
+            self._remove_data()
+            return target_index, data
+
+    def _pop_oldest(self):
+        index = self.first_index
+        data = self.ring[index & self.ring_mask]
+        self.ring[index & self.ring_mask] = None
+        self.first_index += 1
+        self.bytes_held -= get_data_size(data)
+        return index, data
+
+    def _remove_data(self):
+        position = self._min_reader_position()
+        while self.first_index <= position and self.first_index < self.data_buffer_index:
+            self._pop_oldest()
+
+
+class BoundedDataBuffer(DataBuffer):
+    """
+    DataBuffer holding at most `capacity` items and `capacity_bytes` bytes.
+
+    When the buffer is full the oldest item is evicted, and every reader that has not consumed it yet is
+    handled by its overflow policy (BLOCK, DROP_OLDEST or SPILL). Overflow events are counted per reader.
+    With store_frames, the frame of [time, frame, ...] items is copied into preallocated slots, so steady
+    state ingest does not allocate frame memory. The slots of the items a reader got in its last two calls are
+    not reused: a reader may keep the frames of its previous call (e.g. the last frame of DetectFreezing) while
+    it works on the new ones. Readers must copy the frames they keep longer. A stalled reader only keeps these
+    slots, the other ones are reused. The pool has a slot per item and two per reader, it only gets more slots
+    when readers of batches hold more items, up to the items of their last two batches.
+    """
+
+    def __init__(self, name, capacity=0, capacity_bytes=0, default_policy=BLOCK, store_frames=False,
+                 wakeup=WAKEUP_ALL):
+        """
+        :param capacity: max number of items, 0 for no limit
+        :param capacity_bytes: max number of ndarray/bytes bytes, 0 for no limit
+        :param default_policy: policy of readers registered without one
+        :param store_frames: copy frames into preallocated slots, the frames returned to a reader are only
+                             valid until the second next call of the reader
+        :param wakeup: WAKEUP_ALL or WAKEUP_READER
+        """
+        super().__init__(name, capacity if capacity else 64, wakeup)
+        self.capacity = capacity
+        self.capacity_bytes = capacity_bytes
+        self.default_policy = default_policy
+        self.store_frames = store_frames
+
+        self.reader_policy_list = []
+        self.overflow_count_list = []
+        self.blocked_count = 0
+
+        self.spill_file_list = []
+        self.spill_list = []
+
+        # (first, last) index of the items a reader got in its last call and in the call before, None for no
+        # slot: their slots are not reused
+        self.reader_call_hold_list = []
+        self.reader_hold_list = []
+        self.free_slot_list = []
+        self.retired_slot_list = deque()
+        self.extra_slot_count = 0
+        self.slot_shape = None
+        self.slot_dtype = None
+
+    def register_reader(self, policy=None):
+        with self.condition:
+            reader_index = super().register_reader()
+            self.reader_policy_list.append(policy if policy is not None else self.default_policy)
+            self.overflow_count_list.append(0)
+            self.spill_file_list.append(None)
+            self.spill_list.append(deque())
+            self.reader_call_hold_list.append(None)
+            self.reader_hold_list.append(None)
+        return reader_index
+
+    def get_overflow_counts(self):
+        with self.condition:
+            return {'readers': list(self.overflow_count_list), 'blocked': self.blocked_count}
+
+    def get_stats(self):
+        with self.condition:
+            stats = super().get_stats()
+            for reader_index, reader_stats in enumerate(stats['readers']):
+                spill = self.spill_list[reader_index]
+                reader_stats['policy'] = self.reader_policy_list[reader_index]
+                reader_stats['overflow'] = self.overflow_count_list[reader_index]
+                reader_stats['spilled_items'] = len(spill)
+                if spill:
+                    reader_stats['lag_items'] += len(spill)
+            stats['blocked'] = self.blocked_count
+            if self.store_frames:
+                stats['extra_slots'] = self.extra_slot_count
+        return stats
+
+    def _is_full(self, size):
+        held = self.data_buffer_index - self.first_index
+        if not held:
+            return False
+        return (self.capacity and held >= self.capacity) or \
+               (self.capacity_bytes and self.bytes_held + size > self.capacity_bytes)
+
+    def _store_frame(self, data):
+        if not (isinstance(data, list) and len(data) > 1 and isinstance(data[1], np.ndarray)):
+            return None
+        frame = data[1]
+        if self.slot_shape is None:
+            self.slot_shape, self.slot_dtype = frame.shape, frame.dtype
+            # one slot per item plus the items of the previous call held by every reader
+            self.free_slot_list = [np.empty(self.slot_shape, self.slot_dtype)
+                                   for _ in range(self.capacity + 2 * self.reader_num + 1)]
+        if frame.shape != self.slot_shape or frame.dtype != self.slot_dtype:
+            return None
+        self._recycle_slots()
+        if self.free_slot_list:
+            slot = self.free_slot_list.pop()
+        else:
+            # every retired slot is held, by readers of batches
+            slot = np.empty(self.slot_shape, self.slot_dtype)
+            self.extra_slot_count += 1
+        np.copyto(slot, frame)
+        data[1] = slot
+        return slot
+
+    def _hold(self, reader_index, first=None, last=None):
+        # first, last: items returned by this call, None when no slot was returned
+        self.reader_hold_list[reader_index] = self.reader_call_hold_list[reader_index]
+        self.reader_call_hold_list[reader_index] = None if first is None else \
+            (first, first if last is None else last)
+
+    def _is_held(self, index):
+        for hold in self.reader_call_hold_list + self.reader_hold_list:
+            if hold is not None and hold[0] <= index <= hold[1]:
+                return True
+        return False
+
+    def _recycle_slots(self):
+        # a reader may still use the items it got in its last two calls, the other slots are free, even
+        # behind the items held by a stalled reader
+        kept = deque()
+        for index, slot in self.retired_slot_list:
+            if self._is_held(index):
+                kept.append((index, slot))
+            else:
+                self.free_slot_list.append(slot)
+        self.retired_slot_list = kept
+
+    def _move_reader(self, reader_index, index):
+        # spilled items are held on disk, the reader no longer needs them in memory
+        self.last_reader_index_list[reader_index] = index
+        spill = self.spill_list[reader_index]
+        self._set_reader_position(reader_index, max(index, spill[-1][0]) if spill else index)
+
+    def _pop_oldest(self):
+        index, data = super()._pop_oldest()
+        if self.store_frames and self.slot_shape is not None and isinstance(data, list) and len(data) > 1 and \
+                isinstance(data[1], np.ndarray) and data[1].shape == self.slot_shape:
+            self.retired_slot_list.append((index, data[1]))
+        return index, data
+
+    def _evict_oldest(self):
+        index = self.first_index
+        if self.min_position < index:
+            behind = [r for r in range(self.reader_num) if self.reader_position_list[r] < index]
+            if any(self.reader_policy_list[r] == BLOCK for r in behind):
+                return False
+            data = self._item(index)
+            for r in behind:
+                self.overflow_count_list[r] += 1
+                if self.reader_policy_list[r] == SPILL:
+                    self._spill(r, index, data)
+                    self._set_reader_position(r, index)
+                else:
+                    # DROP_OLDEST
+                    self._move_reader(r, index)
+        self._pop_oldest()
+        return True
+
+    def _spill(self, reader_index, index, data):
+        f = self.spill_file_list[reader_index]
+        if f is None:
+            f = tempfile.TemporaryFile()
+            self.spill_file_list[reader_index] = f
+        payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        f.seek(0, 2)
+        offset = f.tell()
+        f.write(payload)
+        self.spill_list[reader_index].append((index, offset, len(payload)))
+
+    def _read_spill(self, reader_index, position):
+        index, offset, length = self.spill_list[reader_index][position]
+        f = self.spill_file_list[reader_index]
+        f.seek(offset)
+        return index, pickle.loads(f.read(length))
+
+    def _clear_spill(self, reader_index):
+        self.spill_list[reader_index].clear()
+        if self.spill_file_list[reader_index] is not None:
+            self.spill_file_list[reader_index].close()
+            self.spill_file_list[reader_index] = None
+
+    def add_data(self, data):
+        with self.condition:
+            if data is None:
+                self.finish_label = True
+                self._notify_readers()
+                return
+            if self.store_frames:
+                self._store_frame(data)
+            size = get_data_size(data)
+            blocked = False
+            while self._is_full(size):
+                if not self._evict_oldest():
+                    # a BLOCK reader has not consumed the oldest item yet
+                    if not blocked:
+                        self.blocked_count += 1
+                        blocked = True
+                    self.condition.wait()
+            self._append(data, size)
+            self._notify_readers()
+
+    def _take_next(self, reader_index):
+        spill = self.spill_list[reader_index]
+        if spill and spill[0][0] == self.last_reader_index_list[reader_index] + 1:
+            index, data = self._read_spill(reader_index, 0)
+            spill.popleft()
+            self._move_reader(reader_index, index)
+            self.out_count_list[reader_index] += 1
+            # spilled items are unpickled copies, not slots
+            self._hold(reader_index)
+            return index, data
+        item = super()._take_next(reader_index)
+        if item is not None:
+            self._hold(reader_index, item[0])
+        return item
+
+    def _take_batch(self, reader_index, max_items):
+        batch = []
+        items = []
+        call_hold = self.reader_call_hold_list[reader_index]
+        spill = self.spill_list[reader_index]
+        while spill and spill[0][0] == self.last_reader_index_list[reader_index] + 1 and \
+                (not max_items or len(batch) < max_items):
+            batch.append(self._take_next(reader_index))
+        if not max_items or len(batch) < max_items:
+            items = super()._take_batch(reader_index, max_items - len(batch) if max_items else 0)
+            batch.extend(items)
+        if batch:
+            # one call for the whole batch, the spilled items read above are copies, not slots
+            self.reader_call_hold_list[reader_index] = call_hold
+            if items:
+                self._hold(reader_index, items[0][0], items[-1][0])
+            else:
+                self._hold(reader_index)
+        return batch
+
+    def get_last_data(self, reader_index):
+        with self.condition:
+            index, data = super().get_last_data(reader_index)
+            if index is not None:
+                self._hold(reader_index, index)
+                if self.spill_list[reader_index]:
+                    self.skipped_count_list[reader_index] += len(self.spill_list[reader_index])
+                    self._clear_spill(reader_index)
+        return index, data
+
+    def get_data_by_index(self, reader_index, target_index):
+        with self.condition:
+            spill = self.spill_list[reader_index]
+            if spill and spill[0][0] <= target_index <= spill[-1][0]:
+                index, data = self._read_spill(reader_index, target_index - spill[0][0])
+                self._move_reader(reader_index, index)
+                self.out_count_list[reader_index] += 1
+                self._hold(reader_index)
+                return index, data
+            index, data = super().get_data_by_index(reader_index, target_index)
+            if data is not None:
+                self._hold(reader_index, index)
+            return index, data
 
     def _remove_data(self):
-        while self.buffer and self.buffer[0][0] <= min(self.last_reader_index_list):
-            self.buffer.popleft()
+        super()._remove_data()
+        # wake a producer waiting for space, with WAKEUP_READER the readers do not wait on this condition
+        self.condition.notify_all()
+
+
+def create_frame_buffer(name, capacity=0, capacity_bytes=0, wakeup=WAKEUP_ALL):
+    """
+    Buffer of the decoded frames of a camera: a BoundedDataBuffer storing its frames when a capacity is set,
+    otherwise an unlimited DataBuffer
+    """
+    if capacity > 0 or capacity_bytes > 0:
+        return BoundedDataBuffer(name, capacity, capacity_bytes, store_frames=True, wakeup=wakeup)
+    return DataBuffer(name, wakeup=wakeup)
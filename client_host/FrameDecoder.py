@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+
+def decode_jpeg(frame_data, flags=cv2.IMREAD_COLOR):
+    t0 = time.perf_counter()
+    frame = cv2.imdecode(np.frombuffer(frame_data, dtype=np.uint8), flags)
+    return frame, time.perf_counter() - t0
+
+
+class FrameDecoder:
+    """
+    Decode JPEG frames on a thread pool and publish them into the frame buffer in arrival order.
+
+    cv2.imdecode releases the GIL, so several frames are decoded concurrently while the socket thread keeps
+    receiving. A publisher thread waits on the decode results in submission order, which keeps the frame
+    buffer index identical to the order the frames were received in.
+    """
+
+    def __init__(self, frame_buffer, workers=2, max_in_flight=8, keep_jpeg=False, flags=cv2.IMREAD_COLOR):
+        """
+        :param frame_buffer: DataBuffer the decoded [time, frame] items are added to
+        :param workers: number of decode threads, 0 decodes on the calling thread
+        :param max_in_flight: max number of submitted frames not yet published, submit blocks when reached
+        :param keep_jpeg: publish [time, frame, jpeg bytes] for consumers of the original payload
+        :param flags: cv2.IMREAD_COLOR, or cv2.IMREAD_GRAYSCALE which only decodes the luma plane
+        """
+        self.frame_buffer = frame_buffer
+        self.keep_jpeg = keep_jpeg
+        self.flags = flags
+        self.workers = workers
+        self.max_in_flight = max(max_in_flight, 1)
+        self.executor = None
+        self.pending = None
+        self.publisher = None
+        self.finished = False
+        # frames whose decoding raised or gave no image, they are not published
+        self.failed_num = 0
+
+        # per frame: time spent in imdecode, time from submit to publish (sec)
+        self.decode_time_list = []
+        self.latency_list = []
+
+    def start(self):
+        if self.workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            self.pending = queue.Queue(maxsize=self.max_in_flight)
+            self.publisher = threading.Thread(target=self.publish_thread)
+            self.publisher.start()
+
+    def submit(self, timestamp, frame_data):
+        """
+        :param timestamp: frame time (sec)
+        :param frame_data: JPEG bytes, may be a view into a receive buffer that is reused afterwards
+        """
+        submit_time = time.perf_counter()
+        jpeg = None
+        if self.keep_jpeg or self.executor is not None:
+            frame_data = jpeg = bytes(frame_data)
+        if self.executor is None:
+            try:
+                frame, decode_time = decode_jpeg(frame_data, self.flags)
+            except Exception as e:
+                self.decode_failed(timestamp, e)
+                return
+            if frame is None:
+                self.decode_failed(timestamp, "corrupt or truncated JPEG")
+                return
+            self.publish(timestamp, frame, jpeg, submit_time, decode_time)
+        else:
+            future = self.executor.submit(decode_jpeg, frame_data, self.flags)
+            self.pending.put((timestamp, jpeg, submit_time, future))
+
+    def publish(self, timestamp, frame, jpeg, submit_time, decode_time):
+        if self.keep_jpeg:
+            self.frame_buffer.add_data([timestamp, frame, jpeg])
+        else:
+            self.frame_buffer.add_data([timestamp, frame])
+        self.decode_time_list.append(decode_time)
+        self.latency_list.append(time.perf_counter() - submit_time)
+
+    def publish_thread(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            timestamp, jpeg, submit_time, future = item
+            try:
+                frame, decode_time = future.result()
+            except Exception as e:
+                # the thread keeps draining pending, or submit would block the receiving thread
+                self.decode_failed(timestamp, e)
+                continue
+            if frame is None:
+                # imdecode returns None on corrupt or truncated data, consumers dereference the frame
+                self.decode_failed(timestamp, "corrupt or truncated JPEG")
+                continue
+            self.publish(timestamp, frame, jpeg, submit_time, decode_time)
+
+    def decode_failed(self, timestamp, error):
+        self.failed_num += 1
+        print(f"Frame at {timestamp:.3f} s not decoded, skipped: {error}")
+
+    def finish(self):
+        """
+        Publish every frame still in flight, then mark the frame buffer as finished
+        """
+        if self.finished:
+            return
+        self.finished = True
+        if self.executor is not None:
+            self.pending.put(None)
+            self.publisher.join()
+            self.executor.shutdown()
+            self.executor = None
+        self.frame_buffer.add_data(None)
+        if self.failed_num:
+            print(f"{self.failed_num} frames not decoded")
+        self.print_latency()
+
+    def get_latency_summary(self):
+        if not self.latency_list:
+            return {}
+        decode_time = np.array(self.decode_time_list) * 1000
+        latency = np.array(self.latency_list) * 1000
+        return {
+            'frame_num': len(latency),
+            'workers': self.workers,
+            'decode_mean_ms': float(decode_time.mean()),
+            'decode_p95_ms': float(np.percentile(decode_time, 95)),
+            'latency_mean_ms': float(latency.mean()),
+            'latency_p95_ms': float(np.percentile(latency, 95)),
+            'latency_max_ms': float(latency.max()),
+        }
+
+    def print_latency(self):
+        summary = self.get_latency_summary()
+        if summary:
+            print(f"Decode latency ({summary['frame_num']} frames, {summary['workers']} workers): "
+                  f"decode mean {summary['decode_mean_ms']:.2f} ms, p95 {summary['decode_p95_ms']:.2f} ms; "
+                  f"submit to publish mean {summary['latency_mean_ms']:.2f} ms, "
+                  f"p95 {summary['latency_p95_ms']:.2f} ms, max {summary['latency_max_ms']:.2f} ms")
@@ -0,0 +1,167 @@
+import struct
+
+SOI_MARKER = b'\xff\xd8'
+EOI_MARKER = b'\xff\xd9'
+
+STREAM_RAW = 'raw'
+STREAM_FRAMED = 'framed'
+
+# framed video protocol, same layout as rpi_server/rpicamera/streams.py
+# header: magic, version, flags, sequence number, pts (usec, -1 if unknown), payload length
+FRAME_MAGIC = b'RB'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<2sBBIqI')
+
+
+class StreamBuffer:
+    """
+    Preallocated receive buffer shared by the frame splitters.
+
+    Incoming data is received straight into a bytearray and frames are handed on as memoryview slices of it.
+    A yielded frame is only valid until the next call of recv_into/feed, consumers that keep it longer must
+    copy it.
+    """
+
+    def __init__(self, capacity=1 << 20, chunk_size=1 << 16):
+        """
+        :param capacity: initial buffer size in bytes, grows when a single frame does not fit
+        :param chunk_size: max number of bytes requested from the socket per recv_into
+        """
+        self.chunk_size = chunk_size
+        self.buffer = bytearray(max(capacity, 2 * chunk_size))
+        self.view = memoryview(self.buffer)
+        self.read_pos = 0
+        self.write_pos = 0
+        self.frame_num = 0
+
+    def _reserve(self, size):
+        if len(self.buffer) - self.write_pos >= size:
+            return
+        pending = self.write_pos - self.read_pos
+        if pending + size > len(self.buffer):
+            # the frame being assembled is larger than the buffer, move it into a bigger one
+            capacity = len(self.buffer)
+            while pending + size > capacity:
+                capacity *= 2
+            buffer = bytearray(capacity)
+            buffer[:pending] = self.view[self.read_pos:self.write_pos]
+            self.buffer = buffer
+            self.view = memoryview(buffer)
+        else:
+            # only the unfinished tail is moved, so compaction is amortized O(1) per byte
+            self.view[:pending] = self.view[self.read_pos:self.write_pos]
+        self._shift(self.read_pos)
+        self.write_pos = pending
+        self.read_pos = 0
+
+    def _shift(self, offset):
+        pass
+
+    def recv_into(self, conn):
+        """
+        Receive the next chunk from the socket directly into the buffer
+        :param conn: connected socket
+        :return: number of received bytes, 0 when the peer closed the connection
+        """
+        self._reserve(self.chunk_size)
+        n = conn.recv_into(self.view[self.write_pos:self.write_pos + self.chunk_size])
+        self.write_pos += n
+        return n
+
+    def feed(self, data):
+        """
+        Copy already received bytes into the buffer
+        :param data: bytes-like object
+        """
+        self._reserve(len(data))
+        self.view[self.write_pos:self.write_pos + len(data)] = data
+        self.write_pos += len(data)
+
+    def frames(self):
+        """
+        Yield (sequence number, pts in usec or None, memoryview) for every complete frame in the buffer
+        """
+        return iter(())
+
+    def pending_bytes(self):
+        return self.write_pos - self.read_pos
+
+    def reset(self):
+        self.read_pos = 0
+        self.write_pos = 0
+        self.frame_num = 0
+
+
+class JpegFrameSplitter(StreamBuffer):
+    """
+    Split a raw MJPEG byte stream at the JPEG start/end markers.
+
+    Marker scanning resumes where the previous scan stopped, so every byte is scanned once.
+    """
+
+    def __init__(self, capacity=1 << 20, chunk_size=1 << 16):
+        super().__init__(capacity, chunk_size)
+        self.scan_pos = 0
+        self.frame_start = -1
+
+    def _shift(self, offset):
+        self.scan_pos -= offset
+        if self.frame_start != -1:
+            self.frame_start -= offset
+
+    def frames(self):
+        while True:
+            if self.frame_start == -1:
+                start = self.buffer.find(SOI_MARKER, self.scan_pos, self.write_pos)
+                if start == -1:
+                    # drop everything before the start marker, keep the last byte in case a marker is split
+                    self.read_pos = max(self.read_pos, self.write_pos - 1)
+                    self.scan_pos = self.read_pos
+                    return
+                self.frame_start = start
+                self.read_pos = start
+                self.scan_pos = start + 2
+
+            end = self.buffer.find(EOI_MARKER, self.scan_pos, self.write_pos)
+            if end == -1:
+                self.scan_pos = max(self.frame_start + 2, self.write_pos - 1)
+                return
+
+            frame = self.view[self.frame_start:end + 2]
+            self.read_pos = end + 2
+            self.scan_pos = end + 2
+            self.frame_start = -1
+            sequence = self.frame_num
+            self.frame_num += 1
+            yield sequence, None, frame
+
+    def reset(self):
+        super().reset()
+        self.scan_pos = 0
+        self.frame_start = -1
+
+
+class FramedFrameSplitter(StreamBuffer):
+    """
+    Split a framed video stream (FRAME_HEADER + payload per frame) without scanning the payload.
+    """
+
+    def frames(self):
+        header_size = FRAME_HEADER.size
+        while self.write_pos - self.read_pos >= header_size:
+            magic, version, flags, sequence, pts, length = FRAME_HEADER.unpack_from(self.buffer, self.read_pos)
+            if magic != FRAME_MAGIC or version != FRAME_VERSION:
+                raise ValueError(f"Invalid frame header: magic {magic}, version {version}")
+            frame_end = self.read_pos + header_size + length
+            if frame_end > self.write_pos:
+                return
+            frame = self.view[self.read_pos + header_size:frame_end]
+            self.read_pos = frame_end
+            self.frame_num += 1
+            yield sequence, (pts if pts >= 0 else None), frame
+
+
+def create_frame_splitter(stream_format, capacity=1 << 20, chunk_size=1 << 16):
+    if stream_format == STREAM_FRAMED:
+        return FramedFrameSplitter(capacity, chunk_size)
+    return JpegFrameSplitter(capacity, chunk_size)
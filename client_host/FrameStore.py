@@ -0,0 +1,164 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+FRAME_STORE_VERSION = 1
+INDEX_DTYPE = np.dtype([('file', '<u4'), ('offset', '<u8'), ('size', '<u4'), ('time', '<f8')])
+
+META_FILE_NAME = 'meta.json'
+INDEX_FILE_NAME = 'index.npy'
+# raw index appended while recording, converted to INDEX_FILE_NAME on release
+INDEX_LOG_FILE_NAME = 'index.bin'
+
+
+def data_file_name(file_num):
+    return f"data_{file_num:05d}.bin"
+
+
+class FrameStoreWriter:
+    """
+    Indexed per-frame JPEG archive.
+
+    JPEG payloads are appended to data files of at most chunk_size bytes, and every frame gets an entry
+    (data file, offset, size, timestamp) in a memory-mappable index array. Has the write/release interface
+    of the other video writers.
+    """
+
+    def __init__(self, path, fps, frame_size, chunk_size=1 << 30):
+        """
+        :param path: archive directory, created if needed
+        :param fps: nominal frame rate, stored in meta.json
+        :param frame_size: (width, height)
+        :param chunk_size: max size of a data file in bytes
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(path, META_FILE_NAME), 'w') as f:
+            json.dump({'version': FRAME_STORE_VERSION, 'fps': fps, 'width': frame_size[0],
+                       'height': frame_size[1]}, f, indent=4)
+
+        self.file_num = 0
+        self.data_file = open(os.path.join(path, data_file_name(self.file_num)), 'wb')
+        self.index_file = open(os.path.join(path, INDEX_LOG_FILE_NAME), 'wb')
+        self.entry = np.zeros(1, dtype=INDEX_DTYPE)
+        self.frame_num = 0
+
+    def isOpened(self):
+        return self.data_file is not None
+
+    def write(self, jpeg, timestamp=np.nan):
+        """
+        :param jpeg: JPEG bytes of one frame
+        :param timestamp: frame time (sec)
+        """
+        size = len(jpeg)
+        offset = self.data_file.tell()
+        if offset > 0 and offset + size > self.chunk_size:
+            self.data_file.close()
+            self.file_num += 1
+            self.data_file = open(os.path.join(self.path, data_file_name(self.file_num)), 'wb')
+            offset = 0
+        self.data_file.write(jpeg)
+
+        self.entry[0] = (self.file_num, offset, size, timestamp)
+        self.index_file.write(self.entry.tobytes())
+        self.frame_num += 1
+
+    def release(self):
+        if self.data_file is None:
+            return
+        self.data_file.close()
+        self.index_file.close()
+        self.data_file = None
+
+        index_log = os.path.join(self.path, INDEX_LOG_FILE_NAME)
+        np.save(os.path.join(self.path, INDEX_FILE_NAME), np.fromfile(index_log, dtype=INDEX_DTYPE))
+        os.remove(index_log)
+
+
+class FrameStoreReader:
+    """
+    Random access to the frames of a FrameStoreWriter archive.
+
+    Index and data files are memory mapped, so get_frame costs one lookup and one JPEG decode regardless of
+    the position in the recording. The reader can be pickled and passed to worker processes, the mappings
+    are reopened there.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE_NAME), 'r') as f:
+            self.meta = json.load(f)
+        self.index = None
+        self.data_files = {}
+        self._open_index()
+
+    def _open_index(self):
+        index_file = os.path.join(self.path, INDEX_FILE_NAME)
+        if os.path.exists(index_file):
+            self.index = np.load(index_file, mmap_mode='r')
+        else:
+            # recording was not released, use the index appended while recording
+            self.index = np.fromfile(os.path.join(self.path, INDEX_LOG_FILE_NAME), dtype=INDEX_DTYPE)
+
+    def __getstate__(self):
+        return {'path': self.path, 'meta': self.meta}
+
+    def __setstate__(self, state):
+        self.path = state['path']
+        self.meta = state['meta']
+        self.data_files = {}
+        self._open_index()
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def timestamps(self):
+        return self.index['time']
+
+    @property
+    def fps(self):
+        return self.meta['fps']
+
+    def _data_file(self, file_num):
+        data = self.data_files.get(file_num)
+        if data is None:
+            data = np.memmap(os.path.join(self.path, data_file_name(file_num)), dtype=np.uint8, mode='r')
+            self.data_files[file_num] = data
+        return data
+
+    def get_jpeg(self, i):
+        """
+        :return: JPEG bytes of frame i as a view into the memory mapped data file
+        """
+        file_num, offset, size, _ = self.index[i]
+        return self._data_file(int(file_num))[int(offset):int(offset) + int(size)]
+
+    def get_frame(self, i, flags=cv2.IMREAD_COLOR):
+        return cv2.imdecode(self.get_jpeg(i), flags)
+
+    def get_range(self, a, b, flags=cv2.IMREAD_COLOR):
+        """
+        :return: decoded frames a, ..., b - 1
+        """
+        return [self.get_frame(i, flags) for i in range(max(a, 0), min(b, len(self)))]
+
+    def get_batch(self, indices, workers=4, flags=cv2.IMREAD_COLOR):
+        """
+        Decode the given frames on a thread pool (cv2.imdecode releases the GIL)
+        :return: list of frames in the order of indices
+        """
+        if workers <= 1:
+            return [self.get_frame(i, flags) for i in indices]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda i: self.get_frame(i, flags), indices))
+
+    def close(self):
+        self.data_files = {}
+        self.index = None
@@ -0,0 +1,98 @@
+import threading
+
+import numpy as np
+
+from client_host.Utils import Log_thread_begin, Log_thread_finish
+
+
+class FrameSynchronizer:
+    """
+    Groups the frames of several cameras by capture time into frame sets.
+
+    The frame times of every camera are moved to the host clock with the time origin of the camera. The
+    synchronizer keeps the oldest frame not used yet of every camera, and drops those older than the newest
+    of them by more than tolerance: their camera has no frame close enough in time. When every camera has a
+    frame within tolerance, they are published together as [t, [frame of camera 1, frame of camera 2, ...]],
+    t being the time of the frame of the first camera. Frames are read one by one, none is skipped by the
+    reading itself.
+    """
+
+    def __init__(self, frame_buffers, output_buffer, tolerance, time_origins=None):
+        """
+        :param frame_buffers: one frame buffer per camera, with [time, frame, ...] items
+        :param output_buffer: buffer of the frame sets
+        :param tolerance: max difference of capture time between the frames of a set (sec)
+        :param time_origins: one function per camera giving the host time of the time 0 of its frames, called
+                             when its first frame is read, default: the frame times share their time 0
+        """
+        self.frame_buffers = frame_buffers
+        self.output_buffer = output_buffer
+        self.tolerance = tolerance
+        self.time_origins = time_origins
+        self.reader_index_list = [buffer.register_reader() for buffer in frame_buffers]
+        # slots of a BoundedDataBuffer storing its frames are reused once the next frame is read
+        self.copy_list = [getattr(buffer, 'store_frames', False) for buffer in frame_buffers]
+        self.thread = None
+
+        self.set_num = 0
+        self.dropped_num_list = [0] * len(frame_buffers)
+        self.max_spread = 0.0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.sync_thread)
+        self.thread.start()
+
+    def join(self):
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def sync_thread(self):
+        Log_thread_begin("Frame synchronizer")
+        camera_num = len(self.frame_buffers)
+        origin_list = [None] * camera_num
+        head_list = [None] * camera_num
+        head_time = np.zeros(camera_num)
+        finished = False
+        while not finished:
+            for k in range(camera_num):
+                if head_list[k] is not None:
+                    continue
+                index, data = self.frame_buffers[k].get_data(self.reader_index_list[k])
+                if index is None:
+                    finished = True
+                    break
+                if origin_list[k] is None:
+                    origin_list[k] = self.time_origins[k]() if self.time_origins is not None else 0.0
+                if self.copy_list[k]:
+                    data = [data[0], data[1].copy()] + data[2:]
+                head_list[k] = data
+                head_time[k] = origin_list[k] + data[0]
+            if finished:
+                break
+
+            newest = head_time.max()
+            late = head_time < newest - self.tolerance
+            if late.any():
+                for k in np.flatnonzero(late):
+                    head_list[k] = None
+                    self.dropped_num_list[k] += 1
+                continue
+
+            self.max_spread = max(self.max_spread, newest - head_time.min())
+            self.output_buffer.add_data([head_list[0][0], head_list])
+            self.set_num += 1
+            head_list = [None] * camera_num
+        self.output_buffer.add_data(None)
+        # a stream ended, the frames left of the other cameras have no set, the readers must still get them
+        # or the cameras would wait on a limited frame buffer
+        for k in range(camera_num):
+            while self.frame_buffers[k].get_data(self.reader_index_list[k])[0] is not None:
+                self.dropped_num_list[k] += 1
+        print(f"frame sets: {self.set_num}, dropped frames per camera: {self.dropped_num_list}, "
+              f"max spread: {self.max_spread * 1000:.1f} ms")
+        Log_thread_finish("Frame synchronizer")
+
+    def get_stats(self):
+        return {'frame_sets': self.set_num, 'dropped_frames': list(self.dropped_num_list),
+                'max_spread_sec': self.max_spread}
@@ -57,12 +57,34 @@ class ConfigManager:
         if self.settings_config is None:
             self.settings_config = {}
             config_keys = ['Camera', 'Region of interest', 'Tracking', 'Detection', 'Position', 'Close Loop',
-                           'Selected area analysis']
+                           'Selected area analysis', 'Arenas']
             for key in config_keys:
                 self.settings_config[key] = {}
             self.settings_config['Camera']['framerate'] = '15'
             self.settings_config['Camera']['image_size'] = '640*640'
+            self.settings_config['Camera']['decode_workers'] = '2'
+            self.settings_config['Camera']['decode_max_in_flight'] = '8'
+            self.settings_config['Camera']['stream_format'] = 'raw'
+            self.settings_config['Camera']['flow_control'] = 'tcp'
+            self.settings_config['Camera']['receive_buffer_size'] = '4194304'
+            self.settings_config['Camera']['record_format'] = 'mp4'
+            self.settings_config['Camera']['frame_buffer_capacity'] = '0'
+            self.settings_config['Camera']['frame_buffer_capacity_mb'] = '0'
+            self.settings_config['Camera']['recorder_overflow_policy'] = 'block'
+            self.settings_config['Camera']['buffer_wakeup'] = 'reader'
+            self.settings_config['Camera']['buffer_metrics_interval'] = '1'
+            self.settings_config['Camera']['color_mode'] = 'color'
             self.settings_config['Tracking']['method'] = 'BG_subtraction'
+            self.settings_config['Tracking']['backend'] = 'contours'
+            self.settings_config['Tracking']['search_window'] = '0'
+            self.settings_config['Tracking']['full_search_interval'] = '30'
+            self.settings_config['Tracking']['pyramid_factor'] = '1'
+            self.settings_config['Tracking']['background_update_interval'] = '0'
+            self.settings_config['Tracking']['background_update_rate'] = '0.05'
+            self.settings_config['Tracking']['dlc_batch_size'] = '1'
+            self.settings_config['Tracking']['dlc_batch_timeout_ms'] = '10'
+            self.settings_config['Tracking']['dlc_batch_policy'] = 'realtime'
+            self.settings_config['Tracking']['dlc_crop_size'] = '0'
             self.settings_config['Detection']['freezing_threshold'] = '0.007'
             self.settings_config['Detection']['freezing_duration'] = '0.5s'
             self.settings_config['Detection']['speed_threshold'] = '0.007'
@@ -92,6 +114,40 @@ class ConfigManager:
         framerate = self.settings_config['Camera']['framerate']
         return int(resolution_width), int(resolution_height), int(framerate)
 
+    def get_decode_parameters(self):
+        config = self.settings_config['Camera']
+        return int(config.get('decode_workers', 2)), int(config.get('decode_max_in_flight', 8))
+
+    def get_stream_format(self):
+        # 'raw': MJPEG byte stream, 'framed': length-prefixed frames carrying the RPi timestamps
+        return self.settings_config['Camera'].get('stream_format', 'raw')
+
+    def get_flow_control_parameters(self):
+        config = self.settings_config['Camera']
+        return config.get('flow_control', 'tcp'), int(config.get('receive_buffer_size', 4 << 20))
+
+    def get_record_format(self):
+        return self.settings_config['Camera'].get('record_format', 'mp4')
+
+    def get_frame_buffer_parameters(self):
+        # capacity in frames, capacity in bytes (0: no limit), overflow policy of the recorder
+        config = self.settings_config['Camera']
+        return int(config.get('frame_buffer_capacity', 0)), \
+            int(float(config.get('frame_buffer_capacity_mb', 0)) * (1 << 20)), \
+            config.get('recorder_overflow_policy', 'block')
+
+    def get_buffer_wakeup(self):
+        # 'reader': only wake the readers with new data, 'all': wake every waiting thread
+        return self.settings_config['Camera'].get('buffer_wakeup', 'reader')
+
+    def get_color_mode(self):
+        # 'color': BGR frames, 'gray': frames decoded to grayscale, for IR or monochrome arenas
+        return self.settings_config['Camera'].get('color_mode', 'color')
+
+    def get_buffer_metrics_interval(self):
+        # seconds between two snapshots of the buffer counters, 0: only at the end of the trial
+        return float(self.settings_config['Camera'].get('buffer_metrics_interval', 1))
+
     def init_realtime_detection_config(self):
         if self.realtime_detection_config is None:
             self.realtime_detection_config = {}
@@ -116,6 +172,36 @@ class ConfigManager:
             self.record_config = {}
             self.record_config = {'Dir': '', 'Trial': '', 'Time': ''}
 
+    def get_tracking_backend(self):
+        # background subtraction: 'contours': findContours + moments, 'components': connectedComponentsWithStats
+        return self.settings_config['Tracking'].get('backend', 'contours')
+
+    def get_search_window_parameters(self):
+        # min size of the window searched around the predicted center (0: whole frame), frames between two
+        # searches of the whole frame
+        config = self.settings_config['Tracking']
+        return int(config.get('search_window', 0)), int(config.get('full_search_interval', 30))
+
+    def get_pyramid_factor(self):
+        # downscale factor of the coarse search of the whole frame, 1: full resolution only
+        return int(self.settings_config['Tracking'].get('pyramid_factor', 1))
+
+    def get_background_update_parameters(self):
+        # seconds between two frames averaged into the background (0: static background), weight of a frame
+        config = self.settings_config['Tracking']
+        return float(config.get('background_update_interval', 0)), float(config.get('background_update_rate', 0.05))
+
+    def get_dlc_batch_parameters(self):
+        # max frames of one DLC-Live forward pass (1: the newest frame only), max wait for a batch to fill (sec),
+        # 'realtime': newest frames, older ones skipped, 'offline': every frame in order
+        config = self.settings_config['Tracking']
+        return int(config.get('dlc_batch_size', 1)), float(config.get('dlc_batch_timeout_ms', 10)) / 1000, \
+            config.get('dlc_batch_policy', 'realtime')
+
+    def get_dlc_crop_size(self):
+        # side (pixels) of the part of the frame around the animal given to DLC-Live, 0: the whole frame
+        return int(self.settings_config['Tracking'].get('dlc_crop_size', 0))
+
     def get_background_image(self):
         return self.image
 
@@ -153,6 +239,14 @@ class ConfigManager:
         config = self.settings_config['Selected area analysis']
         return config['area_types'], config['area_points']
 
+    def get_arenas(self):
+        # list of (area_type, area_points) of the multi-arena tracking, empty to track one animal in the ROI
+        config = self.settings_config.get('Arenas', {})
+        if 'area_types' not in config:
+            return []
+        return [(area_type, np.array(points)) for area_type, points in zip(config['area_types'],
+                                                                           config['area_points'])]
+
     def get_region_of_interest_area(self):
         config = self.settings_config['Region of interest']
         return config['area_type'], np.array(config['area_points'])
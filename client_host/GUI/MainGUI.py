@@ -51,6 +51,7 @@ class MainGUI:
         file_path = filedialog.askopenfilename(filetypes=[("JSON files", "*.json")])
         if file_path:
             self.config_manager.load_config(file_path)
+            self.controller.warmup_dlc_model()
 
             self.rpi_camera_gui.set_config()
             self.realtime_detection_gui.set_config()
@@ -77,6 +78,7 @@ class MainGUI:
         self.config_manager.save_config()
         if self.rpi_camera_gui.connect_state:
             self.rpi_camera_gui.func_connect_button()
+        self.controller.close_dlc_models()
         self.root.destroy()
 
     def disable_for_prepare(self):
@@ -196,6 +198,7 @@ class RpiCameraGUI:
         try:
             photo = self.main_gui.controller.camera_capture()
             self.main_gui.config_manager.set_image(photo)
+            self.main_gui.controller.warmup_dlc_model()
         except Exception as e:
             messagebox.showerror("Capture Failed", str(e))
 
@@ -231,31 +234,30 @@ class MenuGUI:
 
         settingmenu = tk.Menu(menubar, tearoff=False)
         settingmenu.add_command(label="Edit Camera Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager, 'Camera'))
+                                command=lambda: self.edit_setting('Camera'))
         settingmenu.add_command(label="Edit Region of interest Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Region of interest'))
+                                command=lambda: self.edit_setting('Region of interest'))
         settingmenu.add_command(label="Edit Tracking Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Tracking'))
+                                command=lambda: self.edit_setting('Tracking'))
         settingmenu.add_command(label="Edit Detection Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Detection'))
+                                command=lambda: self.edit_setting('Detection'))
         settingmenu.add_command(label="Edit Position Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Position'))
+                                command=lambda: self.edit_setting('Position'))
         settingmenu.add_command(label="Edit Close Loop Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Close Loop'))
+                                command=lambda: self.edit_setting('Close Loop'))
         settingmenu.add_command(label="Edit Selected Area Analysis Setting",
-                                command=lambda: SettingsGUI(self.main_gui.root, self.main_gui.config_manager,
-                                                            'Selected area analysis'))
+                                command=lambda: self.edit_setting('Selected area analysis'))
         menubar.add_cascade(label='Setting', menu=settingmenu)
 
         self.menubar = menubar
         self.filemenu = filemenu
         self.settingmenu = settingmenu
 
+    def edit_setting(self, setting_name):
+        SettingsGUI(self.main_gui.root, self.main_gui.config_manager, setting_name)
+        # the window is closed, the DLC-Live model loads while the rest is configured
+        self.main_gui.controller.warmup_dlc_model()
+
     def disable_all_menu_items(self):
         for menu in [self.filemenu, self.settingmenu]:
             menu_items = menu.index('end')
@@ -30,7 +30,7 @@ class SettingsGUI:
 
         settings_options = [
             "Camera", "Region of interest", "Tracking", "Detection", "Position",
-            "Close Loop", "Selected area analysis"
+            "Close Loop", "Selected area analysis", "Arenas"
         ]
 
         self.setting_button_dist = {}
@@ -97,6 +97,8 @@ class SettingsGUI:
             self.current_page = CloseLoopSettingPage(self.current_frame, self.config)
         elif setting_name == 'Selected area analysis':
             self.current_page = SelectedAreaAnalysisSettingPage(self.current_frame, self.config, self.image)
+        elif setting_name == 'Arenas':
+            self.current_page = ArenasSettingPage(self.current_frame, self.config, self.image)
 
 
 class CameraSettingPage:
@@ -340,6 +342,18 @@ class TrackingSettingPage:
         self.bg_subtraction_rb.grid(row=0, column=1, padx=2, pady=5, sticky=tk.W)
         self.dlc_live_rb.grid(row=0, column=2, padx=2, pady=5, sticky=tk.W)
 
+        # background subtraction options
+        self.bg_subtraction_frame = ttk.Frame(frame)
+        self.bg_subtraction_frame.grid(row=1, column=0, columnspan=3, sticky=tk.W)
+
+        ttk.Label(self.bg_subtraction_frame, text="Largest area by:").grid(row=0, column=0, padx=2, pady=5,
+                                                                          sticky=tk.W)
+        self.backend_var = tk.StringVar(value=self.config['Tracking'].get('backend', 'contours'))
+        ttk.Radiobutton(self.bg_subtraction_frame, text="Contours", variable=self.backend_var,
+                        value="contours").grid(row=0, column=1, padx=2, pady=5, sticky=tk.W)
+        ttk.Radiobutton(self.bg_subtraction_frame, text="Connected components (faster)", variable=self.backend_var,
+                        value="components").grid(row=0, column=2, padx=2, pady=5, sticky=tk.W)
+
         # DLC-live options (hidden initially)
         self.dlc_live_frame = ttk.Frame(frame)
         self.dlc_live_frame.grid(row=1, column=0, columnspan=3, sticky=tk.W)
@@ -430,9 +444,11 @@ class TrackingSettingPage:
 
     def on_tracking_method_change(self):
         if self.tracking_method_var.get() == "DLC_live":
+            self.bg_subtraction_frame.grid_remove()
             self.dlc_live_frame.grid()
         else:
             self.dlc_live_frame.grid_remove()
+            self.bg_subtraction_frame.grid()
 
     def select_dlc_live_path(self):
         folder_path = tk.filedialog.askdirectory()
@@ -442,6 +458,7 @@ class TrackingSettingPage:
 
     def save_config(self):
         self.config['Tracking']['method'] = self.tracking_method_var.get()
+        self.config['Tracking']['backend'] = self.backend_var.get()
         self.config['Tracking']['DLC_live_path'] = self.dlc_live_path_var.get()
         self.config['Tracking']['detection_result'] = self.detection_result
         key_points = {}
@@ -740,10 +757,14 @@ class CloseLoopSettingPage:
 
 
 class SelectedAreaAnalysisSettingPage(BasePictureSelectSettingPage):
+    setting_name = 'Selected area analysis'
+
     def __init__(self, frame, config, image):
         super().__init__(frame, config, image)
         self.select_area_list = []
-        self.init_shape('Selected area analysis')
+        # configurations saved before a section was added
+        self.config.setdefault(self.setting_name, {})
+        self.init_shape(self.setting_name)
         ttk.Button(self.button_frame, text='Clear Last', command=self.clear_last_area).pack(pady=(60, 0))
 
     def set_area_mode_select(self):
@@ -766,16 +787,16 @@ class SelectedAreaAnalysisSettingPage(BasePictureSelectSettingPage):
         if self.area_select:
             self.select_area_list.append(self.area_select)
         if len(self.select_area_list) == 0:
-            self.config['Selected area analysis'].pop('area_types', None)
-            self.config['Selected area analysis'].pop('area_points', None)
+            self.config[self.setting_name].pop('area_types', None)
+            self.config[self.setting_name].pop('area_points', None)
             return True
         area_types = []
         area_points = []
         for area in self.select_area_list:
             area_types.append(self.canvas.type(area))
             area_points.append(self.canvas.coords(area))
-        self.config['Selected area analysis']['area_types'] = area_types
-        self.config['Selected area analysis']['area_points'] = area_points
+        self.config[self.setting_name]['area_types'] = area_types
+        self.config[self.setting_name]['area_points'] = area_points
         return True
 
     def init_shape(self, setting_name):
@@ -793,6 +814,14 @@ class SelectedAreaAnalysisSettingPage(BasePictureSelectSettingPage):
                         self.canvas.create_polygon(points, outline='blue', fill='', smooth=False))
 
 
+class ArenasSettingPage(SelectedAreaAnalysisSettingPage):
+    """
+    Arenas of the multi-arena tracking, one animal tracked in each. The first arena is used for the
+    position detection, the custom detection and the close loop.
+    """
+    setting_name = 'Arenas'
+
+
 if __name__ == '__main__':
     root = tk.Tk()
     app = SettingsGUI(root, None, 'Selected area analysis')
@@ -0,0 +1,147 @@
+import os
+import struct
+from array import array
+from fractions import Fraction
+
+# 'mp4': decoded frames are encoded again with cv2.VideoWriter
+# 'mjpeg_avi': the received JPEG payloads are written into an AVI container as they are
+# 'jpeg_archive': the received JPEG payloads are written into an indexed FrameStore archive
+RECORD_MP4 = 'mp4'
+RECORD_MJPEG_AVI = 'mjpeg_avi'
+RECORD_JPEG_ARCHIVE = 'jpeg_archive'
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+
+
+class MjpegAviWriter:
+    """
+    Write JPEG payloads into a MJPEG AVI file without decoding or encoding them.
+
+    Has the write/release interface of cv2.VideoWriter, but write takes the JPEG bytes of a frame. AVI 1.0
+    sizes and index offsets are 32 bit, so the recording continues in a new file (name_001.avi, ...) when
+    a file reaches max_file_size.
+    """
+
+    def __init__(self, filename, fps, frame_size, max_file_size=1 << 30):
+        """
+        :param filename: output file, later parts get a _001, _002, ... suffix
+        :param fps: frame rate written into the header
+        :param frame_size: (width, height)
+        :param max_file_size: size in bytes after which a new file is started
+        """
+        self.filename = filename
+        self.fps = Fraction(fps).limit_denominator(1001)
+        self.width, self.height = frame_size
+        self.max_file_size = max_file_size
+
+        self.part_num = 0
+        self.f = None
+        self.frame_num = 0
+        self.max_frame_size = 0
+        self.index = array('I')
+        self.movi_offset = 0
+        self.avih_offset = 0
+        self.strh_offset = 0
+
+        self._open()
+
+    def _part_filename(self):
+        if self.part_num == 0:
+            return self.filename
+        base, ext = os.path.splitext(self.filename)
+        return f"{base}_{self.part_num:03d}{ext}"
+
+    def _open(self):
+        self.f = open(self._part_filename(), 'wb')
+        self.frame_num = 0
+        self.max_frame_size = 0
+        self.index = array('I')
+        self._write_header()
+
+    def isOpened(self):
+        return self.f is not None
+
+    def _write_header(self):
+        f = self.f
+        f.write(b'RIFF' + struct.pack('<I', 0) + b'AVI ')
+
+        hdrl_start = f.tell()
+        f.write(b'LIST' + struct.pack('<I', 0) + b'hdrl')
+
+        f.write(b'avih' + struct.pack('<I', 56))
+        self.avih_offset = f.tell()
+        f.write(self._avih())
+
+        strl_start = f.tell()
+        f.write(b'LIST' + struct.pack('<I', 0) + b'strl')
+        f.write(b'strh' + struct.pack('<I', 56))
+        self.strh_offset = f.tell()
+        f.write(self._strh())
+        f.write(b'strf' + struct.pack('<I', 40))
+        f.write(struct.pack('<IiiHH4sIiiII', 40, self.width, self.height, 1, 24, b'MJPG',
+                            self.width * self.height * 3, 0, 0, 0, 0))
+        self._patch_list_size(strl_start)
+        self._patch_list_size(hdrl_start)
+
+        f.write(b'LIST' + struct.pack('<I', 0) + b'movi')
+        # idx1 offsets are relative to the 'movi' fourcc
+        self.movi_offset = f.tell() - 4
+
+    def _avih(self):
+        us_per_frame = int(round(1000000 / self.fps)) if self.fps else 0
+        return struct.pack('<14I', us_per_frame, 0, 0, AVIF_HASINDEX, self.frame_num, 0, 1,
+                           self.max_frame_size, self.width, self.height, 0, 0, 0, 0)
+
+    def _strh(self):
+        return struct.pack('<4s4sIHHIIIIIIiI4h', b'vids', b'MJPG', 0, 0, 0, 0,
+                           self.fps.denominator, self.fps.numerator, 0, self.frame_num, self.max_frame_size,
+                           -1, 0, 0, 0, self.width, self.height)
+
+    def _patch_list_size(self, list_start):
+        end = self.f.tell()
+        self.f.seek(list_start + 4)
+        self.f.write(struct.pack('<I', end - list_start - 8))
+        self.f.seek(end)
+
+    def write(self, jpeg):
+        """
+        :param jpeg: JPEG bytes of one frame
+        """
+        size = len(jpeg)
+        if self.f.tell() + size + 8 + 16 * (self.frame_num + 1) > self.max_file_size and self.frame_num > 0:
+            self._close()
+            self.part_num += 1
+            self._open()
+
+        self.index.append(self.f.tell() - self.movi_offset)
+        self.index.append(size)
+        self.f.write(b'00dc' + struct.pack('<I', size))
+        self.f.write(jpeg)
+        if size % 2:
+            self.f.write(b'\0')
+        self.frame_num += 1
+        self.max_frame_size = max(self.max_frame_size, size)
+
+    def _close(self):
+        f = self.f
+        self._patch_list_size(self.movi_offset - 8)
+
+        f.write(b'idx1' + struct.pack('<I', 16 * self.frame_num))
+        entry = struct.Struct('<4sIII')
+        for i in range(self.frame_num):
+            f.write(entry.pack(b'00dc', AVIIF_KEYFRAME, self.index[2 * i], self.index[2 * i + 1]))
+
+        end = f.tell()
+        f.seek(4)
+        f.write(struct.pack('<I', end - 8))
+        f.seek(self.avih_offset)
+        f.write(self._avih())
+        f.seek(self.strh_offset)
+        f.write(self._strh())
+        f.close()
+        self.f = None
+
+    def release(self):
+        if self.f is not None:
+            self._close()
@@ -3,7 +3,8 @@ import numpy as np
 import cv2
 
 from client_host.Custom import Custom_name
-from client_host.Utils import cv2_fill
+from client_host.DataBuffer import DROP_OLDEST
+from client_host.Utils import cv2_fill, ComponentContour
 
 
 class PlayBack:
@@ -31,12 +32,15 @@ class PlayBack:
         self.track_buffer = controller.track_buffer
         self.detector_buffer = detector_buffer
 
-        self.frame_buffer_reader_index = frame_buffer.register_reader()
+        self.frame_buffer_reader_index = frame_buffer.register_reader(DROP_OLDEST)
         if self.track_buffer is not None:
             self.track_buffer_reader_index = self.track_buffer.register_reader()
             if self.detector_buffer is not None:
                 self.detector_buffer_reader_index = self.detector_buffer.register_reader()
 
+        # multi-arena tracking: the results of the other arenas have the same index as those of the first one
+        self.arena_buffers = [(buffer, buffer.register_reader()) for buffer in controller.arena_track_buffers[1:]]
+
         self.use_detector = detector_buffer is not None
         self.use_track = self.track_buffer is not None
         self.use_dlc = controller.dlc_live is not None
@@ -87,11 +91,34 @@ class PlayBack:
 
             frame_index, track_res = track_res[0], track_res[1]
             frame_index, frame = self.frame_buffer.get_data_by_index(self.frame_buffer_reader_index, frame_index)
+            if self.arena_buffers:
+                track_res = [track_res] + self.get_arena_track_res(track_index)
 
         frame = frame[1]
         return frame, track_res, detect_res
 
+    def get_arena_track_res(self, track_index):
+        res_list = []
+        for buffer, reader_index in self.arena_buffers:
+            index, res = buffer.get_data_by_index(reader_index, track_index)
+            # not added yet or finished, only the first arena is drawn
+            res_list.append(res[1] if index is not None and index >= 0 and res is not None else None)
+        return res_list
+
+    def draw_track_res(self, frame, track_res):
+        out, _, _, largest_contour = track_res
+        _, x, y = out
+        if largest_contour is not None:
+            if isinstance(largest_contour, ComponentContour):
+                largest_contour = largest_contour.get()
+            cv2.drawContours(frame, [largest_contour], -1, (255, 0, 0), 2)
+            frame = cv2.circle(frame, (x, y), self.radius, (0, 255, 0), thickness=-1)
+        return frame
+
     def frame_improve(self, frame, track_res, detect_res):
+        if frame.ndim == 2:
+            # grayscale frames, the marks are drawn in color
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
         if self.use_track:
             if self.use_dlc:
                 out = track_res[0]
@@ -104,12 +131,12 @@ class PlayBack:
                     x, y = int(point[0]), int(point[1])
                     if not np.isnan(x):
                         frame = cv2.circle(frame, (x, y), 1, (255, 0, 0), thickness=-1)
+            elif self.arena_buffers:
+                for arena_track_res in track_res:
+                    if arena_track_res is not None:
+                        frame = self.draw_track_res(frame, arena_track_res)
             else:
-                out, _, _, largest_contour = track_res
-                _, x, y = out
-                if largest_contour is not None:
-                    cv2.drawContours(frame, [largest_contour], -1, (255, 0, 0), 2)
-                    frame = cv2.circle(frame, (x, y), self.radius, (0, 255, 0), thickness=-1)
+                frame = self.draw_track_res(frame, track_res)
         if self.detector_type == 'Position':
             mask = cv2_fill(np.zeros_like(frame), self.area_type, self.area_points, (255, 255, 255))
             shadow = cv2_fill(np.zeros_like(frame), self.area_type, self.area_points,(0, 255, 0))
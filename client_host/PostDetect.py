@@ -2,6 +2,7 @@ import threading
 
 import numpy as np
 
+from client_host.DataBuffer import DROP_OLDEST, BLOCK
 from client_host.Utils import get_largest_component_and_center, point_in_area
 
 if 1:
@@ -23,7 +24,7 @@ class PostDetect(object):
         return False
 
     def detector_record_thread(self, input_buffer: "DataBuffer", output_buffer: "DataBuffer", get_last_data=True):
-        input_buffer_reader_index = input_buffer.register_reader()
+        input_buffer_reader_index = input_buffer.register_reader(DROP_OLDEST if get_last_data else BLOCK)
         while True:
             if get_last_data:
                 index, data = input_buffer.get_last_data(input_buffer_reader_index)
@@ -102,10 +103,14 @@ class DetectPosition(PostDetect):
 
 class DetectFreezing(PostDetect):
 
-    def __init__(self, controller, fps, delay, duration):
+    def __init__(self, controller, fps, delay, duration, area=None):
+        """
+        :param area: (area_type, area_points) watched, default: the region of interest
+        """
         super().__init__(controller, "DetectFreezing", delay, duration)
         th, dur = controller.config_manager.get_detection_threshold_and_dur('freezing')
-        self.area_type, self.area_points = controller.config_manager.get_region_of_interest_area()
+        self.area_type, self.area_points = area if area is not None else \
+            controller.config_manager.get_region_of_interest_area()
         self.dur_time = dur
         self.threshold = th
         self.fps = fps
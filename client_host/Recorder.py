@@ -1,5 +1,7 @@
+import json
 import os
 import threading
+import time
 
 import cv2
 import numpy as np
@@ -8,13 +10,23 @@ import zmq
 
 from client_host.Analysis import get_analysis
 from client_host.Custom import Custom_name
+from client_host.FrameStore import FrameStoreWriter
+from client_host.MjpegWriter import MjpegAviWriter, RECORD_MJPEG_AVI, RECORD_JPEG_ARCHIVE
 from client_host.Utils import Log_thread_begin, Log_thread_finish
 
+DETECTION_CSV_NAMES = {
+    'freezing': ['index', 'res', 'over_th', 'area_sum'],
+    'speed': ['index', 'res', 'over_or_below_th', 'speed'],
+    'acceleration': ['index', 'res', 'over_or_below_th', 'speed', 'acceleration'],
+}
+
 
 class Recorder:
-    def __init__(self, controller, frame_buffer, track_buffer, save_dir, trial_name, fps=15, frame_width=640, frame_height=640):
+    def __init__(self, controller, frame_buffer, track_buffer, save_dir, trial_name, fps=15, frame_width=640, frame_height=640,
+                 timestamp_port=5556, record_results=True):
         self.frame_buffer = frame_buffer
-        self.frame_buffer_reader_index = frame_buffer.register_reader()
+        self.frame_buffer_reader_index = frame_buffer.register_reader(
+            controller.config_manager.get_frame_buffer_parameters()[2])
 
         self.frame_h = frame_width
         self.frame_w = frame_height
@@ -33,24 +45,53 @@ class Recorder:
 
         if track_buffer is not None:
             self.track_buffer_reader_index = track_buffer.register_reader()
-        if controller.position_detector_buffer is not None:
-            self.position_detector_buffer_index = controller.position_detector_buffer.register_reader()
-        if controller.freezing_detector_buffer is not None:
-            self.freezing_detector_buffer_index = controller.freezing_detector_buffer.register_reader()
-        if controller.speed_detector_buffer is not None:
-            self.speed_detector_buffer_index = controller.speed_detector_buffer.register_reader()
-        if controller.acceleration_detector_buffer is not None:
-            self.acceleration_detector_buffer_index = controller.acceleration_detector_buffer.register_reader()
-        if controller.custom_detector_buffer is not None:
-            self.custom_detector_buffer_index = controller.custom_detector_buffer.register_reader()
-
-        video_file_name = os.path.join(save_dir, trial_name + ".mp4")
+        # the cameras of a MultiCameraSession without background only record their video and timestamps
+        self.record_results = record_results
+        self.arena_recordings = []
+        if record_results:
+            if controller.position_detector_buffer is not None:
+                self.position_detector_buffer_index = controller.position_detector_buffer.register_reader()
+            if controller.freezing_detector_buffer is not None:
+                self.freezing_detector_buffer_index = controller.freezing_detector_buffer.register_reader()
+            if controller.speed_detector_buffer is not None:
+                self.speed_detector_buffer_index = controller.speed_detector_buffer.register_reader()
+            if controller.acceleration_detector_buffer is not None:
+                self.acceleration_detector_buffer_index = controller.acceleration_detector_buffer.register_reader()
+            if controller.custom_detector_buffer is not None:
+                self.custom_detector_buffer_index = controller.custom_detector_buffer.register_reader()
+
+            # multi-arena tracking: the first arena is recorded in the usual files, the other ones in
+            # <trial>_arena<k>_... files, each entry is (buffer, reader index, file name, csv names, recording name)
+            for k, track_buffer in enumerate(controller.arena_track_buffers[1:]):
+                self.arena_recordings.append((track_buffer, track_buffer.register_reader(),
+                                              os.path.join(save_dir, f"{trial_name}_arena{k + 2}_track_out.csv"),
+                                              ['index', 'time', 'x', 'y'], f'Tracking arena {k + 2}'))
+            for k, buffers in enumerate(controller.arena_detector_buffers):
+                for name, buffer in buffers.items():
+                    self.arena_recordings.append((buffer, buffer.register_reader(),
+                                                  os.path.join(save_dir, f"{trial_name}_arena{k + 2}_{name}_detection.csv"),
+                                                  DETECTION_CSV_NAMES[name],
+                                                  f'{name.capitalize()} Detection arena {k + 2}'))
+
         self.detector_file_name = os.path.join(save_dir, trial_name + "_detector.csv")
         self.timestamp_filename = os.path.join(save_dir, trial_name + "_timestamp.csv")
-
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-
-        self.video_out = cv2.VideoWriter(video_file_name, fourcc, fps, (frame_width, frame_height))
+        self.timestamp_port = timestamp_port
+        self.metrics_file_name = os.path.join(save_dir, trial_name + "_buffer_metrics.json")
+        self.metrics_interval = controller.config_manager.get_buffer_metrics_interval()
+
+        self.record_format = controller.config_manager.get_record_format()
+        if self.record_format == RECORD_MJPEG_AVI:
+            # the received JPEG payloads are stored without decoding and encoding again
+            video_file_name = os.path.join(save_dir, trial_name + ".avi")
+            self.video_out = MjpegAviWriter(video_file_name, fps, (frame_width, frame_height))
+        elif self.record_format == RECORD_JPEG_ARCHIVE:
+            video_file_name = os.path.join(save_dir, trial_name + "_frames")
+            self.video_out = FrameStoreWriter(video_file_name, fps, (frame_width, frame_height))
+        else:
+            video_file_name = os.path.join(save_dir, trial_name + ".mp4")
+            fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+            is_color = controller.config_manager.get_color_mode() != 'gray'
+            self.video_out = cv2.VideoWriter(video_file_name, fourcc, fps, (frame_width, frame_height), is_color)
         self.joint_names = []
 
     def set_dlc_joint_names(self, joint_names):
@@ -59,6 +100,10 @@ class Recorder:
     def start_thread(self):
         threads = []
 
+        metrics_stop_event = threading.Event()
+        metrics_thread = threading.Thread(target=self.recording_buffer_metrics, args=(metrics_stop_event,))
+        metrics_thread.start()
+
         thread1 = threading.Thread(target=self.recording_video)
         thread1.start()
         threads.append(thread1)
@@ -93,30 +138,43 @@ class Recorder:
                 thread.start()
                 threads.append(thread)
 
+        for recording in self.arena_recordings:
+            thread = threading.Thread(target=self.recording_process, args=recording)
+            thread.start()
+            threads.append(thread)
+
         for thread in threads:
             thread.join()
+        metrics_stop_event.set()
+        metrics_thread.join()
 
-        get_analysis(self.controller)
+        if self.record_results:
+            get_analysis(self.controller)
 
     def start(self):
         thread = threading.Thread(target=self.start_thread)
         thread.start()
+        return thread
 
     def recording_video(self):
         Log_thread_begin("Recording video")
-        while True:
-            index, frame = self.frame_buffer.get_data(self.frame_buffer_reader_index)
-            if index is None:
-                break
-            self.video_out.write(frame[1])
+        for batch in self.frame_buffer.iter_batches(self.frame_buffer_reader_index):
+            for index, frame in batch:
+                if self.record_format == RECORD_MJPEG_AVI:
+                    self.video_out.write(frame[2])
+                elif self.record_format == RECORD_JPEG_ARCHIVE:
+                    self.video_out.write(frame[2], frame[0])
+                else:
+                    self.video_out.write(frame[1])
         self.video_out.release()
+        print(f"frame buffer wait stats: {self.frame_buffer.get_wait_stats()}")
         Log_thread_finish("Finished recording video")
 
         context = zmq.Context()
         socket = context.socket(zmq.PULL)
         socket.setsockopt(zmq.RCVTIMEO, 5000)
         try:
-            socket.bind("tcp://*:5556")
+            socket.bind(f"tcp://*:{self.timestamp_port}")
             received_data = socket.recv()
             with open(self.timestamp_filename, "wb") as f:
                 f.write(received_data)
@@ -127,18 +185,36 @@ class Recorder:
             socket.close()
             context.term()
 
+    def recording_buffer_metrics(self, stop_event):
+        Log_thread_begin("Recording buffer metrics")
+        buffers = [self.frame_buffer, self.track_buffer]
+        if self.record_results:
+            buffers += [self.controller.position_detector_buffer, self.controller.freezing_detector_buffer,
+                        self.controller.speed_detector_buffer, self.controller.acceleration_detector_buffer,
+                        self.controller.custom_detector_buffer]
+        buffers += [recording[0] for recording in self.arena_recordings]
+        buffers = [buffer for buffer in buffers if buffer is not None]
+        start_time = time.time()
+        samples = []
+        while True:
+            finished = stop_event.wait(self.metrics_interval if self.metrics_interval > 0 else None)
+            samples.append({'time': time.time() - start_time, 'buffers': [buffer.get_stats() for buffer in buffers]})
+            if finished:
+                break
+        with open(self.metrics_file_name, 'w') as f:
+            json.dump({'interval': self.metrics_interval, 'samples': samples}, f, indent=4)
+        Log_thread_finish("Recording buffer metrics")
+
     def recording_process(self, process_buffer, buffer_reader_index, output_file_path, csv_name, recording_name):
         Log_thread_begin(f"Recording {recording_name}")
         process_out_list = []
         input_index_list = []
-        while True:
-            index, out = process_buffer.get_data(buffer_reader_index)
-            if index is None:
-                break
-            if out is None:
-                continue
-            input_index_list.append(out[0])
-            process_out_list.append(out[1][0])
+        for batch in process_buffer.iter_batches(buffer_reader_index):
+            for index, out in batch:
+                if out is None:
+                    continue
+                input_index_list.append(out[0])
+                process_out_list.append(out[1][0])
         input_index_list = np.array(input_index_list)
         process_out_list = np.array(process_out_list)
         process_out_list = process_out_list.reshape(process_out_list.shape[0], -1)
@@ -165,19 +241,19 @@ class Recorder:
                                detector_file_name, csv_name, 'Position Detection')
 
     def recording_freezing_detection(self):
-        csv_name = ['index', 'res', 'over_th', 'area_sum']
+        csv_name = DETECTION_CSV_NAMES['freezing']
         detector_file_name = os.path.join(self.save_dir, self.trial_name + "_freezing_detection.csv")
         self.recording_process(self.controller.freezing_detector_buffer, self.freezing_detector_buffer_index,
                                detector_file_name, csv_name, 'Freezing Detection')
 
     def recording_speed_detection(self):
-        csv_name = ['index', 'res', 'over_or_below_th', 'speed']
+        csv_name = DETECTION_CSV_NAMES['speed']
         detector_file_name = os.path.join(self.save_dir, self.trial_name + "_speed_detection.csv")
         self.recording_process(self.controller.speed_detector_buffer, self.speed_detector_buffer_index,
                                detector_file_name, csv_name, 'Speed Detection')
 
     def recording_acceleration_detection(self):
-        csv_name = ['index', 'res', 'over_or_below_th', 'speed', 'acceleration']
+        csv_name = DETECTION_CSV_NAMES['acceleration']
         detector_file_name = os.path.join(self.save_dir, self.trial_name + "_acceleration_detection.csv")
         self.recording_process(self.controller.acceleration_detector_buffer, self.acceleration_detector_buffer_index,
                                detector_file_name, csv_name, 'Acceleration Detection')
@@ -0,0 +1,204 @@
+import cv2
+import numpy as np
+
+from client_host.Utils import BackgroundModel, ComponentContour, MORPHOLOGY_MARGIN, \
+    get_largest_component_and_center
+
+
+def get_bounding_rect(contour):
+    """
+    :return: (x, y, w, h) of a contour or a ComponentContour, in frame coordinates
+    """
+    if isinstance(contour, ComponentContour):
+        x, y, w, h = contour.bbox
+        return x + contour.offset[0], y + contour.offset[1], w, h
+    return cv2.boundingRect(contour)
+
+
+def touches_border(contour, window, shape):
+    """
+    :return: True if the contour found in the window touches a border of the window that is not a border of
+    the frame, the area may then continue outside the window
+    """
+    x, y, w, h = get_bounding_rect(contour)
+    x0, y0, x1, y1 = window
+    return (x <= x0 and x0 > 0) or (y <= y0 and y0 > 0) or (x + w >= x1 and x1 < shape[1]) or \
+        (y + h >= y1 and y1 < shape[0])
+
+
+class SearchWindow:
+    """
+    Constant velocity Kalman filter of the tracked center, giving the part of the next frame to search.
+
+    The window is centered on the predicted center and is large enough for the animal, the uncertainty of
+    the prediction (3 standard deviations) and the reach of the opening and closing. The whole frame is
+    searched again when the animal is not found in the window or touches its border, and every
+    full_search_interval frames in case a larger area appeared elsewhere.
+    """
+
+    def __init__(self, frame_shape, window_size=160, full_search_interval=30, acceleration_std=2000,
+                 measurement_std=1):
+        """
+        :param frame_shape: shape of the frames
+        :param window_size: min width and height of the window in pixels
+        :param full_search_interval: frames between two searches of the whole frame, 0: only when the
+                                     animal is lost
+        :param acceleration_std: standard deviation of the acceleration of the animal (pixels/s^2)
+        :param measurement_std: standard deviation of the measured center (pixels)
+        """
+        self.height, self.width = frame_shape[:2]
+        self.window_size = window_size
+        self.full_search_interval = full_search_interval
+        self.acceleration_var = acceleration_std ** 2
+
+        self.kalman = cv2.KalmanFilter(4, 2)
+        self.kalman.measurementMatrix = np.array([[1, 0, 0, 0], [0, 1, 0, 0]], np.float32)
+        self.kalman.measurementNoiseCov = np.eye(2, dtype=np.float32) * measurement_std ** 2
+        self.reset()
+
+    def reset(self):
+        self.lost = True
+        self.predicted = False
+        self.last_time = None
+        self.last_dt = None
+        self.object_size = 0
+        self.frames_in_window = 0
+        self.frame_count = 0
+        self.window_count = 0
+        self.lost_count = 0
+
+    def _set_dt(self, dt):
+        self.kalman.transitionMatrix = np.array([[1, 0, dt, 0], [0, 1, 0, dt], [0, 0, 1, 0], [0, 0, 0, 1]],
+                                                np.float32)
+        # white noise acceleration
+        q = np.array([[dt ** 4 / 4, dt ** 3 / 2], [dt ** 3 / 2, dt ** 2]]) * self.acceleration_var
+        Q = np.zeros((4, 4), np.float32)
+        Q[np.ix_([0, 2], [0, 2])] = q
+        Q[np.ix_([1, 3], [1, 3])] = q
+        self.kalman.processNoiseCov = Q
+
+    def get_window(self, t):
+        """
+        :param t: frame time (sec)
+        :return: (x0, y0, x1, y1) to search, None to search the whole frame
+        """
+        self.frame_count += 1
+        if self.lost or (self.full_search_interval and self.frames_in_window >= self.full_search_interval):
+            return None
+        dt = t - self.last_time
+        if dt <= 0:
+            dt = self.last_dt or 0
+        self._set_dt(dt)
+        x, y = self.kalman.predict()[:2, 0]
+        self.predicted = True
+        std = np.sqrt(self.kalman.errorCovPre[[0, 1], [0, 1]])
+        half_w, half_h = max(self.window_size, 2 * self.object_size) / 2 + 3 * std + MORPHOLOGY_MARGIN
+        window = (max(int(x - half_w), 0), max(int(y - half_h), 0),
+                  min(int(x + half_w) + 1, self.width), min(int(y + half_h) + 1, self.height))
+        if window[0] >= window[2] or window[1] >= window[3]:
+            # predicted outside the frame
+            return None
+        self.window_count += 1
+        return window
+
+    def update(self, t, contour, cX, cY, window=None):
+        """
+        :param contour: largest contour found in the window, None if nothing was found
+        :param window: window given by get_window, None after a search of the whole frame
+        :return: False if the animal was not found in the window, the whole frame must then be searched
+                 and update called again with window=None
+        """
+        if contour is None or np.isnan(cX):
+            if window is not None:
+                self.window_count -= 1
+                self.lost_count += 1
+                return False
+            self.lost = True
+            self.predicted = False
+            return True
+
+        if window is not None and touches_border(contour, window, (self.height, self.width)):
+            self.window_count -= 1
+            self.lost_count += 1
+            return False
+
+        _, _, w, h = get_bounding_rect(contour)
+        measurement = np.array([[cX], [cY]], np.float32)
+        if self.lost:
+            self.kalman.statePost = np.array([[cX], [cY], [0], [0]], np.float32)
+            self.kalman.errorCovPost = np.diag([1, 1, 1e4, 1e4]).astype(np.float32)
+            self.lost = False
+        else:
+            if not self.predicted:
+                # periodic search of the whole frame, get_window did not predict
+                self._set_dt(t - self.last_time if t > self.last_time else self.last_dt or 0)
+                self.kalman.predict()
+            self.kalman.correct(measurement)
+        if self.last_time is not None and t > self.last_time:
+            self.last_dt = t - self.last_time
+        self.last_time = t
+        self.object_size = max(w, h)
+        self.frames_in_window = self.frames_in_window + 1 if window is not None else 0
+        self.predicted = False
+        return True
+
+    def get_stats(self):
+        return {'frames': self.frame_count, 'searched_in_window': self.window_count,
+                'lost_in_window': self.lost_count}
+
+
+def downscale(image, factor):
+    """
+    Average of factor x factor blocks (INTER_AREA), by steps of 2 which are several times faster than one
+    step of 4 or more
+    """
+    size = (image.shape[1] // factor, image.shape[0] // factor)
+    while factor % 2 == 0 and factor > 2:
+        image = cv2.resize(image, (image.shape[1] // 2, image.shape[0] // 2), interpolation=cv2.INTER_AREA)
+        factor //= 2
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+class PyramidSearch:
+    """
+    Coarse search of the largest area in a frame downscaled by factor, giving the window of the frame to
+    search at full resolution.
+
+    The coarse frame is downscaled by averaging, which already removes small noise, so it is
+    thresholded without opening and closing. The window covers the area found, extended by 2 coarse pixels
+    and by the reach of the opening and closing at full resolution.
+    """
+
+    def __init__(self, background, factor, area_type=None, area_points=None, diff_type='div', div_coeff=5,
+                 thresh=120, backend='contours'):
+        """
+        :param background: full resolution background image
+        :param factor: downscale factor, 2 or 4
+        """
+        self.factor = factor
+        self.height, self.width = background.shape[:2]
+        self.background = BackgroundModel(downscale(background, factor), div_coeff)
+        self.area_type = area_type
+        self.area_points = None if area_points is None else \
+            (np.asarray(area_points, dtype=np.float64) / factor).tolist()
+        self.diff_type = diff_type
+        self.thresh = thresh
+        self.backend = backend
+
+    def get_window(self, frame):
+        """
+        :return: (x0, y0, x1, y1) to search at full resolution, None if nothing was found
+        """
+        small = downscale(frame, self.factor)
+        _, _, contour, _, _ = get_largest_component_and_center(small, self.background, thresh_type='manual',
+                                                               thresh=self.thresh, diff_type=self.diff_type,
+                                                               use_open_close=False, area_type=self.area_type,
+                                                               area_points=self.area_points,
+                                                               backend=self.backend)
+        if contour is None:
+            return None
+        x, y, w, h = get_bounding_rect(contour)
+        f = self.factor
+        margin = 2 * f + MORPHOLOGY_MARGIN
+        return (max(x * f - margin, 0), max(y * f - margin, 0),
+                min((x + w) * f + margin, self.width), min((y + h) * f + margin, self.height))
@@ -0,0 +1,246 @@
+import multiprocessing
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from client_host.DataBuffer import BLOCK, DROP_OLDEST
+
+# control block
+DATA_BUFFER_INDEX = 0
+FIRST_INDEX = 1
+FINISH_LABEL = 2
+READER_NUM = 3
+CONTROL_SIZE = 4
+
+ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class SharedDataBuffer:
+    """
+    Frame buffer in shared memory, with the register_reader/get_data/get_last_data/get_data_by_index
+    interface of DataBuffer, for producers and readers living in different processes.
+
+    Items are [time, frame] or [time, frame, jpeg] like in the frame buffer. Item i is stored in slot
+    i % slot_num: frames and JPEG payloads are copied into the slot and out of it, never pickled. The
+    indices, the reader positions and the slot metadata are kept in the same shared memory block.
+
+    The buffer is created by the owner process and passed to the other processes as an argument of
+    multiprocessing.Process. As the ring has a fixed size, add_data waits while the oldest slot is still
+    needed by a BLOCK reader. DROP_OLDEST readers skip the oldest item instead.
+    """
+
+    def __init__(self, name, slot_num, frame_shape, frame_dtype=np.uint8, jpeg_size=0, max_readers=16,
+                 mp_context=None):
+        """
+        :param slot_num: number of items held
+        :param frame_shape: shape of every frame
+        :param jpeg_size: max size of a JPEG payload, 0 for [time, frame] items
+        :param max_readers: max number of registered readers
+        :param mp_context: multiprocessing context the reader processes are started with
+        """
+        self.buffer_name = name
+        self.slot_num = slot_num
+        self.frame_shape = tuple(frame_shape)
+        self.frame_dtype = np.dtype(frame_dtype)
+        self.jpeg_size = jpeg_size
+        self.max_readers = max_readers
+        self.condition = (mp_context or multiprocessing).Condition()
+
+        self.shm = shared_memory.SharedMemory(create=True, size=self._layout())
+        # a forked child inherits the object, only the creating process unlinks the memory
+        self.owner_pid = os.getpid()
+        self._map()
+        self.control[:] = 0
+        self.last_reader_index[:] = -1
+        self.reading_index[:] = -1
+
+    def _layout(self):
+        frame_nbytes = int(np.prod(self.frame_shape)) * self.frame_dtype.itemsize
+        sizes = [('control', CONTROL_SIZE * 8), ('last_reader_index', self.max_readers * 8),
+                 ('reading_index', self.max_readers * 8), ('reader_policy', self.max_readers),
+                 ('slot_time', self.slot_num * 8), ('slot_jpeg_size', self.slot_num * 8),
+                 ('frames', self.slot_num * frame_nbytes), ('jpegs', self.slot_num * self.jpeg_size)]
+        self.offsets = {}
+        offset = 0
+        for key, size in sizes:
+            self.offsets[key] = offset
+            offset = _aligned(offset + size)
+        return max(offset, 1)
+
+    def _map(self):
+        buf = self.shm.buf
+        offsets = self.offsets
+        self.control = np.ndarray(CONTROL_SIZE, np.int64, buf, offsets['control'])
+        self.last_reader_index = np.ndarray(self.max_readers, np.int64, buf, offsets['last_reader_index'])
+        # item a reader is copying out of its slot, -1 when none
+        self.reading_index = np.ndarray(self.max_readers, np.int64, buf, offsets['reading_index'])
+        self.reader_policy = np.ndarray(self.max_readers, np.int8, buf, offsets['reader_policy'])
+        self.slot_time = np.ndarray(self.slot_num, np.float64, buf, offsets['slot_time'])
+        self.slot_jpeg_size = np.ndarray(self.slot_num, np.int64, buf, offsets['slot_jpeg_size'])
+        self.frames = np.ndarray((self.slot_num,) + self.frame_shape, self.frame_dtype, buf, offsets['frames'])
+        self.jpegs = np.ndarray((self.slot_num, self.jpeg_size), np.uint8, buf, offsets['jpegs'])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ('shm', 'control', 'last_reader_index', 'reading_index', 'reader_policy', 'slot_time',
+                    'slot_jpeg_size', 'frames', 'jpegs'):
+            del state[key]
+        state['shm_name'] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state.pop('shm_name')
+        self.__dict__.update(state)
+        self.shm = shared_memory.SharedMemory(name=shm_name)
+        self._map()
+
+    def close(self):
+        """
+        Release the mapping of this process, the owner also frees the shared memory
+        """
+        if self.shm is None:
+            return
+        for key in ('control', 'last_reader_index', 'reading_index', 'reader_policy', 'slot_time',
+                    'slot_jpeg_size', 'frames', 'jpegs'):
+            setattr(self, key, None)
+        self.shm.close()
+        if self.owner_pid == os.getpid():
+            self.shm.unlink()
+        self.shm = None
+
+    def register_reader(self, policy=None):
+        """
+        :param policy: BLOCK (default) or DROP_OLDEST
+        :return: reader index
+        """
+        if policy not in (None, BLOCK, DROP_OLDEST):
+            raise ValueError(f"{self.buffer_name}: unsupported overflow policy {policy}")
+        with self.condition:
+            reader_index = int(self.control[READER_NUM])
+            if reader_index >= self.max_readers:
+                raise ValueError(f"{self.buffer_name}: more than {self.max_readers} readers")
+            self.last_reader_index[reader_index] = -1
+            self.reading_index[reader_index] = -1
+            self.reader_policy[reader_index] = policy == DROP_OLDEST
+            self.control[READER_NUM] += 1
+        return reader_index
+
+    def add_data(self, data):
+        with self.condition:
+            if data is None:
+                self.control[FINISH_LABEL] = 1
+                self.condition.notify_all()
+                return
+            index = int(self.control[DATA_BUFFER_INDEX])
+            self._wait_for_slot(index)
+        # the slot is not visible to the readers before the index is published
+        slot = index % self.slot_num
+        np.copyto(self.frames[slot], data[1])
+        self.slot_time[slot] = data[0]
+        if len(data) > 2:
+            jpeg = np.frombuffer(data[2], np.uint8)
+            if len(jpeg) > self.jpeg_size:
+                raise ValueError(f"{self.buffer_name}: JPEG payload of {len(jpeg)} bytes exceeds {self.jpeg_size}")
+            self.jpegs[slot, :len(jpeg)] = jpeg
+            self.slot_jpeg_size[slot] = len(jpeg)
+        else:
+            self.slot_jpeg_size[slot] = -1
+        with self.condition:
+            self.control[DATA_BUFFER_INDEX] = index + 1
+            self.condition.notify_all()
+
+    def _wait_for_slot(self, index):
+        # the item previously stored in the slot must be removed and not being copied by a reader
+        old_index = index - self.slot_num
+        if old_index < 0:
+            return
+        reader_num = int(self.control[READER_NUM])
+        while old_index >= self.control[FIRST_INDEX] or (self.reading_index[:reader_num] == old_index).any():
+            if old_index >= self.control[FIRST_INDEX]:
+                behind = self.last_reader_index[:reader_num] < old_index
+                if not (behind & (self.reader_policy[:reader_num] == 0)).any():
+                    # only DROP_OLDEST readers are behind
+                    self.last_reader_index[:reader_num][behind] = old_index
+                    self._remove_data()
+                    continue
+            self.condition.wait()
+            reader_num = int(self.control[READER_NUM])
+
+    def _read(self, index):
+        slot = index % self.slot_num
+        item = [float(self.slot_time[slot]), self.frames[slot].copy()]
+        jpeg_size = self.slot_jpeg_size[slot]
+        if jpeg_size >= 0:
+            item.append(self.jpegs[slot, :jpeg_size].tobytes())
+        return item
+
+    def _read_unlocked(self, reader_index, index):
+        # called with the lock held, the slot is copied without holding it
+        self.reading_index[reader_index] = index
+        self.condition.release()
+        try:
+            data = self._read(index)
+        finally:
+            self.condition.acquire()
+            self.reading_index[reader_index] = -1
+            # the producer may wait for this slot
+            self.condition.notify_all()
+        # a DROP_OLDEST reader may have been moved past the item meanwhile
+        self.last_reader_index[reader_index] = max(self.last_reader_index[reader_index], index)
+        self._remove_data()
+        return data
+
+    def get_data(self, reader_index):
+        """
+        get data one by one
+        :param reader_index:
+        :return:
+        """
+        with self.condition:
+            while True:
+                # items removed before this reader got them are skipped
+                index = int(max(self.last_reader_index[reader_index] + 1, self.control[FIRST_INDEX]))
+                if index < self.control[DATA_BUFFER_INDEX]:
+                    return index, self._read_unlocked(reader_index, index)
+                if self.control[FINISH_LABEL]:
+                    return None, None
+                self.condition.wait()
+
+    def get_last_data(self, reader_index):
+        with self.condition:
+            while self.control[FIRST_INDEX] == self.control[DATA_BUFFER_INDEX] or \
+                    self.control[DATA_BUFFER_INDEX] - 1 <= self.last_reader_index[reader_index]:
+                if self.control[FINISH_LABEL]:
+                    return None, None
+                self.condition.wait()
+            index = int(self.control[DATA_BUFFER_INDEX] - 1)
+            return index, self._read_unlocked(reader_index, index)
+
+    def get_data_by_index(self, reader_index, target_index):
+        with self.condition:
+            while self.control[FIRST_INDEX] == self.control[DATA_BUFFER_INDEX]:
+                if self.control[FINISH_LABEL]:
+                    return None, None
+                self.condition.wait()
+            if not self.control[FIRST_INDEX] <= target_index < self.control[DATA_BUFFER_INDEX]:
+                return -1, None
+            # the item may be behind the reader, so it is copied with the lock held
+            data = self._read(target_index)
+            self.last_reader_index[reader_index] = target_index
+            self._remove_data()
+            return target_index, data
+
+    def _remove_data(self):
+        reader_num = int(self.control[READER_NUM])
+        if not reader_num:
+            return
+        position = int(self.last_reader_index[:reader_num].min())
+        if position + 1 > self.control[FIRST_INDEX]:
+            self.control[FIRST_INDEX] = min(position + 1, self.control[DATA_BUFFER_INDEX])
+            # wake a producer waiting for a slot
+            self.condition.notify_all()
@@ -1,22 +1,69 @@
+import time
+
+import cv2
 import numpy as np
-from dlclive import DLCLive, Processor
+from dlclive.pose import extract_cnn_output, argmax_pose_predict, multi_pose_predict
 
+from client_host.DataBuffer import DROP_OLDEST, BLOCK
+from client_host.DLCModelCache import dlc_model_cache
 from client_host.PostDetect import PostDetect
-from client_host.Utils import get_largest_component_and_center, apply_mask
+from client_host.Arena import ArenaTracker, ArenaBuffers
+from client_host.BackgroundUpdater import BackgroundUpdater
+from client_host.SearchWindow import PyramidSearch, touches_border, get_bounding_rect
+from client_host.Utils import get_largest_component_and_center, apply_mask, get_roi_mask, BackgroundModel
+
+
+def to_bgr(frame):
+    # grayscale frames, the network takes 3 channels
+    return cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) if frame.ndim == 2 else frame
+
+
+# batch policies of DLCLiveModel
+DLC_BATCH_REALTIME = 'realtime'     # latency bound: the newest frames, older ones are skipped
+DLC_BATCH_OFFLINE = 'offline'       # throughput bound: every frame, in order
 
 
 class DLCLiveModel(PostDetect):
-    def __init__(self, controller, model_path, example_photo, area_type, area_points, key_points):
+    def __init__(self, controller, model_path, example_photo, area_type, area_points, key_points,
+                 batch_size=1, batch_timeout=0.01, batch_policy=DLC_BATCH_REALTIME, crop_size=0):
+        """
+        :param batch_size: max number of frames of one forward pass, 1: one frame at a time, the newest
+        :param batch_timeout: max time (sec) waited after the first frame of a batch for the batch to fill
+        :param batch_policy: DLC_BATCH_REALTIME or DLC_BATCH_OFFLINE
+        :param crop_size: > 0: the network only gets a crop_size x crop_size part of the frame centered on the
+                          last confident pose, 0: the whole frame
+        """
         super().__init__(controller, "DLCLiveModel")
-        self.dlc_proc = Processor()
-        self.dlc_live = DLCLive(model_path, processor=self.dlc_proc)
-        self.dlc_live.init_inference(example_photo)
+        # the session is shared with the earlier and later preparations using the same model
+        self.dlc_live = dlc_model_cache.get(model_path, example_photo)
+        self.dlc_proc = self.dlc_live.processor
         self.area_type = area_type
         self.area_points = area_points
         self.key_points = key_points
         self.all_joints_names = self.dlc_live.cfg['all_joints_names']
         self.joint_likelihood_threshold = 0.9
         self.use_index = self.init_use_index()
+        # ROI mask compiled before the recording, output image reused for every frame
+        get_roi_mask(example_photo.shape, area_type, area_points)
+        self.marked_frame = None
+
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.batch_policy = batch_policy
+        # one forward pass for a batch needs the score maps of the TensorFlow session, models exported with
+        # TFGPUinference or run with TFLite/TensorRT give the pose of one frame
+        self.batch_inference = batch_size > 1 and self.dlc_live.model_type == 'base' and \
+            len(self.dlc_live.outputs) > 1
+        self.frame_pool = []
+        self.batch_stats = None
+
+        # the network of the other model types has a fixed input size
+        if crop_size > 0 and self.dlc_live.model_type != 'base':
+            print(f"DLC-Live model type {self.dlc_live.model_type}: the frames are not cropped")
+            crop_size = 0
+        self.crop_size = crop_size
+        self.crop_center = None
+        self.crop_stats = {'cropped': 0, 'expanded': 0}
 
     def init_use_index(self):
         use_index = []
@@ -26,13 +73,163 @@ class DLCLiveModel(PostDetect):
         return use_index
 
     def get_res(self, image):
-        marked_frame = apply_mask(image[1], self.area_type, self.area_points)
-        pose = self.dlc_live.get_pose(marked_frame)
+        if self.marked_frame is None or self.marked_frame.shape != image[1].shape:
+            self.marked_frame = np.empty_like(image[1])
+        marked_frame = apply_mask(image[1], self.area_type, self.area_points, out=self.marked_frame)
+        pose = self.get_pose_batch([marked_frame])[0]
         x, y = pose[self.use_index, :2].mean(0)
         res = [image[0], x, y]
         res.extend(pose.flatten())
         return [res]
 
+    def mark_frame(self, frame):
+        """
+        Masked copy of a frame, in an image of frame_pool: the frame buffer may reuse the memory of the frame
+        once the next frames are read
+        """
+        marked_frame = self.frame_pool.pop() if self.frame_pool else None
+        if marked_frame is None or marked_frame.shape != frame.shape:
+            marked_frame = np.empty_like(frame)
+        return apply_mask(frame, self.area_type, self.area_points, out=marked_frame)
+
+    def read_batch(self, input_buffer, reader_index):
+        """
+        Up to batch_size frames, waiting at most batch_timeout after the first one. DLC_BATCH_REALTIME keeps
+        the newest frames when more are waiting, DLC_BATCH_OFFLINE takes the oldest ones.
+        :return: list of (index, time, masked frame), None when the buffer is finished
+        """
+        realtime = self.batch_policy == DLC_BATCH_REALTIME
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+            items = input_buffer.get_batch(reader_index, 0 if realtime else self.batch_size - len(batch),
+                                           remaining)
+            if items is None:
+                return batch if batch else None
+            if deadline is None:
+                deadline = time.monotonic() + self.batch_timeout
+            skipped = len(batch) + len(items) - self.batch_size
+            if skipped > 0:
+                # realtime: the oldest frames of the batch, then the oldest frames read, are skipped
+                self.batch_stats['skipped'] += skipped
+                dropped = min(skipped, len(batch))
+                self.frame_pool.extend(frame for _, _, frame in batch[:dropped])
+                batch = batch[dropped:]
+                items = items[skipped - dropped:]
+            for index, data in items:
+                batch.append((index, data[0], self.mark_frame(data[1])))
+        return batch
+
+    def clear_params(self):
+        super().clear_params()
+        self.crop_center = None
+        self.crop_stats = {'cropped': 0, 'expanded': 0}
+
+    def get_crop(self, shape):
+        """
+        :return: (x0, y0, x1, y1) of the part of the frame given to the network, None for the whole frame
+        """
+        height, width = shape[:2]
+        if self.crop_center is None or (self.crop_size >= width and self.crop_size >= height):
+            return None
+        cX, cY = self.crop_center
+        # moved inside the frame, the network always gets the same size
+        x0 = int(np.clip(cX - self.crop_size / 2, 0, max(width - self.crop_size, 0)))
+        y0 = int(np.clip(cY - self.crop_size / 2, 0, max(height - self.crop_size, 0)))
+        return x0, y0, min(x0 + self.crop_size, width), min(y0 + self.crop_size, height)
+
+    def is_confident(self, pose):
+        return pose[self.use_index, 2].min() >= self.joint_likelihood_threshold
+
+    def get_pose_batch(self, frames):
+        """
+        Poses of several frames in frame coordinates. With crop_size, the frames are cropped around the last
+        confident pose, and posed again as a whole when a joint used for the center is below
+        joint_likelihood_threshold in the crop
+        """
+        crop = self.get_crop(frames[0].shape) if self.crop_size > 0 else None
+        if crop is None:
+            poses = self.run_inference(frames)
+        else:
+            x0, y0, x1, y1 = crop
+            poses = self.run_inference([frame[y0:y1, x0:x1] for frame in frames])
+            for pose in poses:
+                pose[:, 0] += x0
+                pose[:, 1] += y0
+            self.crop_stats['cropped'] += len(frames)
+            lost = [k for k, pose in enumerate(poses) if not self.is_confident(pose)]
+            if lost:
+                self.crop_stats['expanded'] += len(lost)
+                for k, pose in zip(lost, self.run_inference([frames[k] for k in lost])):
+                    poses[k] = pose
+        if self.crop_size > 0:
+            pose = poses[-1]
+            self.crop_center = tuple(pose[self.use_index, :2].mean(0)) if self.is_confident(pose) else None
+        return poses
+
+    def run_inference(self, frames):
+        """
+        Poses of several frames, with one forward pass of the network when the model allows it
+        """
+        if self.batch_inference:
+            try:
+                inputs = np.stack([self.dlc_live.process_frame(to_bgr(frame)) for frame in frames]).astype(float)
+                outputs = self.dlc_live.sess.run(self.dlc_live.outputs, feed_dict={self.dlc_live.inputs: inputs})
+                num_outputs = self.dlc_live.cfg.get('num_outputs', 1)
+                poses = []
+                for k in range(len(frames)):
+                    scmap, locref = extract_cnn_output([output[k:k + 1] for output in outputs], self.dlc_live.cfg)
+                    if num_outputs > 1:
+                        pose = multi_pose_predict(scmap, locref, self.dlc_live.cfg['stride'], num_outputs)
+                    else:
+                        pose = argmax_pose_predict(scmap, locref, self.dlc_live.cfg['stride'])
+                    poses.append(self.dlc_proc.process(pose))
+                return poses
+            except Exception as e:
+                # e.g. a graph exported with a fixed batch size of 1
+                print(f"DLC-Live batch inference not available, one frame at a time: {e}")
+                self.batch_inference = False
+        return [self.dlc_live.get_pose(to_bgr(frame)) for frame in frames]
+
+    def detector_record_thread(self, input_buffer, output_buffer, get_last_data=True):
+        if self.batch_size <= 1:
+            super().detector_record_thread(input_buffer, output_buffer, get_last_data)
+            self.print_crop_stats()
+            return
+        reader_index = input_buffer.register_reader(DROP_OLDEST if self.batch_policy == DLC_BATCH_REALTIME
+                                                    else BLOCK)
+        self.batch_stats = {'batches': 0, 'frames': 0, 'skipped': 0}
+        self.frame_pool = []
+        while True:
+            batch = self.read_batch(input_buffer, reader_index)
+            if batch is None:
+                output_buffer.add_data(None)
+                break
+            poses = self.get_pose_batch([frame for _, _, frame in batch])
+            for (index, t, _), pose in zip(batch, poses):
+                x, y = pose[self.use_index, :2].mean(0)
+                res = [t, x, y]
+                res.extend(pose.flatten())
+                output_buffer.add_data([index, [res]])
+            self.frame_pool.extend(frame for _, _, frame in batch)
+            self.batch_stats['batches'] += 1
+            self.batch_stats['frames'] += len(batch)
+        stats = self.batch_stats
+        print(f"DLC-Live: {stats['frames']} frames in {stats['batches']} batches "
+              f"({stats['frames'] / max(stats['batches'], 1):.1f} per batch), {stats['skipped']} skipped")
+        self.print_crop_stats()
+        print(f"{self.process_name} thread Finish")
+
+    def print_crop_stats(self):
+        if self.crop_size > 0:
+            print(f"DLC-Live: {self.crop_stats['cropped']} frames cropped, {self.crop_stats['expanded']} posed again "
+                  f"as a whole")
+
     def get_x_y_by_pose(self, pose):
         # pose = pose[self.use_index][pose[self.use_index][:, 2] > self.joint_likelihood_threshold]
         return pose[self.use_index, :2].mean(0) if pose.size else (np.nan, np.nan)
@@ -42,15 +239,105 @@ class DLCLiveModel(PostDetect):
 
 
 class TrackLiveModel(PostDetect):
-    def __init__(self, controller, background, area_type, area_points):
+    def __init__(self, controller, background, area_type, area_points, backend='contours', search_window=None,
+                 pyramid_factor=1, background_update_interval=0, background_update_rate=0.05):
+        """
+        :param backend: 'contours' or 'components', see get_largest_component_and_center
+        :param search_window: SearchWindow predicting where to search the next frame, None: every frame is
+                              searched as a whole
+        :param pyramid_factor: > 1: the whole frame is first searched downscaled by this factor, and only
+                               the area found is searched at full resolution
+        :param background_update_interval: > 0: seconds between two frames averaged into the background,
+                                           0: the background is not updated
+        :param background_update_rate: weight of a new frame in the background
+        """
         super().__init__(controller, "TrackLiveModel")
-        self.background = background
+        self.background = BackgroundModel(background, div_coeff=5)
         self.area_type = area_type
         self.area_points = area_points
+        self.backend = backend
+        self.search_window = search_window
+        self.pyramid_search = PyramidSearch(background, pyramid_factor, area_type, area_points, diff_type='div',
+                                            div_coeff=5, thresh=120, backend=backend) \
+            if pyramid_factor > 1 else None
+        self.background_updater = None
+        if background_update_interval > 0:
+            models = [(self.background, 1)]
+            if self.pyramid_search is not None:
+                models.append((self.pyramid_search.background, pyramid_factor))
+            self.background_updater = BackgroundUpdater(background, models, background_update_rate,
+                                                        background_update_interval)
+        if area_type is not None:
+            get_roi_mask(background.shape, area_type, area_points)
+
+    def track(self, frame, window=None):
+        return get_largest_component_and_center(frame, self.background, diff_type='div', div_coeff=5,
+                                                thresh_type='manual', thresh=120, use_open_close=True,
+                                                area_type=self.area_type, area_points=self.area_points,
+                                                backend=self.backend, window=window)
+
+    def track_whole_frame(self, frame):
+        if self.pyramid_search is not None:
+            window = self.pyramid_search.get_window(frame)
+            if window is not None:
+                res = self.track(frame, window)
+                if res[2] is not None and not touches_border(res[2], window, frame.shape):
+                    return res
+        return self.track(frame)
 
     def get_res(self, image):
-        difference, thresh_img, largest_contour, cX, cY = \
-            get_largest_component_and_center(image[1], self.background, diff_type='div', div_coeff=5,
-                                             thresh_type='manual', thresh=120, use_open_close=True,
-                                             area_type=self.area_type, area_points=self.area_points)
+        res = None
+        if self.search_window is not None:
+            window = self.search_window.get_window(image[0])
+            if window is not None:
+                res = self.track(image[1], window)
+                if not self.search_window.update(image[0], res[2], res[3], res[4], window):
+                    # lost in the window
+                    res = None
+        if res is None:
+            res = self.track_whole_frame(image[1])
+            if self.search_window is not None:
+                self.search_window.update(image[0], res[2], res[3], res[4])
+        difference, thresh_img, largest_contour, cX, cY = res
+        if self.background_updater is not None:
+            self.background_updater.submit(image[0], image[1],
+                                           get_bounding_rect(largest_contour) if largest_contour is not None else None)
         return [[image[0], cX, cY], difference, thresh_img, largest_contour]
+
+    def start_record(self, input_buffer, output_buffer):
+        if self.background_updater is not None:
+            self.background_updater.start()
+        super().start_record(input_buffer, output_buffer)
+
+    def clear_params(self):
+        super().clear_params()
+        if self.search_window is not None:
+            self.search_window.reset()
+
+    def detector_record_thread(self, input_buffer, output_buffer, get_last_data=True):
+        super().detector_record_thread(input_buffer, output_buffer, get_last_data)
+        if self.background_updater is not None:
+            self.background_updater.stop()
+        if self.search_window is not None:
+            print(f"{self.process_name} search window: {self.search_window.get_stats()}")
+
+
+class MultiArenaTrackModel(PostDetect):
+    def __init__(self, controller, background, arenas):
+        """
+        :param arenas: list of (area_type, area_points), one animal tracked in each
+        """
+        super().__init__(controller, "MultiArenaTrackModel")
+        self.arena_tracker = ArenaTracker(background, arenas, diff_type='div', div_coeff=5, thresh=120)
+        self.arena_num = len(arenas)
+
+    def get_res(self, image):
+        difference, thresh_img, arena_res_list = self.arena_tracker.track(image[1])
+        res_list = [[[image[0], cX, cY], difference, thresh_img, contour] for contour, cX, cY in arena_res_list]
+        return res_list
+
+    def start_record(self, input_buffer, output_buffers):
+        """
+        :param output_buffers: one buffer per arena
+        """
+        super().start_record(input_buffer, ArenaBuffers(output_buffers))
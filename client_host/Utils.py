@@ -1,3 +1,6 @@
+import threading
+from collections import OrderedDict
+
 import cv2
 import numpy as np
 
@@ -10,14 +13,23 @@ def Log_thread_finish(thread_name):
     print(f'Thread Finish: {thread_name} ----------------------------')
 
 
-def get_edge_and_center(thresh, use_open_close=True):
+# reach of the opening and closing of get_edge_and_center: 4 operations of 2 iterations with a 5x5 kernel
+MORPHOLOGY_MARGIN = 4 * 2 * 2
+
+
+def open_close(thresh):
+    kernel = np.ones((5, 5), np.uint8)
+    opening = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
+    return cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=2)
+
+
+def get_edge_and_center(thresh, use_open_close=True, offset=(0, 0)):
+    """
+    :param offset: (x, y) added to the contour points, when thresh is a crop of the frame
+    """
     if use_open_close:
-        kernel = np.ones((5, 5), np.uint8)
-        opening = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel, iterations=2)
-        closing = cv2.morphologyEx(opening, cv2.MORPH_CLOSE, kernel, iterations=2)
-        contours, _ = cv2.findContours(closing, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    else:
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        thresh = open_close(thresh)
+    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=offset)
 
     if len(contours) == 0:
         return None, np.nan, np.nan
@@ -37,20 +49,122 @@ def get_edge_and_center(thresh, use_open_close=True):
     return largest_contour, cX, cY
 
 
+class ComponentContour:
+    """
+    Outline of a connected component, only traced when get is called (by the playback, for drawing).
+    Keeps the label image of the frame, which is not reused.
+    """
+
+    def __init__(self, labels, label, stats, offset=(0, 0)):
+        self.labels = labels
+        self.label = label
+        self.bbox = tuple(int(v) for v in stats[:4])
+        self.offset = offset
+        self.contour = None
+
+    def get(self):
+        if self.contour is None:
+            x, y, w, h = self.bbox
+            component = (self.labels[y:y + h, x:x + w] == self.label).astype(np.uint8)
+            contours, _ = cv2.findContours(component, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=(x + self.offset[0], y + self.offset[1]))
+            self.contour = max(contours, key=cv2.contourArea)
+        return self.contour
+
+
+def get_component_and_center(thresh, use_open_close=True, offset=(0, 0)):
+    """
+    Same as get_edge_and_center with cv2.connectedComponentsWithStats: the areas and centroids of all the
+    components come out of one pass. The centroid is the one of the pixels of the component, and the
+    contour is returned as a ComponentContour.
+    :param offset: (x, y) added to the center and the contour, when thresh is a crop of the frame
+    """
+    if use_open_close:
+        thresh = open_close(thresh)
+    # block based labeling (Grana), faster than the default algorithm on single thread here
+    num, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(thresh, 8, cv2.CV_32S,
+                                                                                    cv2.CCL_GRANA)
+
+    if num < 2:
+        return None, np.nan, np.nan
+
+    # label 0 is the background
+    label = 1 + int(np.argmax(stats[1:, cv2.CC_STAT_AREA]))
+    cX = int(centroids[label, 0]) + offset[0]
+    cY = int(centroids[label, 1]) + offset[1]
+    return ComponentContour(labels, label, stats[label], offset), cX, cY
+
+
+class BackgroundModel:
+    """
+    Background of get_largest_component_and_center with the denominator of the 'div' difference
+    (background + div_coeff, float32) computed once, and on update, instead of for every frame. The
+    difference is computed in a reused float32 buffer and equals the one computed from the image.
+    """
+
+    def __init__(self, background, div_coeff=0.1):
+        self.div_coeff = div_coeff
+        self.buffer = None
+        self.planes = None
+        self.update(background)
+
+    def update(self, background):
+        denominator = background.astype(np.float32) + self.div_coeff
+        # swapped in one assignment, a frame is never processed with a mix of two backgrounds
+        self.planes = (background, denominator)
+
+    @property
+    def background(self):
+        return self.planes[0]
+
+    def get_difference(self, frame, diff_type='div', crop=None):
+        """
+        :param frame: frame, or its crop when crop is given
+        :param crop: (x0, y0, x1, y1) of frame in the full image
+        """
+        background, denominator = self.planes
+        if crop is not None:
+            x0, y0, x1, y1 = crop
+            background = background[y0:y1, x0:x1]
+            denominator = denominator[y0:y1, x0:x1]
+        difference = cv2.absdiff(frame, background)
+        if diff_type == 'sub':
+            return difference
+
+        if self.buffer is None or self.buffer.size < difference.size:
+            self.buffer = np.empty(difference.size, np.float32)
+        buffer = self.buffer[:difference.size].reshape(difference.shape)
+        # same float32 operations as np.clip(difference.astype(np.float32) * 255 / denominator, 0, 255),
+        # the difference is never negative
+        np.multiply(difference, np.float32(255), out=buffer, dtype=np.float32)
+        np.divide(buffer, denominator, out=buffer)
+        np.minimum(buffer, np.float32(255), out=buffer)
+        np.copyto(difference, buffer, casting='unsafe')
+        return difference
+
+
 def get_largest_component_and_center(frame, background, thresh_type='auto', thresh=100, diff_type='div', div_coeff=0.1,
                                      thresh_img_type='color_and', use_open_close=True, get_edge=True,
-                                     area_type=None, area_points=None):
+                                     area_type=None, area_points=None, backend='contours', window=None):
     """
 
     :param frame:
-    :param background:
+    :param background: background image, or a BackgroundModel (its div_coeff is used)
     :param thresh_type: 'manual', 'auto'. default: 'auto'
     :param thresh: use when thresh_type is 'manual': 0-255. default: 100
     :param diff_type: 'sub', 'div'. default: 'div'
     :param div_coeff: use when diff_type is 'div': >=0. default: 0.1
-    :param thresh_img_type: 'gray', 'color_merge', 'color_and'. default: 'color_and'
+    :param thresh_img_type: 'gray', 'color_merge', 'color_and', not used for grayscale frames. default: 'color_and'
     :param use_open_close: True/False. default: True
+    :param backend: 'contours': findContours and moments, 'components': connectedComponentsWithStats,
+                    the contour is then a ComponentContour. default: 'contours'
+    :param window: (x0, y0, x1, y1) only searched part of the frame, the images are 0 outside. default: None
     :return:
+
+    With an area and a manual threshold, everything outside the area is 0 after masking, so the images are
+    only processed inside the bounding box of the area (plus MORPHOLOGY_MARGIN) and the results are mapped
+    back to the full frame. The automatic threshold depends on the whole image and is not cropped, unless a
+    window is given.
     """
 
     def do_thresh(img_diff, thresh, thresh_type):
@@ -63,19 +177,47 @@ def get_largest_component_and_center(frame, background, thresh_type='auto', thre
             # thresh_type == 'auto'
             return cv2.threshold(img_diff, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-    if diff_type == 'sub':
+    crop = None
+    if area_type is not None and thresh_type == 'manual':
+        margin = MORPHOLOGY_MARGIN if get_edge and use_open_close else 0
+        crop = get_roi_crop(frame.shape, area_type, area_points, margin)
+    if window is not None:
+        x0, y0, x1, y1 = crop if crop is not None else (0, 0, frame.shape[1], frame.shape[0])
+        x0, y0, x1, y1 = max(x0, window[0]), max(y0, window[1]), min(x1, window[2]), min(y1, window[3])
+        # a window outside the area searches the whole area
+        if x0 < x1 and y0 < y1:
+            crop = x0, y0, x1, y1
+    if crop is not None:
+        full_shape = frame.shape
+        x0, y0, x1, y1 = crop
+        frame = frame[y0:y1, x0:x1]
+
+    if isinstance(background, BackgroundModel):
+        difference = background.get_difference(frame, diff_type, crop)
+    elif diff_type == 'sub':
+        if crop is not None:
+            background = background[y0:y1, x0:x1]
         difference = cv2.absdiff(frame, background)
     else:
         # diff_type == 'div':
+        if crop is not None:
+            background = background[y0:y1, x0:x1]
         coefficient = div_coeff
         modified_background = background.astype(np.float32) + coefficient
         difference = np.clip((cv2.absdiff(frame, background).astype(np.float32)) * 255 / modified_background, 0, 255)
         difference = difference.astype(np.uint8)
 
-    if area_type is not None:
-        difference = apply_mask(difference, area_type, area_points)
+    if crop is not None and area_type is not None:
+        mask = get_roi_mask(full_shape, area_type, area_points)[y0:y1, x0:x1]
+        difference = cv2.bitwise_and(difference, mask, dst=difference)
+    elif area_type is not None:
+        # difference is a new image, masked in place
+        difference = apply_mask(difference, area_type, area_points, out=difference)
 
-    if thresh_img_type == 'gray':
+    if difference.ndim == 2:
+        # grayscale frames
+        thresh_value, thresh_img = do_thresh(difference, thresh, thresh_type)
+    elif thresh_img_type == 'gray':
         gray_diff = cv2.cvtColor(difference, cv2.COLOR_BGR2GRAY)
         thresh_value, thresh_img = do_thresh(gray_diff, thresh, thresh_type)
     else:
@@ -90,11 +232,20 @@ def get_largest_component_and_center(frame, background, thresh_type='auto', thre
             thresh_img = np.logical_and(thresh_img_B,
                                         np.logical_and(thresh_img_G, thresh_img_R)).astype(np.uint8) * 255
 
+    if get_edge:
+        find_center = get_component_and_center if backend == 'components' else get_edge_and_center
+        largest_contour, cX, cY = find_center(thresh_img, use_open_close,
+                                              (crop[0], crop[1]) if crop is not None else (0, 0))
+    else:
+        largest_contour, cX, cY = None, None, None
+
+    if crop is not None:
+        difference = paste_crop(difference, full_shape, crop)
+        thresh_img = paste_crop(thresh_img, full_shape, crop)
+
     if not get_edge:
         return difference, thresh_img, None, None, None
 
-    largest_contour, cX, cY = get_edge_and_center(thresh_img, use_open_close)
-
     # thresh_img = cv2.cvtColor(thresh_img, cv2.COLOR_GRAY2BGR)
     return difference, thresh_img, largest_contour, cX, cY
 
@@ -141,9 +292,85 @@ def cv2_fill(mask, area_type, area_points, color):
     return mask
 
 
-def apply_mask(image, area_type, area_points):
-    mask = np.ones(image.shape, dtype=np.uint8) * 255
-    mask = cv2_fill(mask, area_type, area_points, (0, 0, 0))
+class RoiMaskCache:
+    """
+    ROI masks compiled once per (image shape, area_type, area_points): 255 inside the area, 0 outside.
+    The least recently used mask is evicted when more than max_size masks are cached.
+    """
+
+    def __init__(self, max_size=8):
+        self.default_size = max_size
+        self.max_size = max_size
+        self.masks = OrderedDict()
+        self.lock = threading.Lock()
+
+    def reserve(self, mask_num):
+        """
+        Keep mask_num masks used on every frame (e.g. 2 per arena) besides the default size, the cache
+        would otherwise evict and compile them again on every frame
+        """
+        with self.lock:
+            self.max_size = max(self.max_size, self.default_size + mask_num)
+
+    def get_mask(self, shape, area_type, area_points):
+        points = None if area_points is None else tuple(np.asarray(area_points, dtype=np.float64).ravel())
+        key = (tuple(shape), area_type, points)
+        with self.lock:
+            mask = self.masks.get(key)
+            if mask is not None:
+                self.masks.move_to_end(key)
+                return mask
+
+        mask = cv2_fill(np.zeros(shape, dtype=np.uint8), area_type, area_points, (255, 255, 255))
+        mask.flags.writeable = False
+        with self.lock:
+            self.masks[key] = mask
+            while len(self.masks) > self.max_size:
+                self.masks.popitem(last=False)
+        return mask
+
+
+roi_mask_cache = RoiMaskCache()
 
-    masked_image = cv2.bitwise_and(image, cv2.bitwise_not(mask))
-    return masked_image
+
+def get_roi_mask(shape, area_type, area_points):
+    return roi_mask_cache.get_mask(shape, area_type, area_points)
+
+
+def reserve_roi_masks(mask_num):
+    roi_mask_cache.reserve(mask_num)
+
+
+def get_roi_crop(shape, area_type, area_points, margin=0):
+    """
+    :return: (x0, y0, x1, y1) bounding box of the area extended by margin and clipped to the image, None if
+    it is empty or covers the whole image
+    """
+    mask = get_roi_mask(shape[:2], area_type, area_points)
+    x, y, w, h = cv2.boundingRect(mask)
+    if w == 0 or h == 0:
+        return None
+    x0, y0 = max(x - margin, 0), max(y - margin, 0)
+    x1, y1 = min(x + w + margin, shape[1]), min(y + h + margin, shape[0])
+    if x0 == 0 and y0 == 0 and x1 == shape[1] and y1 == shape[0]:
+        return None
+    return x0, y0, x1, y1
+
+
+def paste_crop(image, shape, crop):
+    """
+    :return: image of the given height and width, image at crop and 0 elsewhere
+    """
+    x0, y0, x1, y1 = crop
+    full_image = np.zeros(shape[:2] + image.shape[2:], dtype=image.dtype)
+    full_image[y0:y1, x0:x1] = image
+    return full_image
+
+
+def apply_mask(image, area_type, area_points, out=None):
+    """
+    :param out: output image of the shape of image, can be image itself. A new image is returned if None
+    :return: image with the pixels outside the area set to 0
+    """
+    mask = get_roi_mask(image.shape, area_type, area_points)
+    return cv2.bitwise_and(image, mask, dst=out)
@@ -3,41 +3,69 @@ import argparse
 
 import cv2
 import socket
+import struct
 import time
 
 import zmq
 
 stop_sending = False
 
+# framed video protocol, same layout as rpi_server/rpicamera/streams.py
+FRAME_MAGIC = b'RB'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<2sBBIqI')
 
-def server_send_video(address, port, input_file):
+
+def read_encoded_frames(cap):
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        _, encoded_frame = cv2.imencode('.jpg', frame)
+        yield encoded_frame.tobytes()
+
+
+def send_encoded_frames(address, port, frames, frame_rate, stream_format='raw', paced=True):
+    """
+    :param frames: iterable of JPEG bytes
+    :param paced: send at frame_rate like a camera, otherwise as fast as the socket allows
+    """
     global stop_sending
-    cap = cv2.VideoCapture(input_file)
-    frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
-    print(f"frame rate : {frame_rate}")
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
     sock.connect((address, port))
     frame_num = 0
     expected_frame_time = 1 / frame_rate
     start_time = time.time()
-    while True:
-        ret, frame = cap.read()
-        if (not ret) or stop_sending:
+    for payload in frames:
+        if stop_sending:
             break
-        _, encoded_frame = cv2.imencode('.jpg', frame)
+        if stream_format == 'framed':
+            pts = int(frame_num * expected_frame_time * 1000000)
+            payload = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, frame_num, pts, len(payload)) + payload
         frame_num += 1
-        sock.send(encoded_frame.tobytes())
+        sock.sendall(payload)
 
-        time.sleep(frame_num * expected_frame_time - (time.time() - start_time))
+        if paced:
+            time.sleep(max(frame_num * expected_frame_time - (time.time() - start_time), 0))
     print(f"send frame num:{frame_num}")
-    cap.release()
     sock.close()
     stop_sending = False
 
 
+def server_send_video(address, port, input_file, stream_format='raw'):
+    cap = cv2.VideoCapture(input_file)
+    frame_rate = int(cap.get(cv2.CAP_PROP_FPS))
+    print(f"frame rate : {frame_rate}")
+    try:
+        send_encoded_frames(address, port, read_encoded_frames(cap), frame_rate, stream_format)
+    finally:
+        cap.release()
+
+
 class ZmqThread(threading.Thread):
     def __init__(self, start_callback, stop_callback, close_callback,
-                 parameter_callback):
+                 parameter_callback, port=5555):
 
         super(ZmqThread, self).__init__()
 
@@ -46,7 +74,7 @@ class ZmqThread(threading.Thread):
         self.close_callback = close_callback
         self.parameter_callback = parameter_callback
 
-        self.url = 'tcp://*:5555'
+        self.url = 'tcp://*:%d' % port
         self.context = zmq.Context()
         self.socket = self.context.socket(zmq.REP)
         self.socket.bind(self.url)
@@ -71,7 +99,9 @@ class ZmqThread(threading.Thread):
             if cmd == 'connect':
                 socket.send_string('ok')
             elif cmd == 'Start':
-                rec_path = self.start_callback()
+                stream_format = parts[2] if len(parts) > 2 else 'raw'
+                video_port = int(parts[3]) if len(parts) > 3 else 12397
+                rec_path = self.start_callback(stream_format, video_port)
                 if rec_path is None:
                     rec_path = ''
                 socket.send_string(rec_path)
@@ -121,12 +151,11 @@ class ZmqThread(threading.Thread):
                 socket.send_string("Not handled")
 
 
-def run_plugin(address, input_file):
+def run_plugin(address, input_file, control_port=5555):
 
-    def start_cam():
-        print("Start cam")
-        port = 12397
-        thread = threading.Thread(target=server_send_video, args=(address, port, input_file))
+    def start_cam(stream_format, video_port=12397):
+        print(f"Start cam, stream format: {stream_format}, video port: {video_port}")
+        thread = threading.Thread(target=server_send_video, args=(address, video_port, input_file, stream_format))
         thread.start()
 
     def stop_cam():
@@ -173,7 +202,7 @@ def run_plugin(address, input_file):
             print("Stop Preview")
 
     print("Starting ZMQ thread")
-    thread = ZmqThread(start_cam, stop_cam, close_cam, set_parameter)
+    thread = ZmqThread(start_cam, stop_cam, close_cam, set_parameter, control_port)
     thread.start()
     thread.join()
 
@@ -182,8 +211,10 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="Camera Plugin Parameters")
     parser.add_argument('address', type=str, help='The address to connect to the server')
     parser.add_argument('input_file', type=str, help='The input file for the video stream')
+    parser.add_argument('--control-port', type=int, default=5555,
+                        help='port of the commands, one per instance to simulate several cameras')
 
     args = parser.parse_args()
 
-    run_plugin(args.address, args.input_file)
+    run_plugin(args.address, args.input_file, args.control_port)
 
@@ -122,10 +122,13 @@ class VideoEncoderGPIO(picamera.PiVideoEncoder):
             # for firmware < 4.4.8
             flags = buf[0].flags
 
+        frame_end = False
         if not (flags & mmal.MMAL_BUFFER_HEADER_FLAG_CONFIG):
 
             if flags & mmal.MMAL_BUFFER_HEADER_FLAG_FRAME_END:
 
+                frame_end = True
+
                 current_ts = self.parent.timestamp
 
                 if GPIO_AVAILABLE and self.strobe_pin is not None:
@@ -142,9 +145,15 @@ class VideoEncoderGPIO(picamera.PiVideoEncoder):
                     print("invalid time time stamp (buf.pts < 0):", buf.pts)
 
                 self.parent.write_timestamps(buf.pts, current_ts)
-                self.frame_count += 1
 
-        return super(VideoEncoderGPIO, self)._callback_write(buf, **kwargs)
+        ret = super(VideoEncoderGPIO, self)._callback_write(buf, **kwargs)
+
+        if frame_end:
+            # the last chunk of the frame has been written, framed outputs can send it now
+            self.parent.end_frame(self.frame_count, buf.pts)
+            self.frame_count += 1
+
+        return ret
 
 
 class CameraGPIO(picamera.PiCamera):
@@ -173,6 +182,8 @@ class CameraGPIO(picamera.PiCamera):
         self.ts_file = None
         self.ts_path = None
         self.client_ip = None
+        self.timestamp_port = 5556
+        self.stream_output = None
 
         if GPIO_AVAILABLE and self.strobe_pin is not None:
             print("Camera: setting GPIO strobe pin ", self.strobe_pin)
@@ -191,11 +202,13 @@ class CameraGPIO(picamera.PiCamera):
 
         return encoder
 
-    def start_recording(self, ts_path, output, client_ip, **kwargs):
+    def start_recording(self, ts_path, output, client_ip, timestamp_port=5556, **kwargs):
 
         # ts_path = op.splitext(output)[0] + '_timestamps.csv'
         self.ts_path = ts_path
         self.client_ip = client_ip
+        self.timestamp_port = timestamp_port
+        self.stream_output = output
         try:
             self.ts_file = open(ts_path, 'w')
             self.ts_file.write('# frame timestamp, TTL timestamp\n')
@@ -225,7 +238,7 @@ class CameraGPIO(picamera.PiCamera):
             context = zmq.Context()
             socket = context.socket(zmq.PUSH)
             try:
-                socket.connect(f"tcp://{self.client_ip}:5556")
+                socket.connect(f"tcp://{self.client_ip}:{self.timestamp_port}")
 
                 file_path = self.ts_path
                 with open(file_path, "rb") as f:
@@ -241,6 +254,13 @@ class CameraGPIO(picamera.PiCamera):
             self.ts_path = None
             self.client_ip = None
 
+        self.stream_output = None
+
+    def end_frame(self, sequence, pts):
+
+        if self.stream_output is not None and hasattr(self.stream_output, 'end_frame'):
+            self.stream_output.end_frame(sequence, pts)
+
     def write_timestamps(self, pts, ets):
 
         if self.ts_file is not None:
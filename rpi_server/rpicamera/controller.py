@@ -24,7 +24,7 @@ import zmq
 from datetime import datetime
 
 from .camera import CameraGPIO, DetectGPIO
-from .streams import NetworkStreamOutput
+from .streams import NetworkStreamOutput, FramedNetworkStreamOutput, STREAM_RAW, STREAM_FRAMED
 
 
 
@@ -70,8 +70,12 @@ class ZmqThread(threading.Thread):
             cmd = parts[0]
             if cmd == 'Start':
                 client_ip = str(parts[1])
+                stream_format = str(parts[2]) if len(parts) > 2 else STREAM_RAW
+                # ports of the host, sent by hosts receiving several cameras
+                video_port = int(parts[3]) if len(parts) > 3 else 12397
+                timestamp_port = int(parts[4]) if len(parts) > 4 else 5556
                 print("Received request from: " + client_ip)
-                rec_path = self.start_callback(client_ip)
+                rec_path = self.start_callback(client_ip, stream_format, video_port, timestamp_port)
 
                 socket.send_string("Start")
 
@@ -323,7 +327,8 @@ class Controller(object):
                                    fix_awb_gains=fix_awb_gains,
                                    fix_exposure_speed=fix_exposure_speed)
 
-    def start_recording(self, client_ip, filename='rpicamera_video', quality=23):
+    def start_recording(self, client_ip, filename='rpicamera_video', quality=23, stream_format=STREAM_RAW,
+                        video_port=12397, timestamp_port=5556):
 
         if self.camera is not None and not self.camera.recording:
 
@@ -344,13 +349,17 @@ class Controller(object):
                 json.dump(params, f, indent=4,
                           sort_keys=True, separators=(',', ': '))
 
-            output_stream = NetworkStreamOutput(address=client_ip)
+            if stream_format == STREAM_FRAMED:
+                output_stream = FramedNetworkStreamOutput(address=client_ip, port=video_port)
+            else:
+                output_stream = NetworkStreamOutput(address=client_ip, port=video_port)
             print('init finish')
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             ts_path = op.join(rec_path, f"output_timestamps_{timestamp}.csv")
             self.camera.start_recording(output=output_stream,
                                         ts_path=ts_path,
                                         client_ip=client_ip,
+                                        timestamp_port=timestamp_port,
                                         format='mjpeg', 
                                         # format='h264',
                                         quality=quality)
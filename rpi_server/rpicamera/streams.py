@@ -8,9 +8,20 @@ from __future__ import print_function
 
 from io import FileIO
 import socket
+import struct
 import subprocess
 
 
+# framed video protocol, every encoder frame is sent as header + JPEG payload.
+# header: magic, version, flags, sequence number, pts (usec, -1 if unknown), payload length
+FRAME_MAGIC = b'RB'
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('<2sBBIqI')
+
+STREAM_RAW = 'raw'
+STREAM_FRAMED = 'framed'
+
+
 class FileOutput(FileIO):
 
     def __init__(self, f, **kwargs):
@@ -35,6 +46,8 @@ class NetworkStreamOutput(object):
         self.port = port
 
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # frames are written in few large chunks, send them right away instead of waiting for acks
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.socket.connect((address, port))
         self.size = 0
 
@@ -52,6 +65,30 @@ class NetworkStreamOutput(object):
         self.socket = None
 
 
+class FramedNetworkStreamOutput(NetworkStreamOutput):
+    """Collect the encoder output of a frame and send it with a FRAME_HEADER once the frame is complete"""
+
+    def __init__(self, address, port=12397, **kwargs):
+
+        super(FramedNetworkStreamOutput, self).__init__(address, port=port, **kwargs)
+        self.frame_chunks = []
+
+    def write(self, s):
+        self.frame_chunks.append(bytes(s))
+        return len(s)
+
+    def end_frame(self, sequence, pts):
+
+        payload = b''.join(self.frame_chunks)
+        self.frame_chunks = []
+        if pts is None or pts < 0:
+            pts = -1
+
+        header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, 0, sequence & 0xFFFFFFFF, pts, len(payload))
+        self.size += len(payload)
+        self.socket.sendall(header + payload)
+
+
 class NetworkStreamWriter(object):
 
     def __init__(self, address='', port=12397, verbose=True):
@@ -70,7 +107,7 @@ class NetworkStreamWriter(object):
 
         self.server = server
 
-    def process(self, output=None, vlc=False):
+    def process(self, output=None, vlc=False, ack=False):
 
         assert not (output is None and not vlc),\
             "Either output file or viewer must be valid"
@@ -109,8 +146,10 @@ class NetworkStreamWriter(object):
                 if vlc:
                     player.stdin.write(data)
 
-                # indicate that we are ready for more data (move up?)
-                conn.send("")
+                # indicate that we are ready for more data (only needed by
+                # senders waiting for it, TCP flow control is used otherwise)
+                if ack:
+                    conn.send(b"")
 
         finally:
             if conn is not None:
@@ -66,9 +66,12 @@ def run_plugin(output=None,
 
     print("Starting preview and warming up camera for 2 seconds")
 
-    def start_cam(client_ip):
+    def start_cam(client_ip, stream_format='raw', video_port=12397, timestamp_port=5556):
         return controller.start_recording(client_ip=client_ip, filename=name,
-                                          quality=quality)
+                                          quality=quality,
+                                          stream_format=stream_format,
+                                          video_port=video_port,
+                                          timestamp_port=timestamp_port)
 
     def stop_cam():
         controller.stop_recording()